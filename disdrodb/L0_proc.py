@@ -24,13 +24,19 @@
 # -----------------------------------------------------------------------------.
 import os
 import glob
-import pandas as pd
-import dask.dataframe as dd
 import logging
 import tarfile
+import numpy as np
+from disdrodb.utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported at first use
+pd = lazy_import("pandas")
+dd = lazy_import("dask.dataframe")
 
 from disdrodb.check_standards import check_L0_standards
+from disdrodb.check_standards import count_L0_format_violations, log_L0_format_violations
 from disdrodb.data_encodings import get_L0_dtype_standards
+from disdrodb.standards import get_L0_parquet_encoding_dict
 from disdrodb.io import _remove_if_exists
 
 logger = logging.getLogger(__name__)
@@ -215,6 +221,72 @@ def concatenate_dataframe(list_df, verbose=False, lazy=True):
     return df
 
 
+def _downcast_integer_column(series, dtype, column):
+    """Downcast a pandas integer column, raising an error if its values do not fit in dtype."""
+    info = np.iinfo(dtype)
+    if len(series) > 0 and (series.min() < info.min or series.max() > info.max):
+        raise ValueError(
+            f"The column {column} has values outside the {dtype} range [{info.min}, {info.max}]."
+        )
+    return series.astype(dtype)
+
+
+def _cast_downcasted_column(series, dtype, wide_dtype, column):
+    """Cast a column to a downcasted integer dtype without wrapping the raw values.
+
+    The column is first cast to the L0_dtype.yml dtype and then downcasted.
+    A ValueError is raised if the values do not fit in the downcasted dtype.
+    With dask, the check is done on each partition when the data are computed.
+    """
+    try:
+        series = series.astype(wide_dtype)
+    except ValueError as e:
+        raise ValueError(f"The column {column} has {e}")
+    if isinstance(series, pd.Series):
+        return _downcast_integer_column(series, dtype, column)
+    return series.map_partitions(
+        _downcast_integer_column, dtype, column, meta=(series.name, dtype)
+    )
+
+
+def cast_column_dtypes(df, sensor_name):
+    """Cast the dataframe columns to the L0 dtype standards.
+
+    Categorical columns are kept as object because the categories can differ
+    between raw files. They are encoded by encode_categorical_columns once the
+    dataframes have been concatenated.
+    """
+    dtype_dict = get_L0_dtype_standards(sensor_name=sensor_name)
+    wide_dtype_dict = get_L0_dtype_standards(sensor_name=sensor_name, downcast=False)
+    for column in df.columns:
+        if column in dtype_dict and dtype_dict[column] != wide_dtype_dict[column]:
+            df[column] = _cast_downcasted_column(df[column], dtype_dict[column], wide_dtype_dict[column], column)
+            continue
+        try:
+            dtype = dtype_dict[column]
+            if dtype == "category":
+                dtype = "object"
+            df[column] = df[column].astype(dtype)
+        except KeyError:
+            # If column dtype is not into get_L0_dtype_standards, assign object
+            df[column] = df[column].astype("object")
+        except ValueError as e:
+            raise ValueError(f"The column {column} has {e}")
+    return df
+
+
+def encode_categorical_columns(df, sensor_name):
+    """Encode the low-cardinality columns (i.e. weather codes) as categorical.
+
+    Categorical columns are dictionary-encoded when written to Apache Parquet.
+    """
+    dtype_dict = get_L0_dtype_standards(sensor_name=sensor_name)
+    for column in df.columns:
+        if dtype_dict.get(column) == "category":
+            df[column] = df[column].astype("category")
+    return df
+
+
 def read_L0_raw_file_list(
         file_list,
         column_names,
@@ -224,7 +296,12 @@ def read_L0_raw_file_list(
         df_sanitizer_fun=None,
         lazy=False,
 ):
-    """Read and parse a list for raw files into a dataframe."""
+    """Read and parse a list for raw files into a dataframe.
+
+    With lazy=False, the number of raw values not complying with L0_data_format.yml
+    is logged for each field (see check_standards.count_L0_format_violations).
+    This check is not done with lazy=True, to not read the raw files twice.
+    """
     # ------------------------------------------------------.
     # ### Checks arguments
     if df_sanitizer_fun is not None:
@@ -243,6 +320,7 @@ def read_L0_raw_file_list(
     processed_file_counter = 0
     list_skipped_files_msg = []
     list_df = []
+    df_format_counts = None
     for filepath in file_list:
         # Try to process a raw file
         try:
@@ -290,30 +368,14 @@ def read_L0_raw_file_list(
                 df = df_sanitizer_fun(df, lazy=lazy)
 
             # ------------------------------------------------------.
-            # Filter bad data
-            # TODO[GG]: might depend on sensor_name !
-            # TODO[GG]: maybe encapsulate in another function
-            # # Remove rows with bad data
-            # df = df[df.sensor_status == 0]
-
-            # # Remove rows with error_code not 000
-            # df = df[df.error_code == 0]
+            # Bad data are not removed here.
+            # They are flagged by the L1 qc_flag variable (see L1_proc.get_L1_qc_flag)
 
             # ----------------------------------------------------.
             # Cast dataframe to dtypes
-            dtype_dict = get_L0_dtype_standards(sensor_name=sensor_name)
-            for column in df.columns:
-                try:
-                    df[column] = df[column].astype(dtype_dict[column])
-                except KeyError:
-                    # If column dtype is not into get_L0_dtype_standards, assign object
-                    df[column] = df[column].astype("object")
-                except ValueError as e:
-                    raise (f"ValueError: The column {column} has {e}")
-
-            # dtype_dict = {column: dtype_dict[column] for column in df.columns}
-            # for k, v in dtype_dict.items():
-            #     df[k] = df[k].astype(v)
+            # - The raw strings are kept to check their format
+            df_raw = df
+            df = cast_column_dtypes(df.copy(), sensor_name=sensor_name)
 
             # ----------------------------------------------------.
             # Append dataframe to the list
@@ -334,6 +396,19 @@ def read_L0_raw_file_list(
                 print(msg)
             list_skipped_files_msg.append(msg)
 
+        # Count the raw values not complying with L0_data_format.yml
+        # - Only with pandas (lazy=False), to not read the raw files twice
+        # - A failure of this diagnostic does not skip the file
+        else:
+            if not lazy:
+                try:
+                    df_counts = count_L0_format_violations(df_raw, sensor_name=sensor_name)
+                    df_format_counts = df_counts if df_format_counts is None else df_format_counts.add(df_counts, fill_value=0)
+                except Exception as e:
+                    msg = f" - The format check of {filepath} failed. \n -- The error is: {e}."
+                    logger.warning(msg)
+            del df_raw
+
     # Update logger
     msg = f" - {len(list_skipped_files_msg)} of {n_files} have been skipped."
     if verbose:
@@ -342,6 +417,10 @@ def read_L0_raw_file_list(
     logger.info(msg)
     logger.info("---")
 
+    # Log the raw fields format violations
+    if df_format_counts is not None:
+        log_L0_format_violations(df_format_counts.astype(int), verbose=verbose)
+
     ##----------------------------------------------------------------.
     #### - Concatenate the dataframe
     if len(list_df) == 0: 
@@ -351,12 +430,186 @@ def read_L0_raw_file_list(
     else: 
         df = list_df[0]
 
+    ##----------------------------------------------------------------.
+    #### - Encode low-cardinality columns as categorical
+    df = encode_categorical_columns(df, sensor_name=sensor_name)
+
     return df
 
 
 ####---------------------------------------------------------------------------.
 #### Parquet Writer
-def _write_to_parquet(df, fpath, force=False):
+def _get_default_L0_parquet_encoding_dict():
+    """Return the legacy encoding used when the sensor_name is not specified."""
+    encoding_dict = {
+        "row_group_size": 100000,
+        "data_page_size": None,
+        "default": {"compression": "snappy"},
+        "columns": {},
+    }
+    return encoding_dict
+
+
+def _is_pyarrow_writer_option_supported(option):
+    """Check if the installed pyarrow Parquet writer supports an option."""
+    import inspect
+    import pyarrow.parquet as pq
+
+    return option in inspect.signature(pq.ParquetWriter.__init__).parameters
+
+
+def get_L0_parquet_writer_kwargs(encoding_dict, columns):
+    """Convert a L0 Parquet encoding dictionary into pyarrow writer arguments.
+
+    Parameters
+    ----------
+    encoding_dict : dict
+        Dictionary with the L0_parquet_encodings.yml structure.
+    columns : list
+        Columns of the dataframe to write.
+
+    Returns
+    -------
+    writer_kwargs : dict
+        Arguments to be passed to pandas/dask to_parquet (engine="pyarrow").
+    """
+    # Retrieve the encoding of each column
+    default_encoding = encoding_dict.get("default", {})
+    columns_encodings = encoding_dict.get("columns", {})
+    dict_encodings = {}
+    for column in columns:
+        column_encoding = default_encoding.copy()
+        column_encoding.update(columns_encodings.get(column, {}))
+        dict_encodings[column] = column_encoding
+    # Define pyarrow writer arguments
+    writer_kwargs = {}
+    writer_kwargs["compression"] = {
+        column: encoding.get("compression", None)
+        for column, encoding in dict_encodings.items()
+    }
+    compression_level = {
+        column: encoding["compression_level"]
+        for column, encoding in dict_encodings.items()
+        if encoding.get("compression_level") is not None
+    }
+    if len(compression_level) > 0:
+        writer_kwargs["compression_level"] = compression_level
+    writer_kwargs["use_dictionary"] = [
+        column
+        for column, encoding in dict_encodings.items()
+        if encoding.get("use_dictionary", True)
+    ]
+    # Define columns encodings
+    # - column_encoding and use_byte_stream_split can not be specified together
+    byte_stream_split_columns = [
+        column
+        for column, encoding in dict_encodings.items()
+        if encoding.get("byte_stream_split", False)
+    ]
+    column_encoding = {
+        column: encoding["encoding"]
+        for column, encoding in dict_encodings.items()
+        if encoding.get("encoding") is not None
+    }
+    if len(column_encoding) > 0 and _is_pyarrow_writer_option_supported("column_encoding"):
+        for column in byte_stream_split_columns:
+            column_encoding[column] = "BYTE_STREAM_SPLIT"
+        writer_kwargs["column_encoding"] = column_encoding
+    else:
+        if len(column_encoding) > 0:
+            logger.warning("The pyarrow Parquet writer does not support 'column_encoding'.")
+        writer_kwargs["use_byte_stream_split"] = byte_stream_split_columns
+    # - Dictionary encoding can not be used together with other encodings
+    writer_kwargs["use_dictionary"] = [
+        column
+        for column in writer_kwargs["use_dictionary"]
+        if column not in column_encoding and column not in byte_stream_split_columns
+    ]
+    # Define row group and data page size
+    writer_kwargs["row_group_size"] = encoding_dict.get("row_group_size", 100000)
+    if encoding_dict.get("data_page_size") is not None:
+        writer_kwargs["data_page_size"] = encoding_dict["data_page_size"]
+    # Define statistics and indexes enabling to skip data when reading
+    writer_kwargs["write_statistics"] = encoding_dict.get("write_statistics", True)
+    writer_kwargs.update(_get_pyarrow_index_options(encoding_dict, dict_encodings, columns))
+    return writer_kwargs
+
+
+def _get_pyarrow_index_options(encoding_dict, dict_encodings, columns):
+    """Define the page index, sorting columns and Bloom filters writer options.
+
+    These options are available only in recent pyarrow versions.
+    """
+    import pyarrow.parquet as pq
+
+    columns = list(columns)
+    options = {}
+    options["write_page_index"] = encoding_dict.get("write_page_index", False)
+    sorting_columns = encoding_dict.get("sorting_columns", None)
+    if sorting_columns is not None:
+        options["sorting_columns"] = [
+            pq.SortingColumn(columns.index(column))
+            for column in sorting_columns
+            if column in columns
+        ]
+    bloom_filter_columns = [
+        column
+        for column, encoding in dict_encodings.items()
+        if encoding.get("bloom_filter", False)
+    ]
+    if len(bloom_filter_columns) > 0:
+        options["bloom_filter_options"] = {
+            column: {"fpp": 0.05} for column in bloom_filter_columns
+        }
+    for option in list(options.keys()):
+        if not _is_pyarrow_writer_option_supported(option):
+            _ = options.pop(option)
+            logger.warning(f"The pyarrow Parquet writer does not support '{option}'.")
+    return options
+
+
+def _sort_by_time(df):
+    """Ensure the dataframe (partitions) is sorted by time.
+
+    Time-sorted row groups have tight min/max time statistics.
+    For dask dataframes, each partition is sorted independently.
+    The partitions are already ordered by concatenate_dataframe.
+    """
+    import pandas as pd
+
+    if "time" not in df.columns:
+        return df
+    if isinstance(df, pd.DataFrame):
+        if not df["time"].is_monotonic_increasing:
+            df = df.sort_values(by="time")
+    else:
+        df = df.map_partitions(pd.DataFrame.sort_values, by="time", meta=df._meta)
+    return df
+
+
+def _get_dask_parquet_schema(df):
+    """Define the pyarrow schema of a dask dataframe from its dtypes.
+
+    Dask cannot infer it from the metadata:
+    - The categories of the categorical columns are unknown before computing,
+      so they are declared as dictionary-encoded strings.
+    - The object columns (i.e. the raw fields) are declared as strings.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            pa_type = pa.dictionary(pa.int32(), pa.string())
+        elif dtype == "object" or pd.api.types.is_string_dtype(dtype):
+            pa_type = pa.string()
+        else:
+            pa_type = pa.from_numpy_dtype(dtype)
+        fields.append(pa.field(column, pa_type))
+    return pa.schema(fields)
+
+
+def _write_to_parquet(df, fpath, sensor_name=None, encoding_dict=None, force=False):
     import pandas as pd
     import dask.dataframe
 
@@ -364,10 +617,19 @@ def _write_to_parquet(df, fpath, force=False):
     # Check if a file already exists (and remove if force=True)
     _remove_if_exists(fpath, force=force)
 
+    # -------------------------------------------------------------------------.
+    # Ensure time-sorted row groups
+    df = _sort_by_time(df)
+
     # -------------------------------------------------------------------------.
     # Define writing options
-    compression = "snappy"  # 'gzip', 'brotli, 'lz4', 'zstd'
-    row_group_size = 100000
+    # - The encoding is defined in L0_parquet_encodings.yml of each sensor
+    if encoding_dict is None:
+        if sensor_name is not None:
+            encoding_dict = get_L0_parquet_encoding_dict(sensor_name)
+        else:
+            encoding_dict = _get_default_L0_parquet_encoding_dict()
+    writer_kwargs = get_L0_parquet_writer_kwargs(encoding_dict, columns=list(df.columns))
     engine = "pyarrow"
 
     # -------------------------------------------------------------------------.
@@ -378,8 +640,7 @@ def _write_to_parquet(df, fpath, force=False):
             df.to_parquet(
                 fpath,
                 engine=engine,
-                compression=compression,
-                row_group_size=row_group_size,
+                **writer_kwargs,
             )
             logger.info(
                 f"The Pandas Dataframe has been written as an Apache Parquet file to {fpath}."
@@ -396,11 +657,10 @@ def _write_to_parquet(df, fpath, force=False):
             # df.repartition(npartitions=1)
             _ = df.to_parquet(
                 fpath,
-                schema="infer",
+                schema=_get_dask_parquet_schema(df),
                 engine=engine,
-                row_group_size=row_group_size,
-                compression=compression,
                 write_metadata_file=False,
+                **writer_kwargs,
             )
             logger.info(
                 f"The Dask Dataframe has been written as an Apache Parquet file to {fpath}."
@@ -415,14 +675,14 @@ def _write_to_parquet(df, fpath, force=False):
     # -------------------------------------------------------------------------.
 
 
-def write_df_to_parquet(df, fpath, force=False, verbose=False):
+def write_df_to_parquet(df, fpath, sensor_name=None, force=False, verbose=False):
     # Log
     msg = " - Conversion to Apache Parquet started."
     if verbose:
         print(msg)
     logger.info(msg)
     # Write to Parquet
-    _write_to_parquet(df=df, fpath=fpath, force=force)
+    _write_to_parquet(df=df, fpath=fpath, sensor_name=sensor_name, force=force)
     # Log
     msg = " - Conversion to Apache Parquet ended."
     if verbose:
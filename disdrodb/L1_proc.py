@@ -22,16 +22,26 @@
 # - Functions to convert L0 Apache parquet files to L1 netCDF or Zarr files
 
 # -----------------------------------------------------------------------------.
+import os
 import logging
-import zarr
+import functools
 import numpy as np
-import dask.array as da
-import dask.dataframe as dd
-import xarray as xr
+from disdrodb.utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported at first use
+pd = lazy_import("pandas")
+zarr = lazy_import("zarr")
+dask = lazy_import("dask")
+da = lazy_import("dask.array")
+dd = lazy_import("dask.dataframe")
+xr = lazy_import("xarray")
 
 from disdrodb.check_standards import check_sensor_name
 from disdrodb.check_standards import check_L1_standards
 from disdrodb.check_standards import check_array_lengths_consistency
+from disdrodb.check_standards import get_field_flag_dict
+from disdrodb.check_standards import get_field_error_dict
+from disdrodb.check_standards import get_field_value_range_dict
 
 from disdrodb.standards import get_diameter_bin_center
 from disdrodb.standards import get_diameter_bin_lower
@@ -42,20 +52,48 @@ from disdrodb.standards import get_velocity_bin_lower
 from disdrodb.standards import get_velocity_bin_upper
 from disdrodb.standards import get_velocity_bin_width
 from disdrodb.standards import get_raw_field_nbins
+from disdrodb.standards import get_raw_field_delimiter
+from disdrodb.standards import get_effective_sampling_area
+from disdrodb.io import write_L1_time_index
 
 logger = logging.getLogger(__name__)
 
 
-def get_drop_concentration(arr):
-    # TODO
+def get_drop_concentration(arr, sensor_name, sample_interval):
+    """Compute the drop number concentration [1/(m3*mm)] per diameter bin.
+
+    N(D_i) = sum_j n_ij / (A_i * dt * V_j * dD_i)
+
+    arr is the (time, diameter, velocity) raw_drop_number (numpy or dask).
+    sample_interval [s] is a scalar or an array of length time.
+    """
     logger.info("Computing raw_drop_concentration from raw spectrum.")
-    return arr[:, :, 0]
+    velocity = np.asarray(get_velocity_bin_center(sensor_name))
+    diameter_width = np.asarray(get_diameter_bin_width(sensor_name))
+    sampling_area = np.asarray(get_effective_sampling_area(sensor_name))
+    # Keep a dask sample_interval lazy
+    if not isinstance(sample_interval, da.Array):
+        sample_interval = np.asarray(sample_interval)
+    sample_interval = sample_interval.astype(float)
+    if sample_interval.ndim == 1:
+        sample_interval = sample_interval[:, None]
+    # Contract the velocity dimension: (time, D, V) @ (V) --> (time, D)
+    flux = arr @ (1 / velocity)
+    return flux / (sampling_area * diameter_width) / sample_interval
 
 
-def get_drop_average_velocity(arr):
-    # TODO
+def get_drop_average_velocity(arr, sensor_name):
+    """Compute the count-weighted mean fall velocity [m/s] per diameter bin.
+
+    arr is the (time, diameter, velocity) raw_drop_number (numpy or dask).
+    The velocity is 0 for the diameter bins without drops.
+    """
     logger.info("Computing raw_drop_average_velocity from raw spectrum.")
-    return arr[:, 0, :]
+    velocity = np.asarray(get_velocity_bin_center(sensor_name))
+    # Contract the velocity dimension: (time, D, V) @ (V) --> (time, D)
+    n_drops = arr.sum(axis=2)
+    velocity_sum = arr @ velocity
+    return velocity_sum / np.maximum(n_drops, 1)
 
 
 def check_L0_raw_fields_available(df, sensor_name):
@@ -66,23 +104,152 @@ def check_L0_raw_fields_available(df, sensor_name):
         raise ValueError(f"The following L0 raw fields are missing: {missing_vars}")
 
 
-def convert_L0_raw_fields_arr_flags(arr, key):
-    # TODO: raw_drop_concentration and raw_drop_average_velocity --> -9.999, has floating number
-    pass
-    return arr
+def get_L1_nan_flags_dict(sensor_name):
+    """Get the nan_flags of L0_data_format.yml as a dictionary of lists.
+
+    The variables without nan_flags are not included.
+    """
+    flag_dict = get_field_flag_dict(sensor_name)
+    flag_dict = {
+        var: list(np.atleast_1d(flags)) for var, flags in flag_dict.items() if flags is not None
+    }
+    return flag_dict
+
+
+def _get_masked_dtype(dtype):
+    """Return the floating dtype able to hold NaN and all values of dtype."""
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return dtype
+    if dtype.itemsize <= 2:
+        return np.dtype("float32")
+    return np.dtype("float64")
+
+
+def convert_L0_raw_fields_arr_flags(arr, flags):
+    """Replace the nan flags of an array (numpy or dask) with NaN.
+
+    The flags are compared in the dtype of the array (i.e. -9.999 as float32).
+    """
+    flags = np.asarray(flags).astype(arr.dtype)
+    dtype = _get_masked_dtype(arr.dtype)
+    return np.where(np.isin(arr, flags), np.array(np.nan, dtype=dtype), arr.astype(dtype))
 
 
-def set_raw_fields_arr_dtype(arr, key):
+def replace_L1_nan_flags(ds, sensor_name):
+    """Replace the nan_flags of L0_data_format.yml with NaN in all L1 variables.
+
+    The flags of all variables are masked in a single (lazy) pass.
+    Integer variables with flags become floating variables.
+    """
+    flag_dict = get_L1_nan_flags_dict(sensor_name)
+    for var, flags in flag_dict.items():
+        if var not in ds.data_vars or ds[var].dtype.kind not in "biuf":
+            continue
+        ds[var] = ds[var].copy(data=convert_L0_raw_fields_arr_flags(ds[var].data, flags))
+    return ds
+
+
+def get_L1_dtype_dict(sensor_name):
+    """Get the in-memory dtype of the L1 variables from L1_netcdf_encodings.yml.
+
+    The variables packed with scale_factor/add_offset are decoded as float32.
+    It returns a read-only mapping.
+    """
+    from disdrodb.standards import get_sensor_spec
+
+    return get_sensor_spec(sensor_name).L1_dtype
+
+
+def get_raw_field_arr_dtype(key, sensor_name=None):
+    if sensor_name is not None:
+        dtype = get_L1_dtype_dict(sensor_name).get(key, None)
+        if dtype is not None:
+            return np.dtype(dtype)
     if key == "raw_drop_number":
-        arr = arr.astype(int)
+        dtype = int
     else:
-        arr = arr.astype(float)
+        dtype = float
+    return dtype
+
+
+def set_raw_fields_arr_dtype(arr, key, sensor_name=None):
+    arr = arr.astype(get_raw_field_arr_dtype(key, sensor_name=sensor_name), copy=False)
     return arr
 
 
+def set_L1_dataset_dtypes(ds, sensor_name):
+    """Cast the L1 auxiliary variables to their compact dtype.
+
+    - Floating variables are cast to the float dtype of the encoding YAML
+      (float32 for variables with an integer encoding, to keep NaN).
+    - Integer variables keep the (already downcasted) L0 dtype.
+    - String variables are not modified.
+    """
+    dtype_dict = get_L1_dtype_dict(sensor_name)
+    for var in ds.data_vars:
+        if var not in dtype_dict or ds[var].dtype.kind != "f":
+            continue
+        if dtype_dict[var] in ["str", "object"]:
+            continue
+        dtype = np.dtype(dtype_dict[var])
+        if dtype.kind != "f":
+            dtype = np.dtype("float32")
+        if dtype != ds[var].dtype:
+            ds[var] = ds[var].astype(dtype)
+    return ds
+
+
+def decode_L0_raw_field(series, n_bins, delimiter, dtype):
+    """Decode the strings of a L0 raw field into a (n_timesteps, n_bins) array.
+
+    The strings are split and parsed in a single pass with the Arrow compute
+    kernels, so that no Python object is created for each value.
+    The values after the first n_bins (i.e. the '' after a trailing delimiter)
+    are discarded.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Split the strings at the delimiter
+    strings = pa.array(series.astype(str), type=pa.string())
+    lists = pc.split_pattern(strings, pattern=delimiter)
+    n_timesteps = len(lists)
+    if n_timesteps == 0:
+        return np.zeros((0, n_bins), dtype=dtype)
+    # Check all strings have the same number of values
+    n_values = np.unique(pc.list_value_length(lists).to_numpy(zero_copy_only=False))
+    if len(n_values) != 1 or n_values[0] < n_bins:
+        msg = f"Unexpected number of values in the raw field strings: {n_values}. Expecting {n_bins}."
+        logger.error(msg)
+        raise ValueError(msg)
+    n_values = n_values[0]
+    # Flatten the values and discard the exceeding values of each string
+    values = pc.list_flatten(lists)
+    if n_values > n_bins:
+        indices = np.arange(n_timesteps)[:, None] * n_values + np.arange(n_bins)
+        values = values.take(pa.array(indices.ravel()))
+    # Parse the values into a contiguous numeric buffer
+    # - Whitespaces around the values are stripped only if parsing fails
+    arrow_type = pa.from_numpy_dtype(np.dtype(dtype))
+    try:
+        arr = pc.cast(values, arrow_type)
+    except pa.ArrowInvalid:
+        try:
+            arr = pc.cast(pc.utf8_trim_whitespace(values), arrow_type)
+        except pa.ArrowInvalid as e:
+            msg = f"Impossible to parse the raw field values. The error is: \n {e}"
+            logger.error(msg)
+            raise ValueError(msg)
+    arr = arr.to_numpy(zero_copy_only=False)
+    return arr.reshape(n_timesteps, n_bins)
+
+
 def reshape_L0_raw_drop_number_matrix_to_2D(arr, n_bins_dict, n_timesteps):
     try:
-        arr = arr.reshape(n_timesteps, n_bins_dict["raw_drop_concentration"], n_bins_dict["raw_drop_average_velocity"])
+        n_d = n_bins_dict["raw_drop_concentration"]
+        n_v = n_bins_dict["raw_drop_number"] // n_d
+        arr = arr.reshape(n_timesteps, n_d, n_v)
     except Exception as e:
         msg = f"Impossible to reshape the raw_spectrum matrix. The error is: \n {e}"
         logger.error(msg)
@@ -91,7 +258,66 @@ def reshape_L0_raw_drop_number_matrix_to_2D(arr, n_bins_dict, n_timesteps):
     return arr
 
 
-def retrieve_L1_raw_arrays(df, sensor_name, lazy=True, verbose=False):
+def _decode_L0_raw_field_block(block, n_bins, delimiter, values_dtype, shape=None):
+    """Decode a dask array block of raw field strings.
+
+    If shape is specified, the decoded block is reshaped to (n_timesteps, *shape).
+    """
+    arr = decode_L0_raw_field(
+        pd.Series(block, dtype="object"),
+        n_bins=n_bins,
+        delimiter=delimiter,
+        dtype=values_dtype,
+    )
+    if shape is not None:
+        arr = arr.reshape(arr.shape[0], *shape)
+    return arr
+
+
+def decode_L0_raw_field_lazy(series, n_bins, delimiter, dtype, lengths, shape=None):
+    """Decode lazily the strings of a L0 raw field.
+
+    Each dask dataframe partition is decoded independently into a block of
+    a dask array with chunks (lengths, n_bins) or (lengths, *shape).
+    """
+    arr = series.to_dask_array(lengths=lengths)
+    if shape is None:
+        shape = (n_bins,)
+        block_shape = None
+    else:
+        block_shape = shape
+    chunks = (arr.chunks[0],) + tuple((size,) for size in shape)
+    arr = arr.map_blocks(
+        _decode_L0_raw_field_block,
+        n_bins=n_bins,
+        delimiter=delimiter,
+        values_dtype=dtype,
+        shape=block_shape,
+        new_axis=list(range(1, len(shape) + 1)),
+        chunks=chunks,
+        dtype=dtype,
+        meta=np.array((), dtype=dtype),
+    )
+    return arr
+
+
+def get_L0_partitions_lengths(df):
+    """Compute the number of rows of each partition of a dask dataframe."""
+    lengths = tuple(df.map_partitions(len).compute())
+    return lengths
+
+
+def retrieve_L1_raw_arrays(
+    df, sensor_name, lazy=True, verbose=False, lengths=None, sample_interval=None
+):
+    """Retrieve the L1 raw arrays from the L0 raw fields strings.
+
+    If lazy=True, 'lengths' are the number of rows of each dask dataframe
+    partition. If not specified, they are computed.
+    If raw_drop_concentration is not available, it is computed from
+    raw_drop_number using the 'sample_interval' column or, if missing,
+    the sample_interval [s] argument.
+    """
     # Log
     msg = " - Retrieval of L1 data matrix started."
     if verbose:
@@ -102,18 +328,15 @@ def retrieve_L1_raw_arrays(df, sensor_name, lazy=True, verbose=False):
     # check_L0_raw_fields_available(df, sensor_name)
     # Retrieve raw fields matrix bins dictionary
     n_bins_dict = get_raw_field_nbins(sensor_name=sensor_name)
-    # Retrieve number of timesteps
+    # Retrieve number of timesteps (of each partition)
     if lazy:
-        n_timesteps = df.shape[0].compute()
+        if lengths is None:
+            lengths = get_L0_partitions_lengths(df)
     else:
         n_timesteps = df.shape[0]
+    # Retrieve raw fields delimiter
+    split_str = get_raw_field_delimiter(sensor_name=sensor_name)
 
-
-    if sensor_name in ['OTT_Parsivel', 'OTT_Parsivel2']:
-        split_str = ','
-    if sensor_name in ['Thies_LPM']:
-        split_str = ';'
-    
     # Retrieve available arrays
     dict_data = {}
     unavailable_keys = []
@@ -122,22 +345,33 @@ def retrieve_L1_raw_arrays(df, sensor_name, lazy=True, verbose=False):
         if key not in df.columns:
             unavailable_keys.append(key)
             continue
-        # Parse the string splitting at ,
-        df_series = df[key].astype(str).str.split(split_str)
-        # Create array
+        # Parse the string splitting at the delimiter
+        # - For key='raw_drop_number', reshape to 2D matrix
         if lazy:
-            arr = da.stack(df_series, axis=0)
+            if key == "raw_drop_number":
+                n_d = n_bins_dict["raw_drop_concentration"]
+                shape = (n_d, n_bins_dict["raw_drop_number"] // n_d)
+            else:
+                shape = None
+            arr = decode_L0_raw_field_lazy(
+                df[key],
+                n_bins=n_bins,
+                delimiter=split_str,
+                dtype=get_raw_field_arr_dtype(key, sensor_name=sensor_name),
+                lengths=lengths,
+                shape=shape,
+            )
         else:
-            arr = np.stack(df_series, axis=0)
-        # Remove '' at the last array position
-        arr = arr[:, 0 : n_bins_dict[key]]
-        # Deal with flag values (-9.9999)
-        arr = convert_L0_raw_fields_arr_flags(arr, key=key)
+            arr = decode_L0_raw_field(
+                df[key],
+                n_bins=n_bins,
+                delimiter=split_str,
+                dtype=get_raw_field_arr_dtype(key, sensor_name=sensor_name),
+            )
+            if key == "raw_drop_number":
+                arr = reshape_L0_raw_drop_number_matrix_to_2D(arr, n_bins_dict, n_timesteps)
         # Set dtype of the matrix
-        arr = set_raw_fields_arr_dtype(arr, key=key)
-        # For key='raw_drop_number', reshape to 2D matrix
-        if key == "raw_drop_number":
-            arr = reshape_L0_raw_drop_number_matrix_to_2D(arr, n_bins_dict, n_timesteps)
+        arr = set_raw_fields_arr_dtype(arr, key=key, sensor_name=sensor_name)
         # Add array to dictionary
         dict_data[key] = arr
 
@@ -148,9 +382,29 @@ def retrieve_L1_raw_arrays(df, sensor_name, lazy=True, verbose=False):
                 "The raw spectrum is required to compute unavaible N_D and N_V."
             )
         if "raw_drop_concentration" in unavailable_keys:
-            dict_data["raw_drop_concentration"] = get_drop_concentration(dict_data["raw_drop_number"])
+            if "sample_interval" in df.columns:
+                sample_interval = get_L0_column_values(
+                    df["sample_interval"], lazy=lazy, lengths=lengths
+                )
+            if sample_interval is None:
+                raise ValueError(
+                    "The sample interval is required to compute raw_drop_concentration."
+                )
+            arr = get_drop_concentration(
+                dict_data["raw_drop_number"],
+                sensor_name=sensor_name,
+                sample_interval=sample_interval,
+            )
+            dict_data["raw_drop_concentration"] = set_raw_fields_arr_dtype(
+                arr, key="raw_drop_concentration", sensor_name=sensor_name
+            )
         if "raw_drop_average_velocity" in unavailable_keys:
-            dict_data["raw_drop_average_velocity"] = get_drop_average_velocity(dict_data["raw_drop_number"])
+            arr = get_drop_average_velocity(
+                dict_data["raw_drop_number"], sensor_name=sensor_name
+            )
+            dict_data["raw_drop_average_velocity"] = set_raw_fields_arr_dtype(
+                arr, key="raw_drop_average_velocity", sensor_name=sensor_name
+            )
 
     # Log
     msg = " - Retrieval of L1 data matrix finished."
@@ -161,6 +415,22 @@ def retrieve_L1_raw_arrays(df, sensor_name, lazy=True, verbose=False):
     return dict_data
 
 
+def get_L0_column_values(series, lazy=True, lengths=True):
+    """Retrieve the (dask) array of a L0 column.
+
+    If lazy=True, 'lengths' are the number of rows of each dask dataframe
+    partition. If True, they are computed.
+    Categorical columns (i.e. weather codes) are decoded to object arrays.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype("object")
+    if lazy:
+        arr = series.to_dask_array(lengths=lengths)
+    else:
+        arr = series.values
+    return arr
+
+
 def get_L1_coords(sensor_name):
     check_sensor_name(sensor_name=sensor_name)
     coords = {}
@@ -196,24 +466,56 @@ def get_L1_coords(sensor_name):
     return coords
 
 
-def create_L1_dataset_from_L0(df, attrs, lazy=True, verbose=False):
+def _get_measurement_interval(attrs):
+    """Return the measurement interval [s] of the metadata (or None)."""
+    try:
+        return float(attrs.get("measurement_interval", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def create_L1_dataset_from_L0(df, attrs, lazy=True, verbose=False, previous_time=None, dict_n_values=None):
+    """Create the L1 xarray Dataset from the L0 dataframe.
+
+    When the L0 data are processed by batches, previous_time is the last
+    timestep of the previous batch (used by the time gap quality control) and
+    dict_n_values are the expected raw field array lengths of the full record.
+    """
     # Retrieve sensor name
     sensor_name = attrs["sensor_name"]
     # -----------------------------------------------------------.
-    # Preprocess raw_spectrum, diameter and velocity arrays if available
+    # Check dataframe row consistency
     if np.any(np.isin(["raw_drop_concentration", "raw_drop_average_velocity", "raw_drop_number"], df.columns)):
-        # Check dataframe row consistency
         df = check_array_lengths_consistency(
-            df, sensor_name=sensor_name, lazy=lazy, verbose=verbose
+            df, sensor_name=sensor_name, lazy=lazy, verbose=verbose, dict_n_values=dict_n_values
         )
+    # -----------------------------------------------------------.
+    # Retrieve the time coordinate
+    # - If lazy, the length of each partition is computed once (in the same pass)
+    #   and shared by all arrays, so that the dask arrays have known chunks
+    if lazy:
+        lengths, time = dask.compute(df.map_partitions(len), df["time"])
+        lengths = tuple(lengths)
+        time = time.values
+    else:
+        lengths = None
+        time = df["time"].values
+    # -----------------------------------------------------------.
+    # Preprocess raw_spectrum, diameter and velocity arrays if available
+    if np.any(np.isin(["raw_drop_concentration", "raw_drop_average_velocity", "raw_drop_number"], df.columns)):
         # Retrieve raw data matrices
         dict_data = retrieve_L1_raw_arrays(
-            df, sensor_name, lazy=lazy, verbose=verbose
+            df,
+            sensor_name,
+            lazy=lazy,
+            verbose=verbose,
+            lengths=lengths,
+            sample_interval=_get_measurement_interval(attrs),
         )
         # Define raw data matrix variables for xarray Dataset
         data_vars = {
             "raw_drop_concentration": (["time", "diameter_bin_center"], dict_data["raw_drop_concentration"]),
-            "raw_drop_average_velocity": (["time", "velocity_bin_center"], dict_data["raw_drop_average_velocity"]),
+            "raw_drop_average_velocity": (["time", "diameter_bin_center"], dict_data["raw_drop_average_velocity"]),
             "raw_drop_number": (
                 ["time", "diameter_bin_center", "velocity_bin_center"],
                 dict_data["raw_drop_number"],
@@ -226,15 +528,10 @@ def create_L1_dataset_from_L0(df, attrs, lazy=True, verbose=False):
     aux_columns = df.columns[
         np.isin(df.columns, ["raw_drop_concentration", "raw_drop_average_velocity", "raw_drop_number", "time"], invert=True)
     ]
-    if lazy:
-        aux_data_vars = {
-            column: (["time"], df[column].to_dask_array(lengths=True))
-            for column in aux_columns
-        }
-    else:
-        aux_data_vars = {
-            column: (["time"], df[column].values) for column in aux_columns
-        }
+    aux_data_vars = {
+        column: (["time"], get_L0_column_values(df[column], lazy=lazy, lengths=lengths))
+        for column in aux_columns
+    }
     data_vars.update(aux_data_vars)
 
     # -----------------------------------------------------------.
@@ -249,7 +546,7 @@ def create_L1_dataset_from_L0(df, attrs, lazy=True, verbose=False):
     # -----------------------------------------------------------.
     # Define coordinates for xarray Dataset
     coords = get_L1_coords(sensor_name=sensor_name)
-    coords["time"] = df["time"].values
+    coords["time"] = time
     coords["crs"] = attrs["crs"]
     if "latitude" in data_vars:
         coords["latitude"] = data_vars["latitude"]
@@ -281,19 +578,633 @@ def create_L1_dataset_from_L0(df, attrs, lazy=True, verbose=False):
         raise ValueError(msg)
 
     # -----------------------------------------------------------
-    # Check L1 standards
-    check_L1_standards(ds)
+    # Replace nan flags (i.e. -9.999) with NaN
+    ds = replace_L1_nan_flags(ds, sensor_name=sensor_name)
+
+    # -----------------------------------------------------------
+    # Add the bit-packed quality control flag
+    ds["qc_flag"] = get_L1_qc_flag(
+        ds,
+        sensor_name=sensor_name,
+        sample_interval=_get_measurement_interval(attrs),
+        previous_time=previous_time,
+    )
 
     # -----------------------------------------------------------
-    # TODO: Replace NA flags
+    # Set compact dtypes (defined in the L1 encoding YAML)
+    ds = set_L1_dataset_dtypes(ds, sensor_name=sensor_name)
 
     # -----------------------------------------------------------
-    # TODO: Add L1 encoding
+    # Check L1 standards (metadata only)
+    check_L1_standards(ds, sensor_name=sensor_name, verbose=verbose)
 
     # -----------------------------------------------------------
     return ds
 
 
+####--------------------------------------------------------------------------.
+#### Quality control
+# The qc_flag variable packs the quality control tests of each timestep into
+# the bits of an uint16 integer (CF flag_masks). A timestep is clean if qc_flag == 0.
+QC_FLAG_MASKS = {
+    "status_error": 1,  # a sensor status variable reports an error
+    "error_code": 2,  # the sensor error_code is not 0
+    "out_of_range": 4,  # a variable is outside the data_range of L0_data_format.yml
+    "spectrum_inconsistent": 8,  # raw_drop_number does not match the bulk variables
+    "time_gap": 16,  # the timestep follows a gap in the time series
+    "missing": 32,  # the timestep is not available (i.e. when aligning stations)
+}
+
+
+def check_qc_flags(flags):
+    """Check the QC flag names and return the corresponding bit mask."""
+    if flags is None:
+        flags = list(QC_FLAG_MASKS)
+    if isinstance(flags, str):
+        flags = [flags]
+    invalid_flags = [flag for flag in flags if flag not in QC_FLAG_MASKS]
+    if len(invalid_flags) > 0:
+        raise ValueError(f"Invalid QC flags {invalid_flags}. Valid flags are {list(QC_FLAG_MASKS)}.")
+    mask = 0
+    for flag in flags:
+        mask |= QC_FLAG_MASKS[flag]
+    return mask
+
+
+def _any_over_non_time_dims(da_bool):
+    dims = [dim for dim in da_bool.dims if dim != "time"]
+    if len(dims) > 0:
+        da_bool = da_bool.any(dim=dims)
+    return da_bool
+
+
+def get_qc_status_error(ds, sensor_name):
+    """Return a boolean DataArray flagging the timesteps with status errors."""
+    status_error = xr.zeros_like(ds["time"], dtype=bool)
+    error_code = xr.zeros_like(ds["time"], dtype=bool)
+    try:
+        error_dict = get_field_error_dict(sensor_name)
+    except NotImplementedError:
+        return status_error, error_code
+    for var, error_values in error_dict.items():
+        if var not in ds.data_vars:
+            continue
+        is_error = ds[var].isin(error_values)
+        if var == "error_code":
+            error_code = error_code | is_error
+        else:
+            status_error = status_error | is_error
+    return status_error, error_code
+
+
+def get_qc_out_of_range(ds, sensor_name):
+    """Return a boolean DataArray flagging the timesteps with values outside the data_range."""
+    out_of_range = xr.zeros_like(ds["time"], dtype=bool)
+    range_dict = get_field_value_range_dict(sensor_name)
+    for var, data_range in range_dict.items():
+        if var not in ds.data_vars or ds[var].dtype.kind not in "iuf":
+            continue
+        if not isinstance(data_range, (list, tuple)) or len(data_range) != 2:
+            continue
+        if not all(isinstance(v, (int, float)) for v in data_range):
+            continue
+        vmin, vmax = data_range
+        is_out = (ds[var] < vmin) | (ds[var] > vmax)
+        out_of_range = out_of_range | _any_over_non_time_dims(is_out)
+    return out_of_range
+
+
+def get_qc_spectrum_inconsistent(ds):
+    """Return a boolean DataArray flagging the timesteps with an inconsistent spectrum.
+
+    The spectrum is inconsistent if:
+    - it counts more drops than the number of particles detected by the sensor.
+    - it is empty while the sensor reports a rainfall rate.
+    """
+    inconsistent = xr.zeros_like(ds["time"], dtype=bool)
+    if "raw_drop_number" not in ds.data_vars or _is_raw_drop_number_gathered(ds):
+        return inconsistent
+    n_drops = ds["raw_drop_number"].sum(dim=["diameter_bin_center", "velocity_bin_center"])
+    if "number_particles" in ds.data_vars:
+        inconsistent = inconsistent | (n_drops > ds["number_particles"])
+    for var in ["rainfall_rate_32bit", "rainfall_rate"]:
+        if var in ds.data_vars:
+            inconsistent = inconsistent | ((n_drops == 0) & (ds[var] > 0))
+            break
+    return inconsistent
+
+
+def get_qc_time_gap(ds, sample_interval=None, previous_time=None):
+    """Return a boolean DataArray flagging the timesteps following a gap.
+
+    A gap is a time step longer than 1.5 times the sample interval [s].
+    The 'sample_interval' variable is used if available.
+    previous_time is the timestep preceding ds (i.e. the last timestep of
+    the previous batch), so that the first timestep of ds can be tested.
+    """
+    time = ds["time"].values
+    is_gap = np.zeros(time.size, dtype=bool)
+    # Number of leading timesteps without a previous timestep
+    n_first = 1
+    if previous_time is not None:
+        time = np.concatenate([np.array([previous_time]).astype(time.dtype), time])
+        n_first = 0
+    if time.size > 1:
+        if "sample_interval" in ds.data_vars:
+            # Use .data to keep a dask sample_interval lazy
+            sample_interval = ds["sample_interval"].data[n_first:].astype(float)
+        if sample_interval is not None:
+            dt = np.diff(time).astype("m8[ms]").astype(float) / 1000
+            is_gap_tail = dt > 1.5 * sample_interval
+            if isinstance(is_gap_tail, da.Array):
+                is_gap = da.concatenate([da.zeros(n_first, dtype=bool), is_gap_tail])
+            else:
+                is_gap[n_first:] = is_gap_tail
+    return xr.DataArray(is_gap, dims="time", coords={"time": ds["time"]})
+
+
+def get_L1_qc_flag(ds, sensor_name, sample_interval=None, previous_time=None):
+    """Compute the bit-packed uint16 qc_flag of each timestep.
+
+    All tests are vectorized and remain lazy if the Dataset is backed by dask.
+    previous_time is passed to get_qc_time_gap.
+    """
+    status_error, error_code = get_qc_status_error(ds, sensor_name)
+    dict_tests = {
+        "status_error": status_error,
+        "error_code": error_code,
+        "out_of_range": get_qc_out_of_range(ds, sensor_name),
+        "spectrum_inconsistent": get_qc_spectrum_inconsistent(ds),
+        "time_gap": get_qc_time_gap(ds, sample_interval=sample_interval, previous_time=previous_time),
+    }
+    qc_flag = xr.zeros_like(ds["time"], dtype="uint16")
+    for flag, is_flagged in dict_tests.items():
+        qc_flag = qc_flag | (is_flagged.astype("uint16") * np.uint16(QC_FLAG_MASKS[flag]))
+    qc_flag = qc_flag.astype("uint16")
+    qc_flag = qc_flag.drop_vars([c for c in qc_flag.coords if c != "time"])
+    qc_flag.attrs = {
+        "long_name": "Quality control flag",
+        "flag_masks": np.array(list(QC_FLAG_MASKS.values()), dtype="uint16"),
+        "flag_meanings": " ".join(QC_FLAG_MASKS),
+    }
+    return qc_flag
+
+
+def mask_L1_qc(ds, flags=None, drop=False):
+    """Mask the timesteps of a L1 Dataset flagged by the given QC flags.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        L1 Dataset with the qc_flag variable.
+    flags : list or str, optional
+        QC flags to mask (see QC_FLAG_MASKS). The default (None) masks all flags.
+    drop : bool, optional
+        If True, remove the flagged timesteps (it requires to compute qc_flag).
+        If False (the default), set the flagged timesteps of the
+        variables with the time dimension to NaN (lazily).
+    """
+    mask = check_qc_flags(flags)
+    is_bad = (ds["qc_flag"] & np.uint16(mask)) != 0
+    if drop:
+        return ds.isel(time=~is_bad.values)
+    # Do not modify the input Dataset
+    ds = ds.copy()
+    for var in ds.data_vars:
+        if var == "qc_flag" or "time" not in ds[var].dims:
+            continue
+        if ds[var].dtype.kind not in "iuf":
+            continue
+        ds[var] = ds[var].where(~is_bad)
+    return ds
+
+
+####--------------------------------------------------------------------------.
+#### Spectrum filter
+# Port of the Parsivel non-physical drop filter of the legacy R library
+# (0_L2_R_CODE/Lib_R/1_homogenization/filter_Parsivel_functions.R).
+# The boolean (diameter, velocity) mask is computed once per sensor configuration
+# and applied to raw_drop_number with a single broadcast multiplication.
+def get_fall_velocity(diameter, altitude=0):
+    """Compute the raindrop terminal fall velocity [m/s].
+
+    It uses the Atlas et al. (1973) relation with the air density correction
+    (rho_0/rho)^0.4 of the standard atmosphere at the station altitude [m].
+    The diameter is in mm.
+    """
+    diameter = np.asarray(diameter, dtype=float)
+    velocity = np.maximum(9.65 - 10.3 * np.exp(-0.6 * diameter), 0)
+    # Air density ratio of the standard atmosphere (troposphere)
+    density_ratio = (1 - 0.0065 * np.asarray(altitude, dtype=float) / 288.15) ** 4.2559
+    return velocity * density_ratio ** -0.4
+
+
+@functools.lru_cache(maxsize=None)
+def _get_spectrum_filter_mask(
+    sensor_name,
+    altitude,
+    min_diameter,
+    max_diameter,
+    velocity_tolerance,
+    max_diameter_no_lower_velocity,
+):
+    diameter_lower = np.asarray(get_diameter_bin_lower(sensor_name))
+    diameter_upper = np.asarray(get_diameter_bin_upper(sensor_name))
+    diameter_center = np.asarray(get_diameter_bin_center(sensor_name))
+    velocity_lower = np.asarray(get_velocity_bin_lower(sensor_name))
+    # Define the range of plausible velocities of each diameter class
+    fall_velocity = get_fall_velocity(diameter_center, altitude=altitude)
+    vmin = fall_velocity + velocity_tolerance[0]
+    vmax = fall_velocity + velocity_tolerance[1]
+    vmin[diameter_center < max_diameter_no_lower_velocity] = 0
+    # Define the velocity classes containing vmin and vmax
+    min_class = np.maximum(np.searchsorted(velocity_lower, vmin, side="right") - 1, 0)
+    max_class = np.searchsorted(velocity_lower, vmax, side="right") - 1
+    velocity_class = np.arange(velocity_lower.size)
+    mask = (velocity_class[None, :] >= min_class[:, None]) & (
+        velocity_class[None, :] <= max_class[:, None]
+    )
+    # Remove the diameter classes outside [min_diameter, max_diameter]
+    is_valid_diameter = (diameter_upper <= max_diameter) & (diameter_lower >= min_diameter)
+    mask &= is_valid_diameter[:, None]
+    mask.flags.writeable = False
+    return mask
+
+
+def get_spectrum_filter_mask(
+    sensor_name,
+    altitude=0,
+    min_diameter=0,
+    max_diameter=7.5,
+    velocity_tolerance=(-3, 4),
+    max_diameter_no_lower_velocity=2,
+):
+    """Return the boolean (diameter, velocity) mask of the plausible drops.
+
+    A drop is kept if its diameter class is within [min_diameter, max_diameter] mm
+    and its velocity class overlaps the fall velocity + velocity_tolerance [m/s].
+    No lower velocity bound is applied to drops smaller than
+    max_diameter_no_lower_velocity mm.
+    The mask is cached and read-only.
+    """
+    return _get_spectrum_filter_mask(
+        sensor_name,
+        float(altitude),
+        float(min_diameter),
+        float(max_diameter),
+        tuple(float(v) for v in velocity_tolerance),
+        float(max_diameter_no_lower_velocity),
+    )
+
+
+def filter_raw_drop_number(ds, sensor_name=None, altitude=None, **kwargs):
+    """Remove the non-physical drops of raw_drop_number.
+
+    The mask of get_spectrum_filter_mask is applied to all timesteps with a
+    single broadcast multiplication (lazy with dask).
+    If altitude is None, the station altitude coordinate is used.
+    Additional kwargs are passed to get_spectrum_filter_mask.
+    """
+    if sensor_name is None:
+        sensor_name = ds.attrs["sensor_name"]
+    if altitude is None:
+        altitude = float(ds["altitude"].values) if "altitude" in ds.coords and ds["altitude"].size == 1 else 0
+    if _is_raw_drop_number_gathered(ds):
+        ds = decode_raw_drop_number_sparse(ds)
+    # Do not modify the input Dataset
+    ds = ds.copy()
+    mask = get_spectrum_filter_mask(sensor_name, altitude=altitude, **kwargs)
+    da_mask = xr.DataArray(
+        mask.astype(ds["raw_drop_number"].dtype),
+        dims=["diameter_bin_center", "velocity_bin_center"],
+    )
+    attrs = ds["raw_drop_number"].attrs.copy()
+    attrs["spectrum_filter"] = "non-physical drops removed"
+    ds["raw_drop_number"] = ds["raw_drop_number"] * da_mask
+    ds["raw_drop_number"].attrs = attrs
+    return ds
+
+
+####--------------------------------------------------------------------------.
+#### Sparse raw_drop_number
+# The raw_drop_number spectrum is usually more than 95% zeros.
+# - In memory, it can be represented as a sparse.COO array (optional 'sparse' package).
+# - On disk, it can be stored with the CF 'compression by gathering':
+#   the raw_drop_number_index coordinate contains the flattened (diameter, velocity)
+#   indices of the non-zero bins of each timestep and raw_drop_number contains their counts.
+#   The raw_drop_number_nnz variable contains the number of non-zero bins of each
+#   timestep (as the count variable of a CF contiguous ragged array).
+RAW_DROP_NUMBER_DIMS = ["time", "diameter_bin_center", "velocity_bin_center"]
+
+
+def _import_sparse():
+    try:
+        import sparse
+    except ImportError:
+        raise ImportError(
+            "The 'sparse' package is required. Install it with 'conda install -c conda-forge sparse'."
+        )
+    return sparse
+
+
+def _is_raw_drop_number_gathered(ds):
+    """Check if raw_drop_number is encoded with the CF compression by gathering."""
+    return "raw_drop_number_index" in ds.coords
+
+
+def sparsify_raw_drop_number(ds):
+    """Convert the raw_drop_number array to a sparse.COO array.
+
+    If raw_drop_number is a dask array, each chunk is converted to sparse.COO.
+    """
+    sparse = _import_sparse()
+    data = ds["raw_drop_number"].data
+    if isinstance(data, da.Array):
+        data = data.map_blocks(sparse.COO.from_numpy, dtype=data.dtype)
+    elif not isinstance(data, sparse.COO):
+        data = sparse.COO.from_numpy(np.asarray(data))
+    ds["raw_drop_number"] = ds["raw_drop_number"].copy(data=data)
+    return ds
+
+
+def densify_raw_drop_number(ds):
+    """Convert a sparse raw_drop_number array to a dense numpy (or dask) array."""
+    sparse = _import_sparse()
+    data = ds["raw_drop_number"].data
+    if isinstance(data, da.Array):
+        data = data.map_blocks(
+            lambda x: x.todense() if isinstance(x, sparse.COO) else x, dtype=data.dtype
+        )
+    elif isinstance(data, sparse.COO):
+        data = data.todense()
+    ds["raw_drop_number"] = ds["raw_drop_number"].copy(data=data)
+    return ds
+
+
+def _get_gathered_index_dtype(n_bins):
+    """Return the smallest integer dtype indexing the n_bins of a timestep spectrum."""
+    return np.dtype("uint16") if n_bins <= np.iinfo("uint16").max + 1 else np.dtype("int32")
+
+
+def _encode_raw_drop_number_block(block, index_dtype):
+    """Return the number of non-zero bins, the bin index and the counts of a (time, diameter, velocity) block."""
+    if type(block).__name__ == "COO":
+        block = block.todense()
+    block = np.asarray(block).reshape(block.shape[0], -1)
+    time_index, bin_index = np.nonzero(block)
+    nnz = np.bincount(time_index, minlength=block.shape[0]).astype(index_dtype)
+    return nnz, bin_index.astype(index_dtype), block[time_index, bin_index]
+
+
+def encode_raw_drop_number_sparse(ds):
+    """Encode raw_drop_number into index and count arrays.
+
+    It follows the CF conventions 'compression by gathering'.
+    If raw_drop_number is a dask array, each time chunk is encoded separately
+    (in parallel) and the dense spectrum is never loaded entirely in memory.
+    The round-trip with decode_raw_drop_number_sparse is lossless.
+    """
+    da_raw = ds["raw_drop_number"].transpose(*RAW_DROP_NUMBER_DIMS)
+    n_bins = int(np.prod(da_raw.shape[1:]))
+    index_dtype = _get_gathered_index_dtype(n_bins)
+    data = da_raw.data
+    if isinstance(data, da.Array):
+        data = data.rechunk({1: -1, 2: -1})
+        list_blocks = [
+            dask.delayed(_encode_raw_drop_number_block)(block, index_dtype)
+            for block in data.to_delayed().ravel()
+        ]
+        list_blocks = dask.compute(*list_blocks)
+    else:
+        list_blocks = [_encode_raw_drop_number_block(data, index_dtype)]
+    nnz, index, counts = [np.concatenate(arrays) for arrays in zip(*list_blocks)]
+    counts = counts.astype(da_raw.dtype)
+    # Replace raw_drop_number with the gathered arrays
+    attrs = da_raw.attrs
+    ds = ds.drop_vars("raw_drop_number")
+    ds = ds.assign_coords(
+        raw_drop_number_index=(
+            "raw_drop_number_index",
+            index,
+            {"compress": " ".join(RAW_DROP_NUMBER_DIMS[1:])},
+        )
+    )
+    ds["raw_drop_number"] = (("raw_drop_number_index",), counts, attrs)
+    ds["raw_drop_number_nnz"] = (
+        ("time",),
+        nnz,
+        {
+            "long_name": "Number of non-zero raw_drop_number bins",
+            "sample_dimension": "raw_drop_number_index",
+        },
+    )
+    return ds
+
+
+def decode_raw_drop_number_sparse(ds, sparse=False):
+    """Decode the raw_drop_number index and count arrays.
+
+    If sparse=True, raw_drop_number is returned as a sparse.COO array.
+    Otherwise, it is returned as a dense numpy array.
+    """
+    if not _is_raw_drop_number_gathered(ds):
+        return ds
+    dims = ["time"] + ds["raw_drop_number_index"].attrs["compress"].split(" ")
+    shape = tuple(ds.sizes[dim] for dim in dims)
+    index = ds["raw_drop_number_index"].values
+    counts = ds["raw_drop_number"].values
+    nnz = ds["raw_drop_number_nnz"].values
+    time_index = np.repeat(np.arange(shape[0]), nnz)
+    attrs = ds["raw_drop_number"].attrs
+    if sparse:
+        sparse = _import_sparse()
+        coords = np.stack([time_index, *np.unravel_index(index, shape[1:])], axis=0)
+        arr = sparse.COO(coords, counts, shape=shape)
+    else:
+        arr = np.zeros((shape[0], int(np.prod(shape[1:]))), dtype=counts.dtype)
+        arr[time_index, index] = counts
+        arr = arr.reshape(shape)
+    ds = ds.drop_vars(["raw_drop_number", "raw_drop_number_index", "raw_drop_number_nnz"])
+    ds["raw_drop_number"] = (dims, arr, attrs)
+    return ds
+
+
+####--------------------------------------------------------------------------.
+#### Chunking
+# - Storage chunks are sized to a target number of bytes (of the encoded dtype).
+#   The netCDF default fits the 1 MiB HDF5 chunk cache.
+# - Dask chunks are multiples of the storage chunks along time.
+ACCESS_PATTERNS = ["timeseries", "snapshot"]
+NETCDF_TARGET_CHUNK_BYTES = 2**20
+ZARR_TARGET_CHUNK_BYTES = 4 * 2**20
+DASK_TARGET_CHUNK_BYTES = 128 * 2**20
+
+
+def check_access_pattern(access_pattern):
+    if access_pattern is not None and access_pattern not in ACCESS_PATTERNS:
+        msg = f"Valid access_pattern are {ACCESS_PATTERNS} or None."
+        logger.exception(msg)
+        raise ValueError(msg)
+
+
+def get_optimal_chunks(shape, dtype, target_chunk_bytes):
+    """Define a chunk shape of about target_chunk_bytes.
+
+    The chunk spans all the spectrum bins and extends along time.
+    The bin dimensions are split only if a single timestep exceeds the target.
+    """
+    itemsize = np.dtype(dtype).itemsize
+    chunks = [1] + list(shape[1:])
+    while np.prod(chunks) * itemsize > target_chunk_bytes and max(chunks[1:], default=1) > 1:
+        i = int(np.argmax(chunks[1:])) + 1
+        chunks[i] = int(np.ceil(chunks[i] / 2))
+    chunks[0] = max(1, int(target_chunk_bytes // (itemsize * np.prod(chunks[1:]))))
+    return chunks
+
+
+def get_L1_chunks(ds, dtype_dict, target_chunk_bytes, access_pattern="timeseries"):
+    """Define the storage chunks of each numeric L1 variable.
+
+    - 'timeseries'': each variable gets the longest time chunk fitting the
+      target, so that reading long time series touches few chunks.
+    - 'snapshot': all variables share the time chunk of the largest
+      variable (the spectrum), so that reading a time window touches
+      small chunks across all variables.
+    """
+    check_access_pattern(access_pattern)
+    # String variables have no fixed itemsize and keep their YAML chunks
+    dtype_dict = {var: np.dtype(dtype_dict.get(var, ds[var].dtype)) for var in ds.data_vars}
+    chunks_dict = {
+        var: get_optimal_chunks(
+            shape=ds[var].shape,
+            dtype=dtype,
+            target_chunk_bytes=target_chunk_bytes,
+        )
+        for var, dtype in dtype_dict.items()
+        if dtype.kind in "biuf"
+    }
+    if access_pattern == "snapshot" and len(chunks_dict) > 0:
+        time_chunk = min([chunks[0] for chunks in chunks_dict.values()])
+        for var in chunks_dict.keys():
+            chunks_dict[var][0] = time_chunk
+    return chunks_dict
+
+
+def optimize_encodings_chunks(
+    ds, encoding_dict, target_chunk_bytes, access_pattern, chunks_key="chunksizes"
+):
+    """Set the encoding chunks of each variable using get_L1_chunks.
+
+    If access_pattern is None, the chunks of the encoding YAML file are kept.
+    """
+    check_access_pattern(access_pattern)
+    if access_pattern is None:
+        return encoding_dict
+    dtype_dict = {var: encoding_dict[var]["dtype"] for var in ds.data_vars}
+    chunks_dict = get_L1_chunks(
+        ds,
+        dtype_dict=dtype_dict,
+        target_chunk_bytes=target_chunk_bytes,
+        access_pattern=access_pattern,
+    )
+    for var, chunks in chunks_dict.items():
+        encoding_dict[var][chunks_key] = chunks
+        if "contiguous" in encoding_dict[var]:
+            encoding_dict[var]["contiguous"] = False
+    return encoding_dict
+
+
+def get_dask_chunks(chunks, shape, dtype, dask_chunk_bytes=DASK_TARGET_CHUNK_BYTES):
+    """Define dask chunks as a multiple of the storage chunks along time."""
+    itemsize = np.dtype(dtype).itemsize
+    storage_chunk_bytes = itemsize * np.prod(chunks)
+    n_chunks = max(1, int(dask_chunk_bytes // storage_chunk_bytes))
+    time_chunk = min(chunks[0] * n_chunks, max(shape[0], 1))
+    return [time_chunk] + list(chunks[1:])
+
+
+####--------------------------------------------------------------------------.
+#### Write-time statistics
+# The min/max of each numeric variable is computed while writing and stored in
+# the CF 'actual_range' attribute, so that the L1 products can be checked
+# with check_L1_standards without reading the data.
+def _get_L1_stored_values(da_var, encoding):
+    """Return the (lazy) values of a variable as stored with the given encoding.
+
+    With an integer encoding dtype, the values outside the dtype range wrap
+    around, as done by the netCDF and Zarr writers.
+    """
+    dtype = encoding.get("dtype", None)
+    if dtype is None or np.dtype(dtype).kind not in "iu":
+        return da_var
+    scale_factor = encoding.get("scale_factor", None)
+    add_offset = encoding.get("add_offset", None)
+    is_scaled = scale_factor is not None or add_offset is not None
+    scale_factor = 1 if scale_factor is None else scale_factor
+    add_offset = 0 if add_offset is None else add_offset
+    values = da_var
+    if is_scaled:
+        values = np.round((values - add_offset) / scale_factor)
+    is_valid = values.notnull()
+    stored = values.where(is_valid, 0).astype(dtype)
+    if is_scaled:
+        stored = stored * scale_factor + add_offset
+    return stored.where(is_valid) if da_var.dtype.kind == "f" else stored
+
+
+def get_L1_actual_range(ds, encoding_dict=None):
+    """Return a dictionary with the (lazy) min and max of each numeric variable.
+
+    If encoding_dict is provided, the statistics are computed on the values
+    as stored with these encodings (see _get_L1_stored_values).
+    """
+    encoding_dict = {} if encoding_dict is None else encoding_dict
+    dict_range = {}
+    for var in ds.data_vars:
+        if var == "qc_flag" or ds[var].dtype.kind not in "biuf":
+            continue
+        da_var = _get_L1_stored_values(ds[var], encoding_dict.get(var, {}))
+        dict_range[var] = (da_var.min().data, da_var.max().data)
+    return dict_range
+
+
+def _merge_actual_range(actual_range, existing_range=None):
+    vmin, vmax = np.asarray(actual_range[0]).item(), np.asarray(actual_range[1]).item()
+    if existing_range is not None and len(existing_range) == 2:
+        vmin = np.nanmin([vmin, existing_range[0]])
+        vmax = np.nanmax([vmax, existing_range[1]])
+    return [vmin, vmax]
+
+
+def set_L1_actual_range_attrs(fpath, dict_range, append=False):
+    """Write the actual_range attributes in a L1 netCDF or Zarr store.
+
+    Only the metadata are updated. If append=True, the ranges are merged with
+    the actual_range already present in the file.
+    Variables with only NaN values do not get the attribute.
+    """
+    if fpath.endswith(".zarr"):
+        group = zarr.open_group(fpath, mode="r+")
+        for var, actual_range in dict_range.items():
+            existing_range = group[var].attrs.get("actual_range") if append else None
+            actual_range = _merge_actual_range(actual_range, existing_range)
+            if not np.any(np.isnan(actual_range)):
+                group[var].attrs["actual_range"] = [float(v) for v in actual_range]
+        zarr.consolidate_metadata(fpath)
+    else:
+        import netCDF4
+
+        with netCDF4.Dataset(fpath, mode="a") as nc:
+            for var, actual_range in dict_range.items():
+                nc_var = nc.variables[var]
+                existing_range = None
+                if append and "actual_range" in nc_var.ncattrs():
+                    existing_range = nc_var.getncattr("actual_range")
+                actual_range = _merge_actual_range(actual_range, existing_range)
+                if not np.any(np.isnan(actual_range)):
+                    nc_var.setncattr("actual_range", np.array(actual_range, dtype="float64"))
+
+
 ####--------------------------------------------------------------------------.
 #### Writers
 def sanitize_encodings_dict(encoding_dict, ds):
@@ -309,39 +1220,845 @@ def sanitize_encodings_dict(encoding_dict, ds):
     return encoding_dict
 
 
-def rechunk_dataset(ds, encoding_dict):
+def rechunk_dataset(ds, encoding_dict, chunks_key="chunksizes", dask_chunk_bytes=None):
     for var in ds.data_vars:
-        chunks = encoding_dict[var]["chunksizes"]
+        chunks = encoding_dict[var][chunks_key]
         if chunks is not None:
+            if dask_chunk_bytes is not None:
+                chunks = get_dask_chunks(
+                    chunks,
+                    shape=ds[var].shape,
+                    dtype=ds[var].dtype,
+                    dask_chunk_bytes=dask_chunk_bytes,
+                )
             ds[var] = ds[var].chunk(chunks)
     return ds
 
 
-def write_L1_to_netcdf(ds, fpath, sensor_name):
+def _set_encoding_dtypes(encoding_dict, encoding_dtypes=None):
+    """Override the dtype of the variables encodings."""
+    if encoding_dtypes is None:
+        return encoding_dict
+    for var, dtype in encoding_dtypes.items():
+        if var in encoding_dict:
+            encoding_dict[var]["dtype"] = dtype
+    return encoding_dict
+
+
+def _set_L1_written_metadata(delayed_write, fpath, dict_range, time, append=False):
+    """Set the actual_range attributes and the time index of a written L1 product."""
+    set_L1_actual_range_attrs(fpath, dict_range, append=append)
+    write_L1_time_index(fpath, time=time, append=append)
+
+
+def _finalize_L1_write(delayed_write, fpath, dict_range, time, append=False, compute=True):
+    """Compute the L1 write and its statistics in a single pass, then set the metadata.
+
+    If compute=False, return the corresponding dask.delayed object.
+    """
+    delayed_finalize = dask.delayed(_set_L1_written_metadata)(
+        delayed_write, fpath, dict_range, time, append=append
+    )
+    if not compute:
+        return delayed_finalize
+    delayed_finalize.compute()
+    return None
+
+
+def write_L1_to_netcdf(
+    ds,
+    fpath,
+    sensor_name,
+    sparse=False,
+    access_pattern="timeseries",
+    target_chunk_bytes=NETCDF_TARGET_CHUNK_BYTES,
+    unlimited_dims=None,
+    encoding_dtypes=None,
+    compute=True,
+):
+    """Write the L1 dataset to netCDF.
+
+    If sparse=True, raw_drop_number is stored as index and count arrays
+    (see encode_raw_drop_number_sparse).
+    The chunks are defined by get_L1_chunks for the given access_pattern
+    ('timeseries' or 'snapshot'). If access_pattern=None, the chunksizes
+    of L1_netcdf_encodings.yml are used.
+    Specify unlimited_dims=["time"] to enable appending with append_L1_to_netcdf.
+    encoding_dtypes is an optional dictionary of dtypes overriding the
+    dtypes of L1_netcdf_encodings.yml.
+    If compute=False, a dask.delayed object writing the data (and the
+    actual_range attributes and time index) is returned.
+    """
     from disdrodb.standards import get_L1_netcdf_encoding_dict
 
     # Get encoding dictionary
     encoding_dict = get_L1_netcdf_encoding_dict(sensor_name)
+    encoding_dict = _set_encoding_dtypes(encoding_dict, encoding_dtypes)
+    encoding_dict = optimize_encodings_chunks(
+        ds,
+        encoding_dict,
+        target_chunk_bytes=target_chunk_bytes,
+        access_pattern=access_pattern,
+    )
+
+    # Define the (lazy) statistics stored in the actual_range attributes
+    dict_range = get_L1_actual_range(ds, encoding_dict=encoding_dict)
+
+    # Encode raw_drop_number as index and count arrays
+    if sparse and "raw_drop_number" in ds.data_vars:
+        ds = encode_raw_drop_number_sparse(ds)
+        chunks = encoding_dict["raw_drop_number"]["chunksizes"]
+        nnz_encoding = encoding_dict["raw_drop_number"].copy()
+        if chunks is not None:
+            encoding_dict["raw_drop_number"]["chunksizes"] = [int(np.prod(chunks))]
+            nnz_encoding["chunksizes"] = [chunks[0]]
+        encoding_dict["raw_drop_number_nnz"] = nnz_encoding
     encoding_dict = {k: encoding_dict[k] for k in ds.data_vars}
 
     # Ensure chunksize smaller than the array shape)
     encoding_dict = sanitize_encodings_dict(encoding_dict, ds)
 
+    # Compress the gathering index and the number of non-zero bins like the counts
+    if _is_raw_drop_number_gathered(ds):
+        encoding_dict["raw_drop_number_index"] = encoding_dict["raw_drop_number"].copy()
+        for var in ["raw_drop_number_index", "raw_drop_number_nnz"]:
+            encoding_dict[var]["dtype"] = ds[var].dtype
+            _ = encoding_dict[var].pop("_FillValue", None)
+
     # Rechunk variables for fast writing !
-    ds = rechunk_dataset(ds, encoding_dict)
+    ds = rechunk_dataset(ds, encoding_dict, dask_chunk_bytes=DASK_TARGET_CHUNK_BYTES)
 
-    # Write netcdf
-    ds.to_netcdf(fpath, engine="netcdf4", encoding=encoding_dict)
+    # Write netcdf (the statistics are computed in the same pass)
+    delayed_write = ds.to_netcdf(
+        fpath,
+        engine="netcdf4",
+        encoding=encoding_dict,
+        unlimited_dims=unlimited_dims,
+        compute=False,
+    )
+    # Add the actual_range attributes and write the time index sidecar
+    return _finalize_L1_write(delayed_write, fpath, dict_range, ds["time"].values, compute=compute)
 
 
-def write_L1_to_zarr(ds, fpath, sensor_name):
-    pass
-    # ds = rechunk_L1_dataset(ds, sensor_name=sensor_name)
-    # zarr_encoding_dict = get_L1_zarr_encodings_standards(sensor_name=sensor_name)
-    # ds.to_zarr(fpath, encoding=zarr_encoding_dict, mode="w")
+def append_L1_to_netcdf(ds, fpath):
+    """Append the L1 dataset along the unlimited time dimension of a netCDF.
+
+    The netCDF must have been created by write_L1_to_netcdf with
+    unlimited_dims=["time"]. The encodings of the existing file are used.
+    """
+    import netCDF4
+
+    with netCDF4.Dataset(fpath, mode="a") as nc:
+        n_existing = nc.dimensions["time"].size
+        n_new = ds.sizes["time"]
+        time_var = nc.variables["time"]
+        time = pd.DatetimeIndex(ds["time"].values).to_pydatetime()
+        time_var[n_existing : n_existing + n_new] = netCDF4.date2num(
+            time,
+            units=time_var.units,
+            calendar=getattr(time_var, "calendar", "standard"),
+        )
+        encoding_dict = {}
+        for var in ds.data_vars:
+            nc_var = nc.variables[var]
+            encoding_dict[var] = {
+                "dtype": nc_var.dtype,
+                "scale_factor": getattr(nc_var, "scale_factor", None),
+                "add_offset": getattr(nc_var, "add_offset", None),
+            }
+            if "time" in ds[var].dims:
+                nc_var[n_existing : n_existing + n_new, ...] = ds[var].values
+    # Update the actual_range attributes
+    dict_range = dask.compute(get_L1_actual_range(ds, encoding_dict=encoding_dict))[0]
+    set_L1_actual_range_attrs(fpath, dict_range, append=True)
+    # Update the time index sidecar
+    write_L1_time_index(fpath, time=ds["time"].values, append=True)
+
+
+def split_dataset_by_period(ds, period="monthly"):
+    """Split the L1 dataset (sorted by time) into a dictionary of period datasets.
+
+    The subsets are lazy slices of ds.
+    The keys are the period labels (i.e. '2018', '201801' or '20180101').
+    """
+    from disdrodb.io import check_L1_period, L1_PERIOD_FORMATS
+
+    check_L1_period(period)
+    time = pd.DatetimeIndex(ds["time"].values)
+    if not time.is_monotonic_increasing:
+        msg = "The L1 dataset must be sorted by time to be split by period."
+        logger.exception(msg)
+        raise ValueError(msg)
+    labels = np.asarray(time.strftime(L1_PERIOD_FORMATS[period]))
+    unique_labels, idx_start = np.unique(labels, return_index=True)
+    idx_end = np.append(idx_start[1:], len(labels))
+    dict_ds = {
+        label: ds.isel(time=slice(start, end))
+        for label, start, end in zip(unique_labels, idx_start, idx_end)
+    }
+    return dict_ds
+
+
+def _write_L1_to_netcdf_task(args):
+    """Write a period dataset in a worker process."""
+    ds, fpath, sensor_name, kwargs = args
+    with dask.config.set(scheduler="synchronous"):
+        write_L1_to_netcdf(ds, fpath=fpath, sensor_name=sensor_name, **kwargs)
+    return fpath
+
+
+def write_L1_to_netcdf_by_period(
+    ds,
+    processed_dir,
+    station_id,
+    sensor_name,
+    period="monthly",
+    suffix="",
+    parallel=True,
+    n_workers=None,
+    verbose=False,
+    **kwargs,
+):
+    """Write the L1 dataset into one netCDF per period (daily/monthly/yearly).
+
+    If parallel=True, the files are written concurrently in a process pool.
+    Processes are used because netCDF4/HDF5 writes are serialized by a
+    global lock within a process (as with xr.save_mfdataset).
+    The period datasets are computed together in the main process before being
+    sent to the workers, so that the upstream graph (i.e. the L0 parsing) is
+    computed once and not by each worker.
+    Additional kwargs are passed to write_L1_to_netcdf.
+    Returns the list of written filepaths.
+    Use disdrodb.io.read_L1_data to reopen the files lazily.
+    """
+    import concurrent.futures
+    from disdrodb.io import get_L1_netcdf_fpath, get_L1_period_suffix
+
+    dict_ds = split_dataset_by_period(ds, period=period)
+    if parallel and len(dict_ds) > 1:
+        dict_ds = dict(zip(dict_ds, dask.compute(*dict_ds.values())))
+    list_tasks = [
+        (
+            ds_period,
+            get_L1_netcdf_fpath(
+                processed_dir,
+                station_id,
+                suffix=get_L1_period_suffix(label, suffix=suffix),
+            ),
+            sensor_name,
+            kwargs,
+        )
+        for label, ds_period in dict_ds.items()
+    ]
+    msg = f" - Writing {len(list_tasks)} {period} L1 netCDF files of station {station_id}"
+    if verbose:
+        print(msg)
+    logger.info(msg)
+    if parallel and len(list_tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+            fpaths = list(executor.map(_write_L1_to_netcdf_task, list_tasks))
+    else:
+        fpaths = [_write_L1_to_netcdf_task(task) for task in list_tasks]
+    return fpaths
+
+
+def _get_zarr_append_time_chunks(n_existing, n_new, chunk):
+    """Define dask time chunks that fill the last partial Zarr chunk first."""
+    first_chunk = min((chunk - n_existing % chunk) % chunk or chunk, n_new)
+    time_chunks = [first_chunk]
+    n_remaining = n_new - first_chunk
+    while n_remaining > 0:
+        time_chunks.append(min(chunk, n_remaining))
+        n_remaining -= chunk
+    return tuple(time_chunks)
+
+
+def _get_zarr_format_kwargs(encoding_dict):
+    """Adapt the Zarr encodings and to_zarr arguments to the installed zarr version.
+
+    zarr>=3 expects a tuple of 'compressors' instead of a 'compressor'.
+    The stores are written in the Zarr v2 format with both zarr versions.
+    """
+    import zarr
+
+    if int(zarr.__version__.split(".")[0]) < 3:
+        return encoding_dict, {}
+    for var_encoding in encoding_dict.values():
+        if "compressor" in var_encoding:
+            compressor = var_encoding.pop("compressor")
+            var_encoding["compressors"] = (compressor,) if compressor is not None else None
+    return encoding_dict, {"zarr_format": 2}
+
+
+def write_L1_to_zarr(
+    ds,
+    fpath,
+    sensor_name,
+    append=False,
+    access_pattern="timeseries",
+    target_chunk_bytes=ZARR_TARGET_CHUNK_BYTES,
+    encoding_dtypes=None,
+    compute=True,
+):
+    """Write the L1 dataset to a Zarr store with consolidated metadata.
+
+    If append=True and the store already exists, the dataset is appended
+    along the time dimension using the encodings of the existing store.
+    Otherwise the store is (over)written.
+    The chunks are defined by get_L1_chunks for the given access_pattern
+    ('timeseries' or 'snapshot'). If access_pattern=None, the chunks
+    of L1_zarr_encodings.yml are used.
+    encoding_dtypes is an optional dictionary of dtypes overriding the
+    dtypes of L1_zarr_encodings.yml.
+    If compute=False, a dask.delayed object writing the data (and the
+    actual_range attributes and time index) is returned.
+    """
+    from disdrodb.standards import get_L1_zarr_encoding_dict
+
+    # Get encoding dictionary
+    encoding_dict = get_L1_zarr_encoding_dict(sensor_name)
+    encoding_dict = _set_encoding_dtypes(encoding_dict, encoding_dtypes)
+    encoding_dict = {k: encoding_dict[k] for k in ds.data_vars}
+    encoding_dict = optimize_encodings_chunks(
+        ds,
+        encoding_dict,
+        target_chunk_bytes=target_chunk_bytes,
+        access_pattern=access_pattern,
+        chunks_key="chunks",
+    )
+
+    # Align dask chunks to the Zarr chunks (required for safe parallel writes)
+    ds = rechunk_dataset(
+        ds, encoding_dict, chunks_key="chunks", dask_chunk_bytes=DASK_TARGET_CHUNK_BYTES
+    )
+
+    # Append to an existing store
+    if append and os.path.exists(fpath):
+        ds_existing = xr.open_zarr(fpath, consolidated=True)
+        n_existing = ds_existing.sizes["time"]
+        for var in ds.data_vars:
+            chunk = ds_existing[var].encoding["chunks"][0]
+            time_chunks = _get_zarr_append_time_chunks(
+                n_existing, ds[var].shape[0], chunk
+            )
+            ds[var] = ds[var].chunk({"time": time_chunks})
+        existing_encoding_dict = {var: ds_existing[var].encoding for var in ds.data_vars}
+        ds_existing.close()
+        dict_range = get_L1_actual_range(ds, encoding_dict=existing_encoding_dict)
+        delayed_write = ds.to_zarr(
+            fpath, mode="a", append_dim="time", consolidated=True, compute=False
+        )
+        return _finalize_L1_write(
+            delayed_write, fpath, dict_range, ds["time"].values, append=True, compute=compute
+        )
+
+    # Write a new store
+    for var in encoding_dict.keys():
+        if encoding_dict[var]["chunks"] is None:
+            _ = encoding_dict[var].pop("chunks")
+    dict_range = get_L1_actual_range(ds, encoding_dict=encoding_dict)
+    encoding_dict, zarr_kwargs = _get_zarr_format_kwargs(encoding_dict)
+    delayed_write = ds.to_zarr(
+        fpath, mode="w", encoding=encoding_dict, consolidated=True, compute=False, **zarr_kwargs
+    )
+    return _finalize_L1_write(delayed_write, fpath, dict_range, ds["time"].values, compute=compute)
+
+
+####--------------------------------------------------------------------------.
+#### Streaming L0 to L1 processing
+def write_L1_from_L0_batches(
+    processed_dir,
+    station_id,
+    attrs,
+    fpath,
+    output_format="netcdf",
+    batch_size=100_000,
+    verbose=False,
+):
+    """Create the L1 product from the L0 Apache Parquet by batches.
+
+    The L0 row groups are read batch by batch, converted to a L1 dataset in
+    memory and appended along time to a netCDF (unlimited time dimension)
+    or to a Zarr store. The peak memory depends on batch_size and not on the
+    length of the record.
+    The expected raw field array lengths are computed once for the full record
+    (reading only the raw fields) and the last timestep of each batch is passed
+    to the next one, so that the output equals the one of the in-memory processing.
+    """
+    import pyarrow.parquet as pq
+    from disdrodb.io import check_L0_is_available
+    from disdrodb.io import get_L0_fpaths
+    from disdrodb.io import iterate_L0_batches
+    from disdrodb.check_standards import get_raw_fields_n_values
+    from disdrodb.standards import get_raw_field_nbins
+
+    if output_format not in ["netcdf", "zarr"]:
+        msg = "Valid output_format are 'netcdf' and 'zarr'."
+        logger.exception(msg)
+        raise ValueError(msg)
+    sensor_name = attrs["sensor_name"]
+    # Compute the expected raw field array lengths of the full record
+    check_L0_is_available(processed_dir, station_id)
+    columns = pq.ParquetFile(get_L0_fpaths(processed_dir, station_id)[0]).schema_arrow.names
+    raw_fields = [key for key in get_raw_field_nbins(sensor_name=sensor_name) if key in columns]
+    dict_n_values = get_raw_fields_n_values(
+        iterate_L0_batches(processed_dir, station_id, batch_size=batch_size, columns=raw_fields),
+        sensor_name=sensor_name,
+    )
+    n_timesteps = 0
+    previous_time = None
+    for i, df in enumerate(
+        iterate_L0_batches(processed_dir, station_id, batch_size=batch_size)
+    ):
+        ds = create_L1_dataset_from_L0(
+            df=df,
+            attrs=attrs,
+            lazy=False,
+            verbose=False,
+            previous_time=previous_time,
+            dict_n_values=dict_n_values,
+        )
+        if ds.sizes["time"] == 0:
+            continue
+        previous_time = ds["time"].values[-1]
+        if output_format == "zarr":
+            write_L1_to_zarr(ds, fpath=fpath, sensor_name=sensor_name, append=n_timesteps > 0)
+        elif n_timesteps == 0:
+            # L0 time has seconds resolution
+            ds["time"].encoding.update(
+                {"units": "seconds since 1970-01-01 00:00:00", "dtype": "int64"}
+            )
+            write_L1_to_netcdf(
+                ds, fpath=fpath, sensor_name=sensor_name, unlimited_dims=["time"]
+            )
+        else:
+            append_L1_to_netcdf(ds, fpath=fpath)
+        n_timesteps += ds.sizes["time"]
+        msg = f" - L1 batch {i} of station_id {station_id} written ({n_timesteps} timesteps)"
+        if verbose:
+            print(msg)
+        logger.info(msg)
+    return fpath
+
+
+####--------------------------------------------------------------------------.
+#### Fused raw to L1 processing
+def process_raw_to_L1(
+    raw_dir,
+    processed_dir,
+    station_id,
+    attrs,
+    glob_pattern,
+    column_names,
+    reader_kwargs,
+    df_sanitizer_fun=None,
+    write_L0=False,
+    write_netcdf=True,
+    write_zarr=False,
+    lazy=True,
+    force=False,
+    verbose=False,
+    debugging_mode=False,
+):
+    """Create the L1 products directly from the raw data files.
+
+    The parsed and sanitized dataframe is passed straight to
+    create_L1_dataset_from_L0, without rereading the L0 Apache Parquet.
+    If write_L0=True, the L0 Apache Parquet is written as a side output.
+    If lazy=True, the dataframe is persisted so that the raw files are parsed
+    only once for both outputs.
+    """
+    import time
+    from disdrodb.io import get_L0_fpath
+    from disdrodb.io import get_L1_netcdf_fpath
+    from disdrodb.io import get_L1_zarr_fpath
+    from disdrodb.L0_proc import get_file_list
+    from disdrodb.L0_proc import read_L0_raw_file_list
+    from disdrodb.L0_proc import write_df_to_parquet
+    from disdrodb.L0_proc import _sort_by_time
+
+    sensor_name = attrs["sensor_name"]
+    t_i = time.time()
+    msg = f" - Fused raw to L1 processing of station_id {station_id} has started."
+    if verbose:
+        print(msg)
+    logger.info(msg)
+
+    # Read all raw data files into a dataframe
+    file_list = get_file_list(
+        raw_dir=raw_dir,
+        glob_pattern=glob_pattern,
+        verbose=verbose,
+        debugging_mode=debugging_mode,
+    )
+    df = read_L0_raw_file_list(
+        file_list=file_list,
+        column_names=column_names,
+        reader_kwargs=reader_kwargs,
+        df_sanitizer_fun=df_sanitizer_fun,
+        lazy=lazy,
+        sensor_name=sensor_name,
+        verbose=verbose,
+    )
+    df = _sort_by_time(df)
+    if lazy:
+        df = df.persist()
+
+    # Write the L0 Apache Parquet as side output
+    if write_L0:
+        fpath = get_L0_fpath(processed_dir, station_id)
+        write_df_to_parquet(
+            df=df, fpath=fpath, sensor_name=sensor_name, force=force, verbose=verbose
+        )
+
+    # Create and write the L1 dataset
+    ds = create_L1_dataset_from_L0(df=df, attrs=attrs, lazy=lazy, verbose=verbose)
+    if write_netcdf:
+        fpath = get_L1_netcdf_fpath(processed_dir, station_id)
+        write_L1_to_netcdf(ds, fpath=fpath, sensor_name=sensor_name)
+    if write_zarr:
+        fpath = get_L1_zarr_fpath(processed_dir, station_id)
+        write_L1_to_zarr(ds, fpath=fpath, sensor_name=sensor_name)
+    create_L1_summary_statistics(
+        ds, processed_dir=processed_dir, station_id=station_id, sensor_name=sensor_name
+    )
+
+    t_f = time.time() - t_i
+    msg = f" - Fused raw to L1 processing of station_id {station_id} ended in {t_f:.2f}s"
+    if verbose:
+        print(msg)
+    logger.info(msg)
+    return ds
+
+
+####--------------------------------------------------------------------------.
+#### Temporal aggregation
+# The timesteps are grouped into consecutive segments (one per aggregation interval).
+# - On regular time grids (same number of timesteps per segment), the segments
+#   are reduced with a reshape.
+# - On irregular time grids, they are reduced with ufunc.reduceat.
+# With dask, the time chunks are aligned to the segments, so that each chunk is
+# aggregated independently.
+L1_AGGREGATION_RECOMPUTED_VARS = ["raw_drop_concentration", "raw_drop_average_velocity"]
+
+
+def get_L1_aggregation_method(var, dtype):
+    """Return the aggregation method of a L1 variable.
+
+    - 'sum' for counts and the sample interval
+    - 'last' for the accumulated (cumulative) counters
+    - 'or' for the bit-packed qc_flag
+    - 'mode' (most frequent value) for the categorical weather codes
+    - 'log_mean' for the reflectivities in dBZ (averaged in linear Z)
+    - 'max' for status variables, error codes (and other integers)
+    - 'first' for non-numeric variables
+    - 'mean' (weighted by the sample interval) for the other variables
+    """
+    if var == "qc_flag":
+        return "or"
+    if var == "raw_drop_number" or var == "sample_interval":
+        return "sum"
+    if var.startswith("number_particles"):
+        return "sum"
+    if "accumulated" in var:
+        return "last"
+    if var.startswith("weather_code"):
+        return "mode"
+    if var.startswith("reflectivity"):
+        return "log_mean"
+    if np.dtype(dtype).kind not in "biuf":
+        return "first"
+    if np.dtype(dtype).kind in "biu":
+        return "max"
+    return "mean"
+
+
+def get_aggregation_segments(time, freq):
+    """Return the segments start indices and the labels of the aggregated timesteps.
+
+    The time must be sorted. The labels are the start of the aggregation intervals.
+    """
+    labels = pd.DatetimeIndex(time).floor(freq)
+    is_start = np.ones(labels.size, dtype=bool)
+    is_start[1:] = labels[1:] != labels[:-1]
+    starts = np.flatnonzero(is_start)
+    return starts, labels[starts].values
+
+
+def _get_regular_segment_size(starts, n_timesteps):
+    """Return the segment size if all segments have the same size (otherwise None)."""
+    sizes = np.diff(np.append(starts, n_timesteps))
+    if sizes.size > 0 and np.all(sizes == sizes[0]):
+        return int(sizes[0])
     return None
 
 
+def _get_segments_mode(x, starts):
+    """Return the most frequent valid value of each segment of a 1D array.
+
+    Ties are resolved in favour of the value occurring first in x.
+    A segment without valid values is NaN (or None for non-numeric arrays).
+    """
+    n = x.shape[0]
+    segment = np.repeat(np.arange(starts.size), np.diff(np.append(starts, n)))
+    codes, uniques = pd.factorize(x)  # missing values have code -1
+    # Count the occurrences of each (segment, code) pair
+    order = np.lexsort((codes, segment))
+    segment, codes = segment[order], codes[order]
+    is_run_start = np.ones(n, dtype=bool)
+    is_run_start[1:] = (segment[1:] != segment[:-1]) | (codes[1:] != codes[:-1])
+    run_starts = np.flatnonzero(is_run_start)
+    run_counts = np.diff(np.append(run_starts, n))
+    run_segment, run_codes = segment[run_starts], codes[run_starts]
+    run_counts[run_codes == -1] = 0
+    # Select the most frequent code of each segment
+    order = np.lexsort((run_codes, -run_counts, run_segment))
+    is_first = np.ones(order.size, dtype=bool)
+    is_first[1:] = run_segment[order][1:] != run_segment[order][:-1]
+    mode_codes = run_codes[order][is_first]
+    values = np.asarray(uniques)
+    is_valid = mode_codes >= 0
+    if np.all(is_valid):
+        return values[mode_codes]
+    # Segments without valid values
+    if values.dtype.kind != "O":
+        values = values.astype("float64")
+    out = np.full(mode_codes.size, np.nan if values.dtype.kind == "f" else None, dtype=values.dtype)
+    out[is_valid] = values[mode_codes[is_valid]]
+    return out
+
+
+def _aggregate_block(x, starts, method, segment_size=None):
+    """Aggregate the segments of a numpy array along the first axis."""
+    if method == "first":
+        return x[starts]
+    if method == "mode":
+        return _get_segments_mode(x, starts)
+    if method == "last":
+        ends = np.append(starts[1:], x.shape[0]) - 1
+        return x[ends]
+    ufunc = {"sum": np.add, "or": np.bitwise_or, "max": np.fmax}[method]
+    if segment_size is not None:
+        x = x.reshape(-1, segment_size, *x.shape[1:])
+        return ufunc.reduce(x, axis=1, dtype=x.dtype)
+    return ufunc.reduceat(x, starts, axis=0, dtype=x.dtype)
+
+
+def get_segment_aligned_chunks(starts, n_timesteps, chunk):
+    """Define time chunks close to 'chunk' whose boundaries are segment starts."""
+    bounds = np.append(starts, n_timesteps)
+    targets = np.arange(chunk, n_timesteps, chunk)
+    chunk_bounds = np.unique(bounds[np.searchsorted(bounds, targets)])
+    chunk_bounds = np.unique(np.concatenate([[0], chunk_bounds, [n_timesteps]]))
+    return tuple(int(c) for c in np.diff(chunk_bounds))
+
+
+def aggregate_array(arr, starts, method):
+    """Aggregate the segments of a numpy or dask array along the first (time) axis."""
+    n_timesteps = arr.shape[0]
+    segment_size = _get_regular_segment_size(starts, n_timesteps)
+    if not isinstance(arr, da.Array):
+        return _aggregate_block(np.asarray(arr), starts, method, segment_size)
+    # Align the time chunks to the segments
+    time_chunks = get_segment_aligned_chunks(starts, n_timesteps, chunk=max(arr.chunks[0]))
+    arr = arr.rechunk({0: time_chunks})
+    block_bounds = np.cumsum((0,) + time_chunks)
+    list_starts = [
+        starts[(starts >= block_bounds[i]) & (starts < block_bounds[i + 1])] - block_bounds[i]
+        for i in range(len(time_chunks))
+    ]
+    out_chunks = (tuple(len(s) for s in list_starts),) + arr.chunks[1:]
+
+    def _func(x, block_info=None):
+        i = block_info[0]["chunk-location"][0]
+        return _aggregate_block(x, list_starts[i], method, segment_size)
+
+    return arr.map_blocks(_func, chunks=out_chunks, dtype=arr.dtype)
+
+
+def _get_aggregation_weights(ds):
+    """Return the sample interval [s] of each timestep (used as weights)."""
+    if "sample_interval" in ds.data_vars:
+        return ds["sample_interval"].astype("float64")
+    measurement_interval = _get_measurement_interval(ds.attrs)
+    if measurement_interval is None:
+        measurement_interval = 1.0
+    return xr.full_like(ds["time"], measurement_interval, dtype="float64")
+
+
+def aggregate_L1_dataset(ds, sensor_name, freq="5min"):
+    """Aggregate a L1 Dataset over time intervals of length freq (i.e. '5min', '1h').
+
+    raw_drop_number and the counts are summed, the auxiliary variables are
+    averaged with the sample interval as weights (see get_L1_aggregation_method),
+    and raw_drop_concentration and raw_drop_average_velocity are recomputed from
+    the aggregated raw_drop_number. The time labels are the start of the intervals.
+    It works lazily on dask-backed datasets.
+    """
+    if _is_raw_drop_number_gathered(ds):
+        ds = decode_raw_drop_number_sparse(ds)
+    ds = ds.sortby("time")
+    starts, labels = get_aggregation_segments(ds["time"].values, freq)
+    weights = _get_aggregation_weights(ds)
+
+    def _aggregate(da_var, method):
+        data = da_var.data
+        if method == "sum" and data.dtype.kind in "iu" and data.dtype.itemsize < 4:
+            data = data.astype("uint32" if data.dtype.kind == "u" else "int32")
+        return aggregate_array(data, starts, method)
+
+    def _weighted_mean(da_var):
+        is_valid = da_var.notnull()
+        num = _aggregate((da_var.fillna(0) * weights).transpose("time", ...), "sum")
+        den = _aggregate((is_valid * weights).transpose("time", ...), "sum")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return num / den
+
+    data_vars = {}
+    for var in ds.data_vars:
+        if "time" not in ds[var].dims or var in L1_AGGREGATION_RECOMPUTED_VARS:
+            continue
+        da_var = ds[var].transpose("time", ...)
+        method = get_L1_aggregation_method(var, da_var.dtype)
+        if method == "mean":
+            data = _weighted_mean(da_var).astype(da_var.dtype)
+        elif method == "log_mean":
+            # Average the reflectivity in linear units (mm6/m3) and convert back to dBZ
+            with np.errstate(invalid="ignore", divide="ignore"):
+                data = (10 * np.log10(_weighted_mean(10 ** (da_var / 10)))).astype(da_var.dtype)
+        else:
+            data = _aggregate(da_var, method)
+        data_vars[var] = (da_var.dims, data, da_var.attrs)
+
+    # Aggregated sample interval
+    sample_interval = aggregate_array(weights.data, starts, "sum")
+    if "sample_interval" not in data_vars:
+        data_vars["sample_interval"] = (("time",), np.round(sample_interval).astype("uint32"))
+
+    # Recompute the variables derived from the spectrum
+    if "raw_drop_number" in data_vars:
+        raw_drop_number = data_vars["raw_drop_number"][1]
+        if "raw_drop_concentration" in ds.data_vars:
+            concentration = get_drop_concentration(raw_drop_number, sensor_name, sample_interval=1.0)
+            concentration = concentration / sample_interval[:, None]
+            data_vars["raw_drop_concentration"] = (
+                ("time", "diameter_bin_center"),
+                concentration.astype("float32"),
+                ds["raw_drop_concentration"].attrs,
+            )
+        if "raw_drop_average_velocity" in ds.data_vars:
+            velocity = get_drop_average_velocity(raw_drop_number, sensor_name)
+            data_vars["raw_drop_average_velocity"] = (
+                ("time", "diameter_bin_center"),
+                velocity.astype("float32"),
+                ds["raw_drop_average_velocity"].attrs,
+            )
+
+    # Variables without the time dimension are unchanged
+    for var in ds.data_vars:
+        if "time" not in ds[var].dims:
+            data_vars[var] = ds[var]
+
+    coords = {k: v for k, v in ds.coords.items() if "time" not in v.dims}
+    coords["time"] = labels
+    ds_agg = xr.Dataset(data_vars=data_vars, coords=coords, attrs=ds.attrs)
+    ds_agg.attrs["aggregation_interval"] = get_aggregation_suffix(freq)
+    return ds_agg
+
+
+def get_aggregation_suffix(freq):
+    """Return the file suffix of an aggregation interval (i.e. '5min', '60min')."""
+    minutes = pd.Timedelta(freq).total_seconds() / 60
+    if minutes == int(minutes):
+        return f"{int(minutes)}min"
+    return f"{int(pd.Timedelta(freq).total_seconds())}s"
+
+
+def get_aggregated_encoding_dtypes(ds_agg, sensor_name, output_format="netcdf"):
+    """Return the encoding dtypes of the summed variables of an aggregated L1 Dataset.
+
+    The summed integer variables (i.e. sample_interval, raw_drop_number) are
+    upcasted by aggregate_L1_dataset. They are stored with the upcasted dtype
+    if the dtype of the encodings YAML is narrower, to avoid overflows.
+    """
+    from disdrodb.standards import get_sensor_spec
+
+    spec = get_sensor_spec(sensor_name)
+    encodings = spec.L1_zarr_encodings if output_format == "zarr" else spec.L1_netcdf_encodings
+    encoding_dtypes = {}
+    for var in ds_agg.data_vars:
+        encoding = encodings.get(var, None)
+        if encoding is None or "scale_factor" in encoding or "add_offset" in encoding:
+            continue
+        dtype = np.dtype(ds_agg[var].dtype)
+        encoding_dtype = np.dtype(encoding["dtype"])
+        if dtype.kind not in "iu" or encoding_dtype.kind not in "iu":
+            continue
+        if get_L1_aggregation_method(var, dtype) != "sum":
+            continue
+        if dtype.itemsize > encoding_dtype.itemsize:
+            encoding_dtypes[var] = dtype.name
+    return encoding_dtypes
+
+
+def write_L1_aggregated(
+    ds,
+    processed_dir,
+    station_id,
+    sensor_name,
+    freqs=("5min", "10min", "1h"),
+    output_format="netcdf",
+    verbose=False,
+):
+    """Write the L1 products aggregated at multiple temporal resolutions.
+
+    Each resolution is aggregated from the finest resolution it is a multiple of
+    (i.e. 10min from 5min), and the writes of all resolutions are computed
+    together in a single pass over the L1 data, without holding the aggregated
+    products in memory. The products have the aggregation interval as suffix.
+    """
+    from disdrodb.io import get_L1_netcdf_fpath
+    from disdrodb.io import get_L1_zarr_fpath
+
+    freqs = sorted(freqs, key=pd.Timedelta)
+    dict_ds = {}
+    for freq in freqs:
+        # Aggregate from the coarsest available resolution
+        ds_src = ds
+        for freq_src in dict_ds:
+            if pd.Timedelta(freq) % pd.Timedelta(freq_src) == pd.Timedelta(0):
+                ds_src = dict_ds[freq_src]
+        dict_ds[freq] = aggregate_L1_dataset(ds_src, sensor_name=sensor_name, freq=freq)
+
+    # Define the (lazy) writes of the products
+    list_fpaths = []
+    list_delayed = []
+    for freq, ds_agg in dict_ds.items():
+        suffix = get_aggregation_suffix(freq)
+        encoding_dtypes = get_aggregated_encoding_dtypes(ds_agg, sensor_name, output_format=output_format)
+        if output_format == "zarr":
+            fpath = get_L1_zarr_fpath(processed_dir, station_id, suffix=suffix)
+            delayed_write = write_L1_to_zarr(
+                ds_agg, fpath, sensor_name=sensor_name, encoding_dtypes=encoding_dtypes, compute=False
+            )
+        else:
+            fpath = get_L1_netcdf_fpath(processed_dir, station_id, suffix=suffix)
+            delayed_write = write_L1_to_netcdf(
+                ds_agg, fpath, sensor_name=sensor_name, encoding_dtypes=encoding_dtypes, compute=False
+            )
+        list_fpaths.append(fpath)
+        list_delayed.append(delayed_write)
+
+    # Compute all aggregations and writes in a single pass
+    dask.compute(*list_delayed)
+    for fpath in list_fpaths:
+        msg = f" - L1 aggregated product saved at {fpath}"
+        if verbose:
+            print(msg)
+        logger.info(msg)
+    return list_fpaths
+
+
 ####--------------------------------------------------------------------------.
 #### L1 Summary statistics
 def create_L1_summary_statistics(ds, processed_dir, station_id, sensor_name):
@@ -16,13 +16,20 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # -----------------------------------------------------------------------------.
+import os
+import re
+import glob
 import logging
+import functools
 import numpy as np
-import pandas as pd
-import numpy as np
-import dask.array as da
-import dask.dataframe as dd
-from disdrodb.standards import get_data_format_dict
+from disdrodb.standards import get_data_format_dict, get_sensor_spec
+from disdrodb.utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported at first use
+pd = lazy_import("pandas")
+dask = lazy_import("dask")
+da = lazy_import("dask.array")
+dd = lazy_import("dask.dataframe")
 
 
 logger = logging.getLogger(__name__)
@@ -57,73 +64,249 @@ def check_L0_column_names(x):
     pass
 
 
-def check_array_lengths_consistency(df, sensor_name, lazy=True, verbose=False):
+def _get_raw_field_n_values(series, delimiter):
+    """Count the number of values in each raw field string.
+
+    The delimiters are counted with the pandas/dask native string kernel,
+    so that no Python list is created for each row.
+    """
+    return series.astype(str).str.count(re.escape(delimiter)) + 1
+
+
+def _get_raw_fields_valid_mask(df, dict_n_values, delimiter):
+    """Return a boolean Series which is True for rows with expected array lengths."""
+    mask = None
+    for key, n_values in dict_n_values.items():
+        key_mask = _get_raw_field_n_values(df[key], delimiter) == n_values
+        mask = key_mask if mask is None else mask & key_mask
+    return mask
+
+
+def _drop_unvalid_raw_fields_rows(df, dict_n_values, delimiter):
+    """Drop (dataframe partition) rows with unexpected raw field array lengths."""
+    return df[_get_raw_fields_valid_mask(df, dict_n_values, delimiter)]
+
+
+def check_array_lengths_consistency(df, sensor_name, lazy=True, verbose=False, dict_n_values=None):
+    """Drop the rows where the raw fields do not have the expected number of values.
+
+    The expected number of values of each raw field is the most frequent one,
+    unless specified by dict_n_values (i.e. when computed once for a full record
+    processed by batches, see get_raw_fields_n_values).
+    If lazy=True, only the array length counts are computed, and the unvalid
+    rows are dropped lazily within each dask partition.
+    """
     from disdrodb.standards import get_raw_field_nbins
+    from disdrodb.standards import get_raw_field_delimiter
 
     n_bins_dict = get_raw_field_nbins(sensor_name=sensor_name)
-    list_unvalid_row_idx = []
-    for key, n_bins in n_bins_dict.items():
-        # Check key is available in dataframe
-        if key not in df.columns:
-            continue
-        # Parse the string splitting at ,
-        df_series = df[key].astype(str).str.split(",")
-        # Check all arrays have same length
-        if lazy:
-            arr_lengths = df_series.apply(len, meta=(key, "int64"))
-            arr_lengths = arr_lengths.compute()
-        else:
-            arr_lengths = df_series.apply(len)
-        idx, count = np.unique(arr_lengths, return_counts=True)
-        n_max_vals = idx[np.argmax(count)]
-        # Idenfity rows with unexpected array length
-        unvalid_row_idx = np.where(arr_lengths != n_max_vals)[0]
-        if len(unvalid_row_idx) > 0:
-            list_unvalid_row_idx.append(unvalid_row_idx)
+    delimiter = get_raw_field_delimiter(sensor_name=sensor_name)
+    # Retrieve raw fields available in the dataframe
+    keys = [key for key in n_bins_dict.keys() if key in df.columns]
+    if len(keys) == 0:
+        return df
+    # Count the occurence of each array length
+    list_counts = [
+        _get_raw_field_n_values(df[key], delimiter).value_counts() for key in keys
+    ]
+    if lazy:
+        list_counts = dask.compute(*list_counts)
+    # Define the expected array length (the most frequent, if not specified)
+    dict_n_values = {
+        key: dict_n_values[key] if dict_n_values is not None and key in dict_n_values else counts.idxmax()
+        for key, counts in zip(keys, list_counts)
+    }
+    # Identify fields with unexpected array lengths
+    dict_n_unvalid = {
+        key: int(counts.sum() - counts.get(dict_n_values[key], 0)) for key, counts in zip(keys, list_counts)
+    }
+    if sum(dict_n_unvalid.values()) == 0:
+        return df
+    # Log
+    for key, n_unvalid in dict_n_unvalid.items():
+        if n_unvalid > 0:
+            msg = f" - {n_unvalid} rows have an unexpected {key} array length."
+            if verbose:
+                print(msg)
+            logger.info(msg)
     # Drop unvalid rows
-    unvalid_row_idx = np.unique(list_unvalid_row_idx)
-    if len(unvalid_row_idx) > 0:
-        if lazy:
-            n_partitions = df.npartitions
-            df = df.compute()
-            df = df.drop(df.index[unvalid_row_idx])
-            df = dd.from_pandas(df, npartitions=n_partitions)
-        else:
-            df = df.drop(df.index[unvalid_row_idx])
+    if lazy:
+        df = df.map_partitions(
+            _drop_unvalid_raw_fields_rows,
+            dict_n_values=dict_n_values,
+            delimiter=delimiter,
+            meta=df._meta,
+        )
+    else:
+        df = _drop_unvalid_raw_fields_rows(df, dict_n_values, delimiter)
     return df
 
 
+def get_raw_fields_n_values(list_df, sensor_name):
+    """Return the most frequent number of values of each raw field over several dataframes.
+
+    list_df can be an iterator of (pandas) dataframes, i.e. the L0 batches
+    of a record, so that the expected array lengths are the same for all batches.
+    """
+    from disdrodb.standards import get_raw_field_nbins
+    from disdrodb.standards import get_raw_field_delimiter
+
+    n_bins_dict = get_raw_field_nbins(sensor_name=sensor_name)
+    delimiter = get_raw_field_delimiter(sensor_name=sensor_name)
+    dict_counts = {}
+    for df in list_df:
+        for key in [key for key in n_bins_dict.keys() if key in df.columns]:
+            counts = _get_raw_field_n_values(df[key], delimiter).value_counts()
+            dict_counts[key] = counts if key not in dict_counts else dict_counts[key].add(counts, fill_value=0)
+    return {key: counts.idxmax() for key, counts in dict_counts.items()}
+
+
+def _get_parquet_fpaths(fpath):
+    """Return the Parquet files of a L0 file (or of a directory of L0 files)."""
+    if os.path.isdir(fpath):
+        return sorted(glob.glob(os.path.join(fpath, "*.parquet")))
+    return [fpath]
+
+
+def get_parquet_columns_statistics(fpath):
+    """Return the min, max and null count of each column from the Parquet metadata.
+
+    The statistics are computed by the Parquet writer and read from the file footers,
+    without reading the data. The min and max of a column are None if a row group
+    lacks statistics.
+    """
+    import pyarrow.parquet as pq
+
+    dict_stats = {}
+    for fpath_i in _get_parquet_fpaths(fpath):
+        metadata = pq.ParquetFile(fpath_i).metadata
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            for i in range(row_group.num_columns):
+                column_chunk = row_group.column(i)
+                column = column_chunk.path_in_schema
+                stats = dict_stats.setdefault(column, {"min": None, "max": None, "null_count": 0, "available": True})
+                statistics = column_chunk.statistics
+                if statistics is None:
+                    stats["available"] = False
+                    continue
+                stats["null_count"] += statistics.null_count if statistics.has_null_count else 0
+                if statistics.null_count == column_chunk.num_values:
+                    continue
+                if not statistics.has_min_max:
+                    stats["available"] = False
+                    continue
+                stats["min"] = statistics.min if stats["min"] is None else min(stats["min"], statistics.min)
+                stats["max"] = statistics.max if stats["max"] is None else max(stats["max"], statistics.max)
+    for stats in dict_stats.values():
+        if not stats.pop("available"):
+            stats["min"], stats["max"] = None, None
+    return dict_stats
+
+
+def _is_numeric_range(data_range):
+    if not isinstance(data_range, (list, tuple)) or len(data_range) != 2:
+        return False
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in data_range)
+
+
+def _are_stats_within_options(stats, options):
+    """Check if the column values are within options using only the min/max statistics.
+
+    It is possible only when the options are consecutive integers.
+    """
+    if stats is None or stats["min"] is None or stats["null_count"] > 0:
+        return False
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in options):
+        return False
+    if not isinstance(stats["min"], (int, float)) or stats["min"] != int(stats["min"]) or stats["max"] != int(stats["max"]):
+        return False
+    return set(range(int(stats["min"]), int(stats["max"]) + 1)).issubset(options)
+
+
+def scan_L0_columns(fpath, dict_range=None, dict_options=None, batch_size=1_000_000):
+    """Check the values of the L0 columns by streaming the row groups.
+
+    Only the columns in dict_range and dict_options are read.
+    Return the list of columns with values outside the range or the options
+    (the null values are considered invalid).
+    """
+    import pyarrow.parquet as pq
+
+    dict_range = {} if dict_range is None else dict_range
+    dict_options = {} if dict_options is None else dict_options
+    columns = sorted(set(dict_range) | set(dict_options))
+    list_wrong_columns = set()
+    if len(columns) == 0:
+        return []
+    for fpath_i in _get_parquet_fpaths(fpath):
+        pf = pq.ParquetFile(fpath_i)
+        for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+            df = batch.to_pandas()
+            for column in columns:
+                if column in list_wrong_columns:
+                    continue
+                if column in dict_range and not df[column].between(*dict_range[column]).all():
+                    list_wrong_columns.add(column)
+                if column in dict_options and not df[column].isin(dict_options[column]).all():
+                    list_wrong_columns.add(column)
+    return [column for column in columns if column in list_wrong_columns]
+
+
 def check_L0_standards(fpath, sensor_name, raise_errors=False, verbose=True):
-    # Read parquet
-    df = pd.read_parquet(fpath)
+    """Check the L0 Apache Parquet file(s) complies with the DISDRODB standards.
+
+    The data range checks use the min/max statistics stored in the Parquet metadata
+    (computed when writing the file). Only the columns which can not be checked
+    with the statistics (i.e. categorical values) are read, by streaming the row groups.
+    """
+    import pyarrow.parquet as pq
+
+    # Read the schema and the column statistics
+    columns = pq.read_schema(_get_parquet_fpaths(fpath)[0]).names
+    dict_stats = get_parquet_columns_statistics(fpath)
     # -------------------------------------
     # Check data range
     dict_field_value_range = get_field_value_range_dict(sensor_name)
+    dict_field_values = get_field_value_options_dict(sensor_name)
     list_wrong_columns = []
-    for column in df.columns:
-        if column in list(dict_field_value_range.keys()):
-            if dict_field_value_range[column] is not None: 
-                if not df[column].between(*dict_field_value_range[column]).all():
-                    list_wrong_columns.append(column)
-                    if raise_errors:
-                        raise ValueError(f"'column' {column} has values outside the expected data range.")
+    dict_range_to_scan = {}
+    for column in columns:
+        data_range = dict_field_value_range.get(column, None)
+        if not _is_numeric_range(data_range):
+            continue
+        stats = dict_stats.get(column, None)
+        # - Read the column if the statistics are not available
+        if stats is None or stats["min"] is None or not isinstance(stats["min"], (int, float)):
+            dict_range_to_scan[column] = data_range
+            continue
+        if stats["null_count"] > 0 or stats["min"] < data_range[0] or stats["max"] > data_range[1]:
+            list_wrong_columns.append(column)
+    # Define the categorical columns to check by reading the data
+    dict_options_to_scan = {}
+    for column in columns:
+        if column in dict_field_values:
+            options = dict_field_values[column]
+            if not _are_stats_within_options(dict_stats.get(column, None), options):
+                dict_options_to_scan[column] = options
+    # Scan the columns which can not be checked with the statistics
+    list_wrong_scanned = scan_L0_columns(fpath, dict_range=dict_range_to_scan, dict_options=dict_options_to_scan)
+    list_wrong_columns += [column for column in list_wrong_scanned if column in dict_range_to_scan]
+    if raise_errors and len(list_wrong_columns) > 0:
+        raise ValueError(f"'column' {list_wrong_columns[0]} has values outside the expected data range.")
 
     if verbose:
         if len(list_wrong_columns) > 0:
             print(" - This columns have values outside the expected data range:", list_wrong_columns)
     # -------------------------------------
     # Check categorical data values
-    dict_field_values = get_field_value_options_dict(sensor_name)
-    list_wrong_columns = []
+    list_wrong_columns = [column for column in list_wrong_scanned if column in dict_options_to_scan]
     list_msg = []
-    for column in df.columns:
-        if column in list(dict_field_values.keys()):
-            if not df[column].isin(dict_field_values[column]).all():
-                list_wrong_columns.append(column)
-                if raise_errors:
-                    msg = f"'column' {column} has values different from {dict_field_values[column]}"
-                    list_msg.append(msg)
-                    raise ValueError(msg)
+    for column in list_wrong_columns:
+        msg = f"'column' {column} has values different from {dict_field_values[column]}"
+        list_msg.append(msg)
+        if raise_errors:
+            raise ValueError(msg)
     if verbose:
         if len(list_wrong_columns) > 0:
             print(
@@ -134,14 +317,14 @@ def check_L0_standards(fpath, sensor_name, raise_errors=False, verbose=True):
     # -------------------------------------
     # Check if latitude and longitude are columns of the dataframe
     # - They should be only provided if the instrument is moving !!!!
-    if "latitude" in df.columns:
+    if "latitude" in columns:
         msg = " - The L0 dataframe has column 'latitude'. "
         "This should be included only if the sensor is moving. "
         "Otherwise, specify the 'latitude' in the metadata !"
         print(msg)
         logger.info(msg)
 
-    if "longitude" in df.columns:
+    if "longitude" in columns:
         msg = " - The L0 dataframe has column 'longitude'. "
         "This should be included only if the sensor is moving. "
         "Otherwise, specify the 'longitude' in the metadata !"
@@ -152,7 +335,7 @@ def check_L0_standards(fpath, sensor_name, raise_errors=False, verbose=True):
     # Check if raw spectrum and 1D derivate exists
     list_sprectrum_vars = ["raw_drop_concentration", "raw_drop_average_velocity", "raw_drop_number"]
     unavailable_vars = np.array(list_sprectrum_vars)[
-        np.isin(list_sprectrum_vars, df.columns, invert=True)
+        np.isin(list_sprectrum_vars, columns, invert=True)
     ]
     # Also if Thies_LPM has list_sprectrum_vars?
     if len(unavailable_vars) > 0:
@@ -178,10 +361,265 @@ def check_L0_standards(fpath, sensor_name, raise_errors=False, verbose=True):
     return
 
 
-def check_L1_standards(x):
-    # TODO:
-    # - Check for realistic values after having removed the flags !!!!
-    pass
+####--------------------------------------------------------------------------.
+#### L1 standards
+# check_L1_standards only uses the file metadata: dimensions, variables dtypes,
+# attributes, compression and the 'actual_range' attributes computed when
+# writing the L1 products. No data is read from disk.
+L1_REQUIRED_ATTRS = ["sensor_name", "station_id", "campaign_name"]
+L1_REQUIRED_COORDS = ["time", "latitude", "longitude", "altitude"]
+L1_SPECTRUM_DIMS = {
+    "raw_drop_concentration": ("time", "diameter_bin_center"),
+    "raw_drop_average_velocity": ("time", "diameter_bin_center"),
+    "raw_drop_number": ("time", "diameter_bin_center", "velocity_bin_center"),
+}
+
+
+def _get_L1_netcdf_metadata(fpath):
+    import netCDF4
+
+    with netCDF4.Dataset(fpath, mode="r") as nc:
+        dict_vars = {}
+        for name, var in nc.variables.items():
+            filters = var.filters() or {}
+            dict_vars[name] = {
+                "dims": tuple(var.dimensions),
+                "dtype": np.dtype(var.dtype) if not isinstance(var.dtype, type) else np.dtype("O"),
+                "attrs": {k: var.getncattr(k) for k in var.ncattrs()},
+                "compressed": bool(filters.get("zlib", False) or filters.get("zstd", False)),
+            }
+        metadata = {
+            "format": "netcdf",
+            "attrs": {k: nc.getncattr(k) for k in nc.ncattrs()},
+            "dims": {k: v.size for k, v in nc.dimensions.items()},
+            "variables": dict_vars,
+        }
+    return metadata
+
+
+def _get_zarr_numpy_dtype(arr):
+    try:
+        return np.dtype(arr.dtype)
+    except TypeError:
+        return np.dtype("O")
+
+
+def _get_L1_zarr_metadata(fpath):
+    import zarr
+
+    group = zarr.open_consolidated(fpath, mode="r")
+    dict_vars = {}
+    dims = {}
+    for name, arr in group.arrays():
+        attrs = dict(arr.attrs)
+        var_dims = tuple(attrs.pop("_ARRAY_DIMENSIONS", []))
+        dims.update(dict(zip(var_dims, arr.shape)))
+        compressors = getattr(arr, "compressors", None) or [getattr(arr, "compressor", None)]
+        dict_vars[name] = {
+            "dims": var_dims,
+            "dtype": _get_zarr_numpy_dtype(arr),
+            "attrs": attrs,
+            "compressed": any(c is not None for c in compressors),
+        }
+    metadata = {
+        "format": "zarr",
+        "attrs": dict(group.attrs),
+        "dims": dims,
+        "variables": dict_vars,
+    }
+    return metadata
+
+
+def _get_L1_dataset_metadata(ds):
+    dict_vars = {
+        name: {
+            "dims": tuple(var.dims),
+            "dtype": var.dtype,
+            "attrs": dict(var.attrs),
+            "compressed": None,
+        }
+        for name, var in ds.variables.items()
+    }
+    metadata = {
+        "format": "dataset",
+        "attrs": dict(ds.attrs),
+        "dims": dict(ds.sizes),
+        "variables": dict_vars,
+    }
+    return metadata
+
+
+def get_L1_metadata(x):
+    """Get the metadata of a L1 product (netCDF, Zarr store or xr.Dataset)."""
+    if isinstance(x, str):
+        if x.endswith(".zarr"):
+            return _get_L1_zarr_metadata(x)
+        return _get_L1_netcdf_metadata(x)
+    return _get_L1_dataset_metadata(x)
+
+
+def _get_L1_encodings_dict(metadata, sensor_name):
+    if metadata["format"] == "netcdf":
+        return get_sensor_spec(sensor_name).L1_netcdf_encodings
+    if metadata["format"] == "zarr":
+        return get_sensor_spec(sensor_name).L1_zarr_encodings
+    return {}
+
+
+def _check_L1_dims(metadata):
+    errors = []
+    variables = metadata["variables"]
+    if "time" not in metadata["dims"]:
+        errors.append("The 'time' dimension is missing.")
+    for coord in L1_REQUIRED_COORDS:
+        if coord not in variables:
+            errors.append(f"The coordinate '{coord}' is missing.")
+    is_gathered = "raw_drop_number_index" in variables
+    for var, expected_dims in L1_SPECTRUM_DIMS.items():
+        if var not in variables:
+            continue
+        if var == "raw_drop_number" and is_gathered:
+            expected_dims = ("raw_drop_number_index",)
+        if variables[var]["dims"] != expected_dims:
+            errors.append(f"'{var}' has dimensions {variables[var]['dims']} instead of {expected_dims}.")
+        for dim in expected_dims:
+            if dim != "time" and dim not in variables and dim != "raw_drop_number_index":
+                errors.append(f"The coordinate '{dim}' is missing.")
+    for var, dict_var in variables.items():
+        if var in L1_SPECTRUM_DIMS or var in metadata["dims"]:
+            continue
+        if "time" in dict_var["dims"] and dict_var["dims"] != ("time",):
+            errors.append(f"'{var}' has dimensions {dict_var['dims']} instead of ('time',).")
+    return errors
+
+
+def _get_encoding_value_range(encoding):
+    """Return the range of values which can be stored with an integer encoding (or None)."""
+    dtype = encoding.get("dtype", None)
+    if dtype is None or np.dtype(dtype).kind not in "iu":
+        return None
+    info = np.iinfo(np.dtype(dtype))
+    scale_factor = encoding.get("scale_factor", None)
+    add_offset = encoding.get("add_offset", None)
+    scale_factor = 1 if scale_factor is None else scale_factor
+    add_offset = 0 if add_offset is None else add_offset
+    return [info.min * scale_factor + add_offset, info.max * scale_factor + add_offset]
+
+
+def _is_aggregated_upcast(metadata, dtype, expected_dtype):
+    """Check if a variable of an aggregated L1 product is stored with a wider integer dtype.
+
+    The summed variables of the aggregated products can be upcasted (see write_L1_aggregated).
+    """
+    if "aggregation_interval" not in metadata["attrs"]:
+        return False
+    dtype, expected_dtype = np.dtype(dtype), np.dtype(expected_dtype)
+    return dtype.kind == expected_dtype.kind and dtype.kind in "iu" and dtype.itemsize > expected_dtype.itemsize
+
+
+def _check_L1_encodings(metadata, sensor_name):
+    errors = []
+    encodings_dict = _get_L1_encodings_dict(metadata, sensor_name)
+    dict_field_value_range = get_field_value_range_dict(sensor_name)
+    for var, encoding in encodings_dict.items():
+        if var not in metadata["variables"]:
+            continue
+        # Check the encoding can store the expected data range
+        data_range = dict_field_value_range.get(var, None)
+        encoding_range = _get_encoding_value_range(encoding)
+        if _is_numeric_range(data_range) and encoding_range is not None:
+            if data_range[0] < encoding_range[0] or data_range[1] > encoding_range[1]:
+                errors.append(
+                    f"'{var}' is encoded as {encoding['dtype']}, which can not store the data range {data_range}."
+                )
+        dict_var = metadata["variables"][var]
+        expected_dtype = encoding.get("dtype", None)
+        if expected_dtype is not None and np.dtype(expected_dtype).kind in "biuf":
+            if dict_var["dtype"] != np.dtype(expected_dtype) and not _is_aggregated_upcast(
+                metadata, dict_var["dtype"], expected_dtype
+            ):
+                errors.append(f"'{var}' is stored as {dict_var['dtype']} instead of {expected_dtype}.")
+        expect_compression = bool(encoding.get("zlib", False) or encoding.get("compressor", None))
+        if expect_compression and dict_var["compressed"] is False:
+            errors.append(f"'{var}' is not compressed.")
+    return errors
+
+
+def _check_L1_value_ranges(metadata, sensor_name):
+    errors = []
+    dict_field_value_range = get_field_value_range_dict(sensor_name)
+    for var, data_range in dict_field_value_range.items():
+        if var not in metadata["variables"]:
+            continue
+        if not _is_numeric_range(data_range):
+            continue
+        actual_range = metadata["variables"][var]["attrs"].get("actual_range", None)
+        if actual_range is None:
+            continue
+        vmin, vmax = np.asarray(actual_range, dtype=float)
+        if vmin < data_range[0] or vmax > data_range[1]:
+            errors.append(
+                f"'{var}' has values in [{vmin}, {vmax}], outside the expected data range {data_range}."
+            )
+    return errors
+
+
+def check_L1_standards(x, sensor_name=None, raise_errors=False, verbose=True):
+    """Check that a L1 product complies with the DISDRODB standards.
+
+    Only the metadata of the product are read.
+    The value ranges are checked with the 'actual_range' attributes written
+    by write_L1_to_netcdf and write_L1_to_zarr.
+
+    Parameters
+    ----------
+    x : str or xr.Dataset
+        Filepath of a L1 netCDF or Zarr store, or a L1 xr.Dataset.
+    sensor_name : str, optional
+        Sensor name. If None, it is taken from the 'sensor_name' attribute.
+    raise_errors : bool, optional
+        Whether to raise a ValueError if the product does not comply.
+    verbose : bool, optional
+        Whether to print the detected issues.
+
+    Returns
+    -------
+    list
+        List of the detected issues. The list is empty if the product complies.
+    """
+    metadata = get_L1_metadata(x)
+    errors = []
+    # -------------------------------------
+    # Check global attributes
+    for attr in L1_REQUIRED_ATTRS:
+        if attr not in metadata["attrs"]:
+            errors.append(f"The global attribute '{attr}' is missing.")
+    if sensor_name is None:
+        sensor_name = metadata["attrs"].get("sensor_name", None)
+    # -------------------------------------
+    # Check dimensions and coordinates
+    errors += _check_L1_dims(metadata)
+    # -------------------------------------
+    # Check qc_flag
+    if "qc_flag" in metadata["variables"]:
+        if "flag_masks" not in metadata["variables"]["qc_flag"]["attrs"]:
+            errors.append("The 'qc_flag' variable lacks the 'flag_masks' attribute.")
+    # -------------------------------------
+    # Check dtypes, encodings and value ranges
+    if sensor_name is not None:
+        check_sensor_name(sensor_name)
+        errors += _check_L1_encodings(metadata, sensor_name)
+        errors += _check_L1_value_ranges(metadata, sensor_name)
+    # -------------------------------------
+    # Report
+    if len(errors) > 0:
+        msg = " - The L1 product does not comply with the DISDRODB standards: \n   " + "\n   ".join(errors)
+        if verbose:
+            print(msg)
+        logger.info(msg)
+        if raise_errors:
+            raise ValueError(msg)
+    return errors
 
 
 def check_L2_standards(x):
@@ -194,17 +632,13 @@ def check_L2_standards(x):
 def get_field_ndigits_natural_dict(sensor_name):
     """Get number of digits on th left side of the comma."""
     # (example: 123,45 -> 123)
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["n_naturals"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_n_naturals
 
 
 def get_field_ndigits_decimals_dict(sensor_name):
     """Get number of digits on the right side of the comma."""
     # (example: 123,45 -> 45)
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["n_decimals"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_n_decimals
 
 
 def get_field_ndigits_dict(sensor_name):
@@ -212,9 +646,7 @@ def get_field_ndigits_dict(sensor_name):
 
     It excludes the comma but it count the minus sign !!!.
     """
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["n_digits"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_n_digits
 
 
 def get_field_nchar_dict(sensor_name):
@@ -222,23 +654,17 @@ def get_field_nchar_dict(sensor_name):
 
     It accounts also for the comma and the minus sign.
     """
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["n_characters"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_n_characters
 
 
 def get_field_value_range_dict(sensor_name):
     """Get the variable data range (including nan flags)."""
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["data_range"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_data_range
 
 
 def get_field_flag_dict(sensor_name):
     """Get the variable nan flags."""
-    data_dict = get_data_format_dict(sensor_name)
-    d = {k: v["nan_flags"] for k, v in data_dict.items()}
-    return d
+    return get_sensor_spec(sensor_name).field_nan_flags
 
 
 # TODO: get_field_value_realistic_range  # when removing flags
@@ -295,10 +721,171 @@ def get_field_value_options_dict(sensor_name):
 
 
 def get_field_error_dict(device):
+    """Get the values of the status variables indicating an instrument error."""
     if device == "OTT_Parsivel":
         flag_dict = {
             "sensor_status": [1, 2, 3],
             "datalogger_error": [1],
             "error_code": [1, 2],
         }
+    elif device == "OTT_Parsivel2":
+        flag_dict = {
+            "sensor_status": [1, 2, 3],
+            "error_code": [1, 2],
+        }
+    elif device == "Thies_LPM":
+        status_vars = [k for k in get_field_value_options_dict(device) if k.endswith("_status")]
+        flag_dict = {k: [1] for k in status_vars}
+    else:
+        raise NotImplementedError
     return flag_dict
+
+
+####--------------------------------------------------------------------------.
+#### L0 string format validators
+def _get_field_format_pattern(field_format):
+    """Return the regular expression of a raw field defined in L0_data_format.yml.
+
+    The natural part includes the minus sign (i.e. -9.999 has 2 naturals).
+    Return None if the field has no numeric format, i.e. if the number of characters
+    is not consistent with the number of naturals and decimals (dates, raw arrays).
+    These fields are checked only on their number of characters.
+    """
+    n_characters = field_format.get("n_characters")
+    n_naturals = field_format.get("n_naturals")
+    n_decimals = field_format.get("n_decimals")
+    if n_characters is None or n_naturals is None or n_decimals is None:
+        return None
+    if n_characters != n_naturals + n_decimals + int(n_decimals > 0):
+        return None
+    # RE2 does not support repetitions larger than 1000
+    if n_characters > 1000:
+        return None
+    if n_naturals > 1:
+        naturals_pattern = f"(?:[-+]\\d{{{n_naturals - 1}}}|\\d{{{n_naturals}}})"
+    else:
+        naturals_pattern = f"\\d{{{n_naturals}}}"
+    decimals_pattern = f"\\.\\d{{{n_decimals}}}" if n_decimals > 0 else ""
+    return f"^{naturals_pattern}{decimals_pattern}$"
+
+
+@functools.lru_cache(maxsize=None)
+def get_L0_format_validators(sensor_name):
+    """Return the format validators of the raw fields of a sensor.
+
+    The validators are derived once from L0_data_format.yml.
+    Each field maps to its regular expression (or None), its number of
+    characters (or None) and its numeric data range (or None).
+    """
+    validators = {}
+    for field, field_format in get_data_format_dict(sensor_name).items():
+        data_range = field_format.get("data_range")
+        validators[field] = {
+            "pattern": _get_field_format_pattern(field_format),
+            "n_characters": field_format.get("n_characters"),
+            "data_range": tuple(data_range) if _is_numeric_range(data_range) else None,
+        }
+    return validators
+
+
+def _get_format_valid_mask(arr, pattern, n_characters):
+    """Return the Arrow boolean mask of the strings with a valid format.
+
+    The number of characters is checked with utf8_length if no pattern is defined.
+    """
+    import pyarrow.compute as pc
+
+    if pattern is not None:
+        return pc.match_substring_regex(arr, pattern)
+    return pc.equal(pc.utf8_length(arr), n_characters)
+
+
+def _get_arrow_string_array(series):
+    import pyarrow as pa
+
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Object column with non-string values
+        return pa.array(series.astype("string"), type=pa.string(), from_pandas=True)
+
+
+def _get_numeric_values(series, arr=None, is_valid=None):
+    """Return the column values as float (NaN if not numeric).
+
+    If the Arrow string array is provided, the strings are parsed by Arrow.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if arr is None:
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    if is_valid is not None:
+        arr = pc.if_else(is_valid, arr, pa.scalar(None, type=pa.string()))
+    try:
+        values = pc.cast(arr, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    return values.to_numpy(zero_copy_only=False)
+
+
+def count_L0_format_violations(df, sensor_name):
+    """Count the values of each raw field not complying with L0_data_format.yml.
+
+    The format checks apply to the string columns (i.e. before casting to the
+    L0 dtypes), the data range checks apply to all columns.
+    Null values are not counted as violations.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Number of values, format and data range violations of each checked field.
+    """
+    import pyarrow.compute as pc
+
+    validators = get_L0_format_validators(sensor_name)
+    dict_counts = {}
+    for column in df.columns:
+        if column not in validators:
+            continue
+        series = df[column]
+        is_string = pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+        pattern = validators[column]["pattern"]
+        n_characters = validators[column]["n_characters"]
+        data_range = validators[column]["data_range"]
+        has_format = n_characters is not None
+        if (not has_format or not is_string) and data_range is None:
+            continue
+        # Check the string format
+        arr, is_valid, n_format = None, None, 0
+        if is_string:
+            arr = _get_arrow_string_array(series)
+            if has_format:
+                is_valid = _get_format_valid_mask(arr, pattern=pattern, n_characters=n_characters)
+                n_format = int(pc.sum(pc.invert(is_valid)).as_py() or 0)
+        # Check the data range
+        n_range = 0
+        if data_range is not None:
+            # - Only the numbers with a valid format are parsed
+            values = _get_numeric_values(series, arr=arr, is_valid=is_valid)
+            n_range = int(np.count_nonzero((values < data_range[0]) | (values > data_range[1])))
+        dict_counts[column] = [int(series.count()), n_format, n_range]
+    df_counts = pd.DataFrame.from_dict(
+        dict_counts,
+        orient="index",
+        columns=["n_values", "n_format_violations", "n_range_violations"],
+    )
+    return df_counts
+
+
+def log_L0_format_violations(df_counts, verbose=False):
+    """Log the raw fields having format or data range violations."""
+    df_counts = df_counts[(df_counts["n_format_violations"] > 0) | (df_counts["n_range_violations"] > 0)]
+    for column, row in df_counts.iterrows():
+        msg = (
+            f" - {column}: {row['n_format_violations']} format and {row['n_range_violations']}"
+            f" data range violations over {row['n_values']} values."
+        )
+        if verbose:
+            print(msg)
+        logger.warning(msg)
@@ -16,6 +16,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # -----------------------------------------------------------------------------.
+import types
+import functools
+import numpy as np
+
+
 def get_LPM_variables():
     # '01': start_identifier
     # '02': device_address
@@ -121,7 +126,18 @@ def get_LPM_variables():
     return
 
 
-def get_L0_dtype_standards(sensor_name: str) -> dict:
+def get_L0_dtype_standards(sensor_name: str, downcast=True):
+    """Get the L0 dtypes of a sensor as a read-only mapping.
+
+    If downcast=True, the integer fields use the minimal width allowed by
+    their data range (see _downcast_L0_integer_dtypes).
+    The dtypes are derived once per sensor.
+    """
+    return _get_L0_dtype_standards(sensor_name, downcast)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_L0_dtype_standards(sensor_name, downcast):
     from disdrodb.standards import get_L0_dtype
 
     # TODO: TO REFACTOR !!!!
@@ -134,7 +150,7 @@ def get_L0_dtype_standards(sensor_name: str) -> dict:
         "datalogger_heating_current": "float32",
         "datalogger_battery_voltage": "float32",
         "datalogger_temperature": "object",
-        "datalogger_voltage": "object",
+        "datalogger_voltage": "category",
         "datalogger_error": "uint8",
         # Coords
         "latitude": "float32",
@@ -175,9 +191,68 @@ def get_L0_dtype_standards(sensor_name: str) -> dict:
     }
     d1 = get_L0_dtype(sensor_name=sensor_name)
     dtype_dict.update(d1)
+    # Use the minimal integer width allowed by the field value options and range
+    if downcast:
+        dtype_dict = _downcast_L0_integer_dtypes(dtype_dict, sensor_name=sensor_name)
+    return types.MappingProxyType(dtype_dict)
+
+
+def _get_minimal_integer_dtype(min_value, max_value):
+    """Get the smallest integer dtype able to represent the [min_value, max_value] range."""
+    dtype = np.promote_types(
+        np.min_scalar_type(int(min_value)), np.min_scalar_type(int(max_value))
+    )
+    return dtype.name
+
+
+def _get_nan_flags_list(nan_flags):
+    if nan_flags is None:
+        return []
+    if isinstance(nan_flags, (list, tuple)):
+        return list(nan_flags)
+    return [nan_flags]
+
+
+def _downcast_L0_integer_dtypes(dtype_dict, sensor_name):
+    """Set the minimal integer dtype of fields with known value options or value range.
+
+    Only the fields with an integer dtype are downcasted (never upcasted).
+    The integer width accounts for the data range, the value options and the nan flags.
+    Raw values outside this range are handled by cast_column_dtypes.
+    """
+    from disdrodb.check_standards import get_field_flag_dict
+    from disdrodb.check_standards import get_field_value_options_dict
+    from disdrodb.check_standards import get_field_value_range_dict
+
+    dict_value_range = get_field_value_range_dict(sensor_name)
+    dict_value_range = {
+        k: list(v) for k, v in dict_value_range.items() if v is not None and None not in v
+    }
+    dict_value_options = get_field_value_options_dict(sensor_name)
+    for column, values in dict_value_options.items():
+        if np.issubdtype(np.asarray(values).dtype, np.integer):
+            dict_value_range[column] = [min(values), max(values)]
+    dict_nan_flags = get_field_flag_dict(sensor_name)
+    for column, value_range in dict_value_range.items():
+        if column not in dtype_dict:
+            continue
+        if not _is_integer_dtype(dtype_dict[column]):
+            continue
+        values = value_range + _get_nan_flags_list(dict_nan_flags.get(column))
+        dtype = _get_minimal_integer_dtype(min(values), max(values))
+        if np.dtype(dtype).itemsize < np.dtype(dtype_dict[column]).itemsize:
+            dtype_dict[column] = dtype
     return dtype_dict
 
 
+def _is_integer_dtype(dtype):
+    """Check if a dtype string (i.e. 'uint8', 'category', 'object') is an integer dtype."""
+    try:
+        return np.issubdtype(np.dtype(dtype), np.integer)
+    except TypeError:
+        return False
+
+
 def get_DIVEN_dict():
     d = {
         "precipitation_flux": "rainfall_rate_16bit_1200", # precipitation_rate, not sure about this
@@ -343,8 +418,5 @@ def get_ARM_LPM_dims_dict():
 
 def get_dtype_standards_all_object(sensor_name):
     # TODO: move to dev_tools I would say... is not used by any parser right?
-    dtype_dict = get_L0_dtype_standards(sensor_name=sensor_name)
-    for i in dtype_dict:
-        dtype_dict[i] = "object"
-
+    dtype_dict = {k: "object" for k in get_L0_dtype_standards(sensor_name=sensor_name)}
     return dtype_dict
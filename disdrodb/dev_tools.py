@@ -5,6 +5,11 @@ Created on Sun Jan  2 14:56:38 2022
 
 @author: ghiggi
 """
+import os
+import copy
+import time
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 from disdrodb.data_encodings import get_L0_dtype_standards
@@ -271,3 +276,109 @@ def infer_df_str_column_names(df, sensor_name, row_idx=1):
         possible_columns = search_possible_columns(string, sensor_name=sensor_name)
         dict_possible_columns[i] = possible_columns
     return dict_possible_columns
+
+
+####--------------------------------------------------------------------------.
+#### Parquet encodings benchmark
+def get_L0_parquet_encodings_presets(sensor_name):
+    """Get a dictionary of L0 Parquet encodings to benchmark.
+
+    It includes the sensor L0_parquet_encodings.yml, the legacy snappy encoding,
+    and zstd variants tuned for archive size or for scan speed.
+    """
+    from disdrodb.standards import get_L0_parquet_encoding_dict
+
+    sensor_encoding_dict = get_L0_parquet_encoding_dict(sensor_name)
+    dict_encodings = {}
+    dict_encodings["sensor"] = sensor_encoding_dict
+    dict_encodings["snappy"] = {
+        "row_group_size": 100000,
+        "default": {"compression": "snappy"},
+        "columns": {},
+    }
+    # Fast scan: light compression, plain encodings
+    d = copy.deepcopy(sensor_encoding_dict)
+    d["default"].update({"compression": "lz4", "compression_level": None})
+    d["columns"] = {
+        column: {k: v for k, v in encoding.items() if k != "compression_level"}
+        for column, encoding in d["columns"].items()
+    }
+    dict_encodings["scan_speed"] = d
+    # Small archive: high zstd compression level and large row groups
+    d = copy.deepcopy(sensor_encoding_dict)
+    d["default"]["compression_level"] = 12
+    d["columns"] = {
+        column: {k: v for k, v in encoding.items() if k != "compression_level"}
+        for column, encoding in d["columns"].items()
+    }
+    d["row_group_size"] = 1000000
+    dict_encodings["archive_size"] = d
+    return dict_encodings
+
+
+def benchmark_L0_parquet_encodings(
+    df, sensor_name=None, dict_encodings=None, tmp_dir=None, n_repeats=3
+):
+    """Benchmark the file size and the reading speed of L0 Parquet encodings.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        L0 dataframe of a sample station (i.e. read_L0_data(..., lazy=False)).
+    sensor_name : str, optional
+        Sensor name. Used to define the default dict_encodings.
+    dict_encodings : dict, optional
+        Dictionary {<name>: <L0_parquet_encodings.yml dictionary>}.
+        If None, it uses get_L0_parquet_encodings_presets(sensor_name).
+    tmp_dir : str, optional
+        Directory where to write the temporary Parquet files.
+    n_repeats : int
+        Number of readings used to estimate the reading time.
+
+    Returns
+    -------
+    df_summary : pandas.DataFrame
+        Size [MB], compression ratio, writing time [s], full reading time [s]
+        and single column ('time') reading time [s] of each encoding.
+    """
+    from disdrodb.L0_proc import _write_to_parquet
+
+    if dict_encodings is None:
+        if sensor_name is None:
+            raise ValueError("Specify 'sensor_name' or 'dict_encodings'.")
+        dict_encodings = get_L0_parquet_encodings_presets(sensor_name)
+    in_memory_size = df.memory_usage(deep=True).sum()
+    tmp_dir = tempfile.mkdtemp(dir=tmp_dir)
+    list_summary = []
+    try:
+        for name, encoding_dict in dict_encodings.items():
+            fpath = os.path.join(tmp_dir, name + ".parquet")
+            # Write
+            t_i = time.time()
+            _write_to_parquet(df, fpath=fpath, encoding_dict=encoding_dict, force=True)
+            write_time = time.time() - t_i
+            size = os.path.getsize(fpath)
+            # Read all columns
+            t_i = time.time()
+            for _ in range(n_repeats):
+                _ = pd.read_parquet(fpath)
+            read_time = (time.time() - t_i) / n_repeats
+            # Read a single column
+            t_i = time.time()
+            for _ in range(n_repeats):
+                _ = pd.read_parquet(fpath, columns=["time"])
+            read_time_column = (time.time() - t_i) / n_repeats
+            list_summary.append(
+                {
+                    "encoding": name,
+                    "size_MB": size / 1e6,
+                    "compression_ratio": in_memory_size / size,
+                    "write_time": write_time,
+                    "read_time": read_time,
+                    "read_time_column": read_time_column,
+                }
+            )
+    finally:
+        shutil.rmtree(tmp_dir)
+    df_summary = pd.DataFrame(list_summary).set_index("encoding")
+    return df_summary
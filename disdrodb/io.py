@@ -22,8 +22,11 @@ import os
 import shutil
 import glob
 import numpy as np
-import pandas as pd
-import dask.dataframe as dd
+from disdrodb.utils.lazy_import import lazy_import
+
+# Heavy dependencies are imported at first use
+pd = lazy_import("pandas")
+dd = lazy_import("dask.dataframe")
 
 from disdrodb.metadata import create_metadata
 from disdrodb.metadata import check_metadata_compliance
@@ -83,6 +86,192 @@ def get_L1_zarr_fpath(processed_dir, station_id, suffix=""):
     return fpath
 
 
+####--------------------------------------------------------------------------.
+#### L1 time-split files
+# - The period label is appended to the L1 filename suffix.
+L1_PERIOD_FORMATS = {"yearly": "%Y", "monthly": "%Y%m", "daily": "%Y%m%d"}
+L1_PERIOD_OFFSETS = {
+    "yearly": {"years": 1},
+    "monthly": {"months": 1},
+    "daily": {"days": 1},
+}
+
+
+def check_L1_period(period):
+    if period not in L1_PERIOD_FORMATS:
+        msg = f"Valid L1 periods are {list(L1_PERIOD_FORMATS)}."
+        logger.exception(msg)
+        raise ValueError(msg)
+
+
+def get_L1_period_suffix(period_label, suffix=""):
+    if suffix != "":
+        return suffix + "_" + period_label
+    return period_label
+
+
+def parse_L1_period_label(period_label):
+    """Return the period name and start time of a period label (or None)."""
+    for period, fmt in L1_PERIOD_FORMATS.items():
+        if len(period_label) != len(pd.Timestamp(2000, 1, 1).strftime(fmt)):
+            continue
+        try:
+            start_time = pd.to_datetime(period_label, format=fmt)
+        except ValueError:
+            return None
+        return period, start_time
+    return None
+
+
+def get_L1_netcdf_fpaths(
+    processed_dir, station_id, suffix="", start_time=None, end_time=None
+):
+    """Return the sorted filepaths of the time-split L1 netCDFs of a station.
+
+    If start_time and/or end_time are specified, only the files whose period
+    overlaps [start_time, end_time] are returned.
+    The periods are parsed from the filenames, without opening the files.
+    """
+    campaign_name = get_campaign_name(processed_dir)
+    prefix = get_L1_netcdf_fname(campaign_name, station_id, suffix=suffix)[:-3]
+    fpaths = sorted(glob.glob(os.path.join(processed_dir, "L1", prefix + "_*.nc")))
+    start_time = pd.Timestamp(start_time) if start_time is not None else None
+    end_time = pd.Timestamp(end_time) if end_time is not None else None
+    list_fpaths = []
+    for fpath in fpaths:
+        period_label = os.path.basename(fpath)[len(prefix) + 1 : -3]
+        parsed = parse_L1_period_label(period_label)
+        if parsed is None:
+            continue
+        period, period_start = parsed
+        period_end = period_start + pd.DateOffset(**L1_PERIOD_OFFSETS[period])
+        if start_time is not None and period_end <= start_time:
+            continue
+        if end_time is not None and period_start > end_time:
+            continue
+        list_fpaths.append(fpath)
+    return list_fpaths
+
+
+####--------------------------------------------------------------------------.
+#### L1 time index
+# Each L1 product (netCDF or Zarr store) has a JSON sidecar with the time bounds
+# of each block of 'time_chunk' timesteps (the smallest time chunk of the
+# product variables). It allows to select a time range without decoding the full time coordinate.
+L1_TIME_INDEX_SUFFIX = ".time_index.json"
+
+
+def get_L1_time_index_fpath(fpath):
+    return fpath + L1_TIME_INDEX_SUFFIX
+
+
+def _get_L1_time_chunk(fpath):
+    """Return the smallest chunk size along time of the product variables."""
+    list_chunks = []
+    if fpath.endswith(".zarr"):
+        import zarr
+
+        group = zarr.open_consolidated(fpath, mode="r")
+        n_timesteps = group["time"].shape[0]
+        for name, arr in group.arrays():
+            dims = arr.attrs.get("_ARRAY_DIMENSIONS", [])
+            if name != "time" and len(dims) > 0 and dims[0] == "time":
+                list_chunks.append(arr.chunks[0])
+    else:
+        import netCDF4
+
+        with netCDF4.Dataset(fpath, mode="r") as nc:
+            n_timesteps = nc.dimensions["time"].size
+            for name, var in nc.variables.items():
+                if name != "time" and len(var.dimensions) > 0 and var.dimensions[0] == "time":
+                    chunking = var.chunking()
+                    if chunking != "contiguous":
+                        list_chunks.append(chunking[0])
+    if len(list_chunks) == 0:
+        return max(n_timesteps, 1)
+    return int(min(list_chunks))
+
+
+def _read_L1_time(fpath, start=0, stop=None):
+    """Read and decode the time coordinate of a L1 product between [start, stop)."""
+    import xarray as xr
+
+    if fpath.endswith(".zarr"):
+        import zarr
+
+        group = zarr.open_consolidated(fpath, mode="r")
+        arr = group["time"]
+        values = arr[start:stop]
+        attrs = {k: v for k, v in arr.attrs.items() if k in ["units", "calendar"]}
+    else:
+        import netCDF4
+
+        with netCDF4.Dataset(fpath, mode="r") as nc:
+            var = nc.variables["time"]
+            var.set_auto_maskandscale(False)
+            values = var[start:stop]
+            attrs = {k: var.getncattr(k) for k in var.ncattrs() if k in ["units", "calendar"]}
+    ds_time = xr.decode_cf(xr.Dataset({"time": ("time", np.asarray(values), attrs)}))
+    return ds_time["time"].values
+
+
+def read_L1_time_index(fpath):
+    """Read the time index sidecar of a L1 product (or None if not available)."""
+    import json
+
+    index_fpath = get_L1_time_index_fpath(fpath)
+    if not os.path.exists(index_fpath):
+        return None
+    with open(index_fpath, "r") as f:
+        index = json.load(f)
+    blocks = index["blocks"]
+    index["i0"] = np.array([b[0] for b in blocks], dtype="int64")
+    index["i1"] = np.array([b[1] for b in blocks], dtype="int64")
+    index["start_time"] = np.array([b[2] for b in blocks], dtype="M8[ns]")
+    index["end_time"] = np.array([b[3] for b in blocks], dtype="M8[ns]")
+    return index
+
+
+def write_L1_time_index(fpath, time=None, append=False):
+    """Write (or update) the time index sidecar of a L1 product.
+
+    time are the timesteps written to the product (i.e. the ones appended if append=True).
+    If time is None, or if the sidecar to append to is missing, the time
+    coordinate is read from the product.
+    """
+    import json
+
+    index = read_L1_time_index(fpath) if append else None
+    if append and index is None:
+        # The sidecar is missing: index the full time coordinate of the product
+        time = None
+    if time is None:
+        n_existing = index["n_timesteps"] if index is not None else 0
+        time = _read_L1_time(fpath, start=n_existing)
+    time = np.asarray(time, dtype="M8[ns]")
+    if index is None:
+        index = {"time_chunk": _get_L1_time_chunk(fpath), "n_timesteps": 0, "blocks": []}
+    time_chunk = index["time_chunk"]
+    n_existing = index["n_timesteps"]
+    n_total = n_existing + time.size
+    blocks = index["blocks"]
+    # Update the blocks with the new timesteps
+    idx = np.arange(n_existing, n_total)
+    block_ids = idx // time_chunk
+    for block_id in np.unique(block_ids):
+        block_time = time[block_ids == block_id]
+        i0 = int(block_id * time_chunk)
+        i1 = int(min((block_id + 1) * time_chunk, n_total))
+        start_time = np.datetime_as_string(block_time[0], unit="ns")
+        if len(blocks) > 0 and blocks[-1][0] == i0:
+            start_time = blocks.pop(-1)[2]
+        end_time = np.datetime_as_string(block_time[-1], unit="ns")
+        blocks.append([i0, i1, start_time, end_time])
+    index = {"time_chunk": time_chunk, "n_timesteps": int(n_total), "blocks": blocks}
+    with open(get_L1_time_index_fpath(fpath), "w") as f:
+        json.dump(index, f)
+
+
 ####--------------------------------------------------------------------------.
 #### Directory/File Creation/Deletion
 
@@ -380,9 +569,15 @@ def check_L0_is_available(processed_dir, station_id, suffix=""):
 
 
 def read_L0_data(processed_dir, station_id, suffix="", 
+                 columns=None, filters=None,
                  lazy=True, verbose=False, debugging_mode=False):
     """Read L0 Apache Parquet into dataframe.
 
+    The L0 row groups are sorted by time and have min/max statistics.
+    Specify 'filters' to skip the row groups not matching the filters.
+    Example: filters=[("time", ">=", start_time), ("time", "<", end_time)]
+    Specify 'columns' to read only a subset of the columns.
+
     If debugging_mode = True, return just a subset of total rows.
     """
     # Check L0 is available
@@ -396,9 +591,9 @@ def read_L0_data(processed_dir, station_id, suffix="",
     logger.info(msg)
     # Read
     if lazy:
-        df = dd.read_parquet(fpath)
+        df = dd.read_parquet(fpath, columns=columns, filters=filters)
     else:
-        df = pd.read_parquet(fpath)
+        df = pd.read_parquet(fpath, columns=columns, filters=filters)
     # Log
     msg = f" - Reading L0 Apache Parquet file at {fpath} ended"
     if verbose:
@@ -413,6 +608,317 @@ def read_L0_data(processed_dir, station_id, suffix="",
     return df
 
 
+def _natural_sort_key(fpath):
+    import re
+
+    return [int(s) if s.isdigit() else s for s in re.split(r"(\d+)", fpath)]
+
+
+def get_L0_fpaths(processed_dir, station_id, suffix=""):
+    """Return the Apache Parquet files of a L0 file or directory (sorted by part)."""
+    fpath = get_L0_fpath(processed_dir, station_id, suffix=suffix)
+    if os.path.isdir(fpath):
+        fpaths = glob.glob(os.path.join(fpath, "*.parquet"))
+        return sorted(fpaths, key=_natural_sort_key)
+    return [fpath]
+
+
+def iterate_L0_batches(
+    processed_dir, station_id, suffix="", batch_size=100_000, columns=None
+):
+    """Iterate over the L0 Apache Parquet data by batches of pandas.DataFrame.
+
+    The batches are read row group by row group, so that the memory usage
+    depends on batch_size and not on the length of the record.
+    The batches are yielded in the order of the (time-sorted) L0 files.
+    """
+    import pyarrow.parquet as pq
+
+    check_L0_is_available(processed_dir, station_id, suffix=suffix)
+    for fpath in get_L0_fpaths(processed_dir, station_id, suffix=suffix):
+        parquet_file = pq.ParquetFile(fpath)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+
+def read_L1_data(
+    processed_dir,
+    station_id,
+    suffix="",
+    start_time=None,
+    end_time=None,
+    parallel=False,
+    qc_flags=None,
+    verbose=False,
+):
+    """Lazily open the time-split L1 netCDFs of a station.
+
+    Only the files whose period overlaps [start_time, end_time] are opened.
+    If qc_flags is specified (i.e. ["status_error", "time_gap"] or "all"),
+    the timesteps flagged by the qc_flag variable are lazily masked.
+    """
+    import xarray as xr
+
+    fpaths = get_L1_netcdf_fpaths(
+        processed_dir,
+        station_id,
+        suffix=suffix,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    if len(fpaths) == 0:
+        msg = f"No L1 netCDF files available for station {station_id} in {processed_dir}."
+        logger.exception(msg)
+        raise ValueError(msg)
+    # Log
+    msg = f" - Opening {len(fpaths)} L1 netCDF files of station {station_id}"
+    if verbose:
+        print(msg)
+    logger.info(msg)
+    # Open lazily
+    ds = xr.open_mfdataset(
+        fpaths,
+        combine="nested",
+        concat_dim="time",
+        data_vars="minimal",
+        coords="minimal",
+        compat="override",
+        parallel=parallel,
+    )
+    if start_time is not None or end_time is not None:
+        ds = ds.sel(time=slice(start_time, end_time))
+    if qc_flags is not None and "qc_flag" in ds:
+        from disdrodb.L1_proc import mask_L1_qc
+
+        ds = mask_L1_qc(ds, flags=None if qc_flags == "all" else qc_flags)
+    return ds
+
+
+def _open_L1_product(fpath, **kwargs):
+    import xarray as xr
+
+    if fpath.endswith(".zarr"):
+        return xr.open_zarr(fpath, consolidated=True, **kwargs)
+    return xr.open_dataset(fpath, chunks={}, **kwargs)
+
+
+def open_L1_time_range(fpath, start_time=None, end_time=None):
+    """Lazily open the timesteps of a L1 product within [start_time, end_time].
+
+    If the product has a time index sidecar, only the time chunks overlapping
+    the period are decoded and the full time coordinate is never read.
+    Return None if the product does not overlap the period.
+    """
+    from disdrodb.L1_proc import _is_raw_drop_number_gathered
+    from disdrodb.L1_proc import decode_raw_drop_number_sparse
+
+    start_time = np.datetime64(pd.Timestamp(start_time)) if start_time is not None else None
+    end_time = np.datetime64(pd.Timestamp(end_time)) if end_time is not None else None
+    index = read_L1_time_index(fpath)
+    if index is not None:
+        is_overlapping = np.ones(index["i0"].size, dtype=bool)
+        if start_time is not None:
+            is_overlapping &= index["end_time"] >= start_time
+        if end_time is not None:
+            is_overlapping &= index["start_time"] <= end_time
+        if not np.any(is_overlapping):
+            return None
+        ds = _open_L1_product(fpath, drop_variables=["time"])
+        if not _is_raw_drop_number_gathered(ds):
+            # Decode only the time of the overlapping chunks
+            chunk_i0 = index["i0"][is_overlapping][0]
+            chunk_i1 = index["i1"][is_overlapping][-1]
+            time = _read_L1_time(fpath, start=chunk_i0, stop=chunk_i1)
+            i0 = np.searchsorted(time, start_time, side="left") if start_time is not None else 0
+            i1 = np.searchsorted(time, end_time, side="right") if end_time is not None else time.size
+            if i1 <= i0:
+                return None
+            ds = ds.isel(time=slice(chunk_i0 + i0, chunk_i0 + i1))
+            ds = ds.assign_coords(time=time[i0:i1])
+            return ds
+        ds.close()
+    # Fallback for products without time index (or with gathered raw_drop_number)
+    ds = _open_L1_product(fpath)
+    if _is_raw_drop_number_gathered(ds):
+        ds = decode_raw_drop_number_sparse(ds)
+    if start_time is not None or end_time is not None:
+        ds = ds.sel(time=slice(start_time, end_time))
+    if ds.sizes["time"] == 0:
+        return None
+    return ds
+
+
+def open_L1(processed_dir, station_id, start_time=None, end_time=None, suffix="", qc_flags=None):
+    """Lazily open the L1 data of a station within [start_time, end_time].
+
+    The time-split L1 netCDFs are used if available, otherwise the
+    single L1 netCDF or the L1 Zarr store.
+    A sparse (gathered) raw_drop_number is converted to the dense layout.
+    Only the time-split netCDFs overlapping the period are opened, and only
+    the overlapping time chunks are read (see open_L1_time_range).
+    """
+    import xarray as xr
+
+    fpath_nc = get_L1_netcdf_fpath(processed_dir, station_id, suffix=suffix)
+    fpath_zarr = get_L1_zarr_fpath(processed_dir, station_id, suffix=suffix)
+    if len(get_L1_netcdf_fpaths(processed_dir, station_id, suffix=suffix)) > 0:
+        fpaths = get_L1_netcdf_fpaths(
+            processed_dir, station_id, suffix=suffix, start_time=start_time, end_time=end_time
+        )
+    elif os.path.exists(fpath_nc):
+        fpaths = [fpath_nc]
+    elif os.path.exists(fpath_zarr):
+        fpaths = [fpath_zarr]
+    else:
+        msg = f"No L1 product available for station {station_id} in {processed_dir}."
+        logger.exception(msg)
+        raise ValueError(msg)
+    list_ds = [open_L1_time_range(fpath, start_time=start_time, end_time=end_time) for fpath in fpaths]
+    list_ds = [ds for ds in list_ds if ds is not None]
+    if len(list_ds) == 0:
+        msg = f"No L1 data of station {station_id} between {start_time} and {end_time}."
+        logger.exception(msg)
+        raise ValueError(msg)
+    if len(list_ds) == 1:
+        ds = list_ds[0]
+    else:
+        ds = xr.concat(list_ds, dim="time", data_vars="minimal", coords="minimal", compat="override")
+    if qc_flags is not None and "qc_flag" in ds:
+        from disdrodb.L1_proc import mask_L1_qc
+
+        ds = mask_L1_qc(ds, flags=None if qc_flags == "all" else qc_flags)
+    return ds
+
+
+def _get_station_coords(ds, station_id, raw_dir=None):
+    """Return the latitude, longitude and altitude of a (fixed) station."""
+    if raw_dir is not None:
+        from disdrodb.metadata import read_metadata
+
+        attrs = read_metadata(raw_dir=raw_dir, station_id=station_id)
+    else:
+        attrs = {k: ds[k].item() for k in ["latitude", "longitude", "altitude"] if k in ds.coords}
+    return {k: float(attrs.get(k, np.nan)) for k in ["latitude", "longitude", "altitude"]}
+
+
+def _get_L1_fill_value(da):
+    """Return the value used to pad the missing timesteps of a L1 variable.
+
+    Integer variables are padded with their _FillValue (or the largest value
+    of unsigned and the smallest value of signed integers) to keep their dtype.
+    """
+    if not np.issubdtype(da.dtype, np.integer):
+        return np.nan
+    fill_value = da.encoding.get("_FillValue", None)
+    if fill_value is not None and np.can_cast(np.min_scalar_type(fill_value), da.dtype):
+        return fill_value
+    info = np.iinfo(da.dtype)
+    return info.max if np.issubdtype(da.dtype, np.unsignedinteger) else info.min
+
+
+def read_L1_network(
+    processed_dir,
+    station_ids=None,
+    raw_dir=None,
+    suffix="",
+    start_time=None,
+    end_time=None,
+    variables=None,
+    qc_flags=None,
+    verbose=False,
+):
+    """Lazily combine the L1 products of several stations along a 'station' dimension.
+
+    The stations are opened with open_L1.
+    The time coordinates are aligned with an outer join: each station is
+    lazily reindexed on the union of the timesteps. The missing timesteps
+    are flagged as 'missing' in qc_flag, are NaN for float variables and
+    are the fill value of integer variables (see _get_L1_fill_value),
+    which keep their dtype.
+    The latitude, longitude and altitude of the stations are 'station'
+    coordinates read with read_metadata (if raw_dir is specified) or
+    taken from the L1 products.
+    If station_ids is None, all the stations with a metadata file in raw_dir are used.
+    All the stations must have the same sensor.
+    """
+    import xarray as xr
+    from disdrodb.L1_proc import QC_FLAG_MASKS
+
+    # Define the stations
+    if station_ids is None:
+        if raw_dir is None:
+            raise ValueError("Specify 'station_ids' or 'raw_dir'.")
+        metadata_fpaths = glob.glob(os.path.join(raw_dir, "metadata", "*.yml"))
+        station_ids = sorted(
+            [os.path.basename(fpath)[:-4] for fpath in metadata_fpaths],
+            key=_natural_sort_key,
+        )
+    if isinstance(station_ids, str):
+        station_ids = [station_ids]
+    if len(station_ids) == 0:
+        raise ValueError("No stations to combine.")
+
+    # Open the stations lazily
+    list_ds = []
+    dict_coords = {"latitude": [], "longitude": [], "altitude": []}
+    for station_id in station_ids:
+        ds = open_L1(
+            processed_dir,
+            station_id,
+            start_time=start_time,
+            end_time=end_time,
+            suffix=suffix,
+        )
+        if variables is not None:
+            ds = ds[[var for var in variables if var in ds.data_vars]]
+        coords = _get_station_coords(ds, station_id, raw_dir=raw_dir)
+        for k, v in coords.items():
+            dict_coords[k].append(v)
+        ds = ds.drop_vars(
+            [k for k in ["latitude", "longitude", "altitude", "crs"] if k in ds.coords]
+        )
+        list_ds.append(ds)
+        msg = f" - L1 product of station {station_id} opened ({ds.sizes['time']} timesteps)"
+        if verbose:
+            print(msg)
+        logger.info(msg)
+
+    # Check the stations have the same sensor
+    sensor_names = {ds.attrs.get("sensor_name", None) for ds in list_ds}
+    if len(sensor_names) > 1:
+        msg = f"The stations have different sensors {sensor_names} and can not be combined."
+        logger.exception(msg)
+        raise ValueError(msg)
+
+    # Combine along the station dimension (outer join on time)
+    fill_value = {var: _get_L1_fill_value(ds[var]) for ds in list_ds for var in ds.data_vars}
+    fill_value["qc_flag"] = QC_FLAG_MASKS["missing"]
+    ds = xr.concat(
+        list_ds,
+        dim=pd.Index(list(station_ids), name="station"),
+        join="outer",
+        data_vars="all",
+        coords="minimal",
+        compat="override",
+        combine_attrs="drop_conflicts",
+        fill_value=fill_value,
+    )
+    for var, value in fill_value.items():
+        if var != "qc_flag" and var in ds and np.issubdtype(ds[var].dtype, np.integer):
+            ds[var].encoding["_FillValue"] = value
+    ds = ds.assign_coords(
+        {k: ("station", np.array(v, dtype="float64")) for k, v in dict_coords.items()}
+    )
+    ds = ds.transpose("station", "time", ...)
+
+    # Mask the timesteps flagged by the quality control
+    if qc_flags is not None and "qc_flag" in ds:
+        from disdrodb.L1_proc import mask_L1_qc
+
+        ds = mask_L1_qc(ds, flags=None if qc_flags == "all" else qc_flags)
+    return ds
+
+
 ####--------------------------------------------------------------------------.
 #### TODO: include in create_directory_structure
 
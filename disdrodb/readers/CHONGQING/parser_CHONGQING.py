@@ -38,6 +38,7 @@ from disdrodb.check_standards import check_sensor_name
 # IO 
 from disdrodb.io import get_L0_fpath
 from disdrodb.io import get_L1_netcdf_fpath
+from disdrodb.io import get_L1_zarr_fpath
 from disdrodb.io import read_L0_data
 
 # L0_processing
@@ -50,6 +51,8 @@ from disdrodb.L0_proc import write_df_to_parquet
 # L1_processing
 from disdrodb.L1_proc import create_L1_dataset_from_L0
 from disdrodb.L1_proc import write_L1_to_netcdf
+from disdrodb.L1_proc import write_L1_to_zarr
+from disdrodb.L1_proc import process_raw_to_L1
 from disdrodb.L1_proc import create_L1_summary_statistics
 
 # Logger 
@@ -65,6 +68,8 @@ from disdrodb.logger import close_logger
 @click.option('-l0', '--l0_processing', type=bool, show_default=True, default=True, help="Perform L0 processing")
 @click.option('-l1', '--l1_processing', type=bool, show_default=True, default=True, help="Perform L1 processing")
 @click.option('-nc', '--write_netcdf', type=bool, show_default=True, default=True, help="Write L1 netCDF4")
+@click.option('-zarr', '--write_zarr', type=bool, show_default=True, default=False, help="Write L1 Zarr")
+@click.option('-fused', '--fused', type=bool, show_default=True, default=False, help="Create L1 directly from raw data")
 @click.option('-f', '--force', type=bool, show_default=True, default=False, help="Force overwriting")
 @click.option('-v', '--verbose', type=bool, show_default=True, default=False, help="Verbose")
 @click.option('-d', '--debugging_mode', type=bool, show_default=True, default=False, help="Switch to debugging mode")
@@ -74,6 +79,8 @@ def main(raw_dir,
          l0_processing=True,
          l1_processing=True,
          write_netcdf=True,
+         write_zarr=False,
+         fused=False,
          force=False,
          verbose=False,
          debugging_mode=False,
@@ -105,6 +112,14 @@ def main(raw_dir,
     write_netcdf: bool 
         Whether to save L1 as netCDF4 archive
         Write_netcdf must be True.
+    write_zarr: bool
+        Whether to save L1 as Zarr store.
+        The default is False.
+    fused : bool
+        If True and l1_processing=True, create L1 directly from the raw data files
+        without rereading the L0 Apache Parquet file.
+        The L0 file is written as side output only if l0_processing=True.
+        The default is False.
     force : bool
         If True, overwrite existing data into destination directories. 
         If False, raise an error if there are already data into destination directories. 
@@ -311,6 +326,26 @@ def main(raw_dir,
         sensor_name = attrs['sensor_name']
         check_sensor_name(sensor_name)
         
+        # ---------------------------------------------------------------------.
+        #### Fused raw to L1 processing (skip the L0 Apache Parquet round trip)
+        if fused and l1_processing:
+            process_raw_to_L1(raw_dir=raw_dir,
+                              processed_dir=processed_dir,
+                              station_id=station_id,
+                              attrs=attrs,
+                              glob_pattern=os.path.join("data", station_id, raw_data_glob_pattern),
+                              column_names=column_names,
+                              reader_kwargs=reader_kwargs,
+                              df_sanitizer_fun=df_sanitizer_fun,
+                              write_L0=l0_processing,
+                              write_netcdf=write_netcdf,
+                              write_zarr=write_zarr,
+                              lazy=lazy,
+                              force=force,
+                              verbose=verbose,
+                              debugging_mode=debugging_mode)
+            continue
+
         #---------------------------------------------------------------------. 
         ####################### 
         #### L0 processing ####
@@ -346,6 +381,7 @@ def main(raw_dir,
             fpath = get_L0_fpath(processed_dir, station_id)
             write_df_to_parquet(df=df,
                                 fpath=fpath,  
+                                sensor_name=sensor_name,
                                 force = force,
                                 verbose = verbose)
             ##------------------------------------------------------. 
@@ -389,6 +425,9 @@ def main(raw_dir,
             if write_netcdf:
                 fpath = get_L1_netcdf_fpath(processed_dir, station_id)
                 write_L1_to_netcdf(ds, fpath=fpath, sensor_name=sensor_name)
+            if write_zarr:
+                fpath = get_L1_zarr_fpath(processed_dir, station_id)
+                write_L1_to_zarr(ds, fpath=fpath, sensor_name=sensor_name)
             
             #-----------------------------------------------------------------.
             #### - Compute L1 summary statics 
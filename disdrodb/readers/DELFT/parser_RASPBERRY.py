@@ -39,6 +39,7 @@ from disdrodb.check_standards import check_sensor_name
 # IO
 from disdrodb.io import get_L0_fpath
 from disdrodb.io import get_L1_netcdf_fpath
+from disdrodb.io import get_L1_zarr_fpath
 from disdrodb.io import read_L0_data
 
 # L0_processing
@@ -51,6 +52,7 @@ from disdrodb.L0_proc import write_df_to_parquet
 # L1_processing
 from disdrodb.L1_proc import create_L1_dataset_from_L0
 from disdrodb.L1_proc import write_L1_to_netcdf
+from disdrodb.L1_proc import write_L1_to_zarr
 # from disdrodb.L1_proc import create_L1_summary_statistics
 
 # Logger
@@ -66,6 +68,7 @@ from disdrodb.logger import close_logger
 @click.option('-l0', '--l0_processing', type=bool, show_default=True, default=True, help="Perform L0 processing")
 @click.option('-l1', '--l1_processing', type=bool, show_default=True, default=True, help="Perform L1 processing")
 @click.option('-nc', '--write_netcdf', type=bool, show_default=True, default=True, help="Write L1 netCDF4")
+@click.option('-zarr', '--write_zarr', type=bool, show_default=True, default=False, help="Write L1 Zarr")
 @click.option('-f', '--force', type=bool, show_default=True, default=False, help="Force overwriting")
 @click.option('-v', '--verbose', type=bool, show_default=True, default=False, help="Verbose")
 @click.option('-d', '--debugging_mode', type=bool, show_default=True, default=False, help="Switch to debugging mode")
@@ -75,6 +78,7 @@ def main(raw_dir,
          l0_processing=True,
          l1_processing=True,
          write_netcdf=True,
+         write_zarr=False,
          force=False,
          verbose=False,
          debugging_mode=False,
@@ -106,6 +110,9 @@ def main(raw_dir,
     write_netcdf: bool 
         Whether to save L1 as netCDF4 archive
         Write_netcdf must be True.
+    write_zarr: bool
+        Whether to save L1 as Zarr store.
+        The default is False.
     force : bool
         If True, overwrite existing data into destination directories. 
         If False, raise an error if there are already data into destination directories. 
@@ -416,6 +423,7 @@ def main(raw_dir,
                     fpath = get_L0_fpath(processed_dir, station_id, suffix=file_suffix)
                     write_df_to_parquet(df=df,
                                         fpath=fpath,
+                                        sensor_name=sensor_name,
                                         force=force,
                                         verbose=verbose)
                     ##------------------------------------------------------.
@@ -464,6 +472,9 @@ def main(raw_dir,
                         if write_netcdf:
                             fpath = get_L1_netcdf_fpath(processed_dir, station_id, suffix=file_suffix)
                             write_L1_to_netcdf(ds, fpath=fpath, sensor_name=sensor_name)
+                        if write_zarr:
+                            fpath = get_L1_zarr_fpath(processed_dir, station_id, suffix=file_suffix)
+                            write_L1_to_zarr(ds, fpath=fpath, sensor_name=sensor_name)
 
                         # -----------------------------------------------------------------.
                         #### - Compute L1 summary statics
@@ -7,7 +7,6 @@ Created on Thu Feb 10 11:27:30 2022
 """
 
 import pandas as pd
-import dask.dataframe as dd
 import os
 import xarray as xr
 import netCDF4
@@ -22,26 +22,114 @@
 
 # -----------------------------------------------------------------------------.
 import os
+import copy
+import types
 import yaml
 import logging
+import functools
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+####-------------------------------------------------------------------------.
+#### Sensor specifications
+class SensorSpec:
+    """Immutable specification of a sensor.
+
+    All the YAML files of the sensor config directory are parsed once, and the
+    bins information is stored as read-only numpy arrays.
+    Use get_sensor_spec to retrieve the (memoized) SensorSpec of a sensor.
+    """
+
+    def __init__(self, sensor_name):
+        config_sensor_dir_path = get_configs_dir(sensor_name)
+        configs = {}
+        for filename in sorted(os.listdir(config_sensor_dir_path)):
+            if filename.endswith(".yml"):
+                with open(os.path.join(config_sensor_dir_path, filename), "r") as f:
+                    configs[filename] = yaml.safe_load(f)
+        self._set("sensor_name", sensor_name)
+        self._set("config_dir", config_sensor_dir_path)
+        self._set("_configs", configs)
+        # Read-only mappings of the data format, dtypes and encodings
+        data_format = configs.get("L0_data_format.yml", None) or {}
+        self._set("data_format", _read_only_mapping(data_format))
+        for key in ["n_digits", "n_characters", "n_decimals", "n_naturals", "data_range", "nan_flags"]:
+            field_dict = {k: v.get(key, None) for k, v in data_format.items()}
+            self._set(f"field_{key}", _read_only_mapping(field_dict))
+        self._set("L0_dtype", _read_only_mapping(configs.get("L0_dtype.yml", None) or {}))
+        for filename in ["L1_netcdf_encodings.yml", "L1_zarr_encodings.yml"]:
+            encodings = configs.get(filename, None) or {}
+            self._set(filename.replace(".yml", ""), _read_only_mapping(encodings))
+        # - In-memory L1 dtypes (variables packed with scale_factor/add_offset are float32)
+        L1_dtype = {}
+        for var, encoding in (configs.get("L1_netcdf_encodings.yml", None) or {}).items():
+            if "scale_factor" in encoding or "add_offset" in encoding:
+                L1_dtype[var] = "float32"
+            else:
+                L1_dtype[var] = encoding["dtype"]
+        self._set("L1_dtype", types.MappingProxyType(L1_dtype))
+        # Bins
+        for bins_name, filename in [("diameter", "diameter_bins.yml"), ("velocity", "velocity_bins.yml")]:
+            d = configs.get(filename, None)
+            if d is None:
+                continue
+            bounds = np.array(list(d["bounds"].values()), dtype=float)
+            self._set(f"{bins_name}_bin_center", _read_only_array(list(d["center"].values())))
+            self._set(f"{bins_name}_bin_lower", _read_only_array(bounds[:, 0]))
+            self._set(f"{bins_name}_bin_upper", _read_only_array(bounds[:, 1]))
+            self._set(f"{bins_name}_bin_width", _read_only_array(list(d["width"].values())))
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SensorSpec objects are immutable.")
+
+    def __repr__(self):
+        return f"SensorSpec('{self.sensor_name}')"
+
+    def has_config(self, filename):
+        return filename in self._configs
+
+    def get_config(self, filename):
+        """Return a copy of the content of a config YAML file."""
+        if filename not in self._configs:
+            msg = f"{filename} not available in {self.config_dir}"
+            logger.exception(msg)
+            raise ValueError(msg)
+        return copy.deepcopy(self._configs[filename])
+
+
+def _read_only_mapping(obj):
+    """Recursively convert dictionaries to read-only mappings and lists to tuples."""
+    if isinstance(obj, dict):
+        return types.MappingProxyType({k: _read_only_mapping(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_read_only_mapping(v) for v in obj)
+    return obj
+
+
+def _read_only_array(values):
+    arr = np.array(values, dtype=float)
+    arr.flags.writeable = False
+    return arr
+
+
+@functools.lru_cache(maxsize=None)
+def get_sensor_spec(sensor_name):
+    """Return the SensorSpec of a sensor (loaded once per process)."""
+    return SensorSpec(sensor_name)
+
+
 def read_config_yml(sensor_name, filename):
-    """Read a config yaml file and return the dictionary."""
-    # Get config path
-    config_sensor_dir_path = get_configs_dir(sensor_name)
-    fpath = os.path.join(config_sensor_dir_path, filename)
-    # Check yaml file exists
-    if not os.path.exists(fpath):
-        msg = f"{filename} not available in {config_sensor_dir_path}"
-        logger.exception(msg)
-        raise ValueError(msg)
-    # Open dictionary
-    with open(fpath, "r") as f:
-        d = yaml.safe_load(f)
-    return d
+    """Read a config yaml file and return the dictionary.
+
+    The files are parsed once per process (see get_sensor_spec)
+    and a copy of the dictionary is returned.
+    """
+    return get_sensor_spec(sensor_name).get_config(filename)
 
 
 def get_configs_dir(sensor_name):
@@ -77,8 +165,8 @@ def get_sensor_variables(sensor_name):
 
 
 def get_data_format_dict(sensor_name):
-    """Get a dictionary containing the data format of each sensor variable."""
-    return read_config_yml(sensor_name=sensor_name, filename="L0_data_format.yml")
+    """Get a read-only mapping containing the data format of each sensor variable."""
+    return get_sensor_spec(sensor_name).data_format
 
 
 def get_units_dict(sensor_name):
@@ -107,8 +195,16 @@ def get_velocity_bins_dict(sensor_name):
 
 
 def get_L0_dtype(sensor_name):
-    """Get a dictionary containing the L0 dtype."""
-    d = read_config_yml(sensor_name=sensor_name, filename="L0_dtype.yml")
+    """Get a read-only mapping containing the L0 dtype."""
+    return get_sensor_spec(sensor_name).L0_dtype
+
+
+def get_L0_parquet_encoding_dict(sensor_name):
+    """Get a dictionary containing the encoding to write L0 Apache Parquet files."""
+    d = read_config_yml(sensor_name=sensor_name, filename="L0_parquet_encodings.yml")
+    # Ensure columns encodings is a dictionary
+    if d.get("columns") is None:
+        d["columns"] = {}
     return d
 
 
@@ -142,76 +238,114 @@ def get_L1_netcdf_encoding_dict(sensor_name):
     return d
 
 
+def get_L1_zarr_encoding_dict(sensor_name):
+    """Get a dictionary containing the encoding to write L1 Zarr stores."""
+    import numcodecs
+
+    d = read_config_yml(sensor_name=sensor_name, filename="L1_zarr_encodings.yml")
+    shuffle_dict = {
+        "noshuffle": numcodecs.Blosc.NOSHUFFLE,
+        "shuffle": numcodecs.Blosc.SHUFFLE,
+        "bitshuffle": numcodecs.Blosc.BITSHUFFLE,
+    }
+    for var in d.keys():
+        # Ensure chunks is a list
+        if not isinstance(d[var]["chunks"], (list, type(None))):
+            d[var]["chunks"] = [d[var]["chunks"]]
+        # Define the numcodecs compressor
+        compressor_dict = d[var].get("compressor", None)
+        if compressor_dict is not None:
+            compressor_dict = compressor_dict.copy()
+            if isinstance(compressor_dict.get("shuffle", None), str):
+                compressor_dict["shuffle"] = shuffle_dict[compressor_dict["shuffle"]]
+            d[var]["compressor"] = numcodecs.get_codec(compressor_dict)
+    return d
+
+
 ####-------------------------------------------------------------------------.
 
 
 def get_diameter_bin_center(sensor_name):
     """Get diameter bin center."""
-    diameter_dict = get_diameter_bins_dict(sensor_name)
-    diameter_bin_center = list(diameter_dict["center"].values())
-    return diameter_bin_center
+    return get_sensor_spec(sensor_name).diameter_bin_center
 
 
 def get_diameter_bin_lower(sensor_name):
     """Get diameter bin lower bound."""
-    diameter_dict = get_diameter_bins_dict(sensor_name)
-    lower_bounds = [v[0] for v in diameter_dict["bounds"].values()]
-    return lower_bounds
+    return get_sensor_spec(sensor_name).diameter_bin_lower
 
 
 def get_diameter_bin_upper(sensor_name):
     """Get diameter bin upper bound."""
-    diameter_dict = get_diameter_bins_dict(sensor_name)
-    upper_bounds = [v[1] for v in diameter_dict["bounds"].values()]
-    return upper_bounds
+    return get_sensor_spec(sensor_name).diameter_bin_upper
 
 
 def get_diameter_bin_width(sensor_name):
     """Get diameter bin width."""
-    diameter_dict = get_diameter_bins_dict(sensor_name)
-    diameter_bin_width = list(diameter_dict["width"].values())
-    return diameter_bin_width
+    return get_sensor_spec(sensor_name).diameter_bin_width
 
 
 def get_velocity_bin_center(sensor_name):
     """Get velocity bin center."""
-    velocity_dict = get_velocity_bins_dict(sensor_name)
-    velocity_bin_center = list(velocity_dict["center"].values())
-    return velocity_bin_center
+    return get_sensor_spec(sensor_name).velocity_bin_center
 
 
 def get_velocity_bin_lower(sensor_name):
     """Get velocity bin lower bound."""
-    velocity_dict = get_velocity_bins_dict(sensor_name)
-    lower_bounds = [v[0] for v in velocity_dict["bounds"].values()]
-    return lower_bounds
+    return get_sensor_spec(sensor_name).velocity_bin_lower
 
 
 def get_velocity_bin_upper(sensor_name):
     """Get velocity bin upper bound."""
-    velocity_dict = get_velocity_bins_dict(sensor_name)
-    upper_bounds = [v[1] for v in velocity_dict["bounds"].values()]
-    return upper_bounds
+    return get_sensor_spec(sensor_name).velocity_bin_upper
 
 
 def get_velocity_bin_width(sensor_name):
     """Get velocity bin width."""
-    velocity_dict = get_velocity_bins_dict(sensor_name)
-    velocity_bin_width = list(velocity_dict["width"].values())
-    return velocity_bin_width
+    return get_sensor_spec(sensor_name).velocity_bin_width
 
 
 def get_raw_field_nbins(sensor_name):
-    diameter_dict = get_diameter_bins_dict(sensor_name)
-    velocity_dict = get_velocity_bins_dict(sensor_name)
-    n_d = len(diameter_dict["center"])
-    n_v = len(velocity_dict["center"])
+    spec = get_sensor_spec(sensor_name)
+    n_d = spec.diameter_bin_center.size
+    n_v = spec.velocity_bin_center.size
     nbins_dict = {
         "raw_drop_concentration": n_d,
-        "raw_drop_average_velocity": n_v,
+        "raw_drop_average_velocity": n_d,
         "raw_drop_number": n_d * n_v,
     }
     return nbins_dict
 
 
+def get_raw_field_delimiter(sensor_name):
+    """Get the delimiter separating the values of the raw fields."""
+    if sensor_name in ["Thies_LPM"]:
+        delimiter = ";"
+    else:
+        delimiter = ","
+    return delimiter
+
+
+def get_sensor_beam_dimensions(sensor_name):
+    """Get the length and width [mm] of the sensor laser beam."""
+    if sensor_name in ["Thies_LPM"]:
+        beam_length, beam_width = 228, 20
+    else:
+        beam_length, beam_width = 180, 30
+    return beam_length, beam_width
+
+
+def get_effective_sampling_area(sensor_name):
+    """Get the effective sampling area [m2] of each diameter bin.
+
+    Drops partially outside the beam edges are not detected, so the
+    effective beam width is reduced by half the drop diameter:
+    A = L * (B - D/2)
+    """
+    beam_length, beam_width = get_sensor_beam_dimensions(sensor_name)
+    diameter = get_diameter_bin_center(sensor_name)
+    sampling_area = beam_length * (beam_width - diameter / 2) * 1e-6
+    return sampling_area
+
+
 # -----------------------------------------------------------------------------.
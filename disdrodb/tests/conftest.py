@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Shared fixtures of the disdrodb tests (synthetic OTT_Parsivel L0 data)."""
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _can_write_zarr():
+    """Check that the installed xarray and zarr versions can write a Zarr store.
+
+    xarray>=2025 requires zarr>=3 (zarr 2 does not accept the 'zarr_format' argument).
+    """
+    try:
+        import xarray as xr
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            xr.Dataset({"a": ("x", np.arange(2))}).to_zarr(tmp_dir + "/test.zarr")
+    except Exception:
+        return False
+    return True
+
+
+requires_zarr = pytest.mark.skipif(
+    not _can_write_zarr(), reason="The installed xarray and zarr versions can not write Zarr stores."
+)
+
+
+def create_L0_dataframe(n_timesteps=200, seed=0, freq="30s"):
+    """Create a synthetic OTT_Parsivel L0 dataframe and its raw_drop_number counts."""
+    rng = np.random.default_rng(seed)
+    spectrum = rng.integers(0, 3, size=(n_timesteps, 1024))
+    spectrum[:, 500:] = 0
+    df = pd.DataFrame(
+        {
+            "time": pd.date_range("2020-01-01", periods=n_timesteps, freq=freq).astype("M8[s]"),
+            "rainfall_rate_32bit": rng.random(n_timesteps).astype("float32"),
+            "sensor_status": np.zeros(n_timesteps, dtype="uint8"),
+            "sample_interval": np.full(n_timesteps, 30, dtype="uint16"),
+            "weather_code_metar_4678": pd.Categorical(["RA"] * n_timesteps),
+            "raw_drop_number": [",".join(f"{v:03d}" for v in row) + "," for row in spectrum],
+            "raw_drop_concentration": [",".join(["-9.999"] * 32) + ","] * n_timesteps,
+            "raw_drop_average_velocity": [",".join(["00.000"] * 32) + ","] * n_timesteps,
+        }
+    )
+    return df, spectrum.reshape(n_timesteps, 32, 32)
+
+
+@pytest.fixture
+def attrs():
+    return {
+        "sensor_name": "OTT_Parsivel",
+        "crs": "WGS84",
+        "latitude": 46.5,
+        "longitude": 6.5,
+        "altitude": 400,
+        "campaign_name": "TEST",
+        "station_id": "1",
+        "measurement_interval": 30,
+    }
+
+
+@pytest.fixture
+def df_L0():
+    return create_L0_dataframe()
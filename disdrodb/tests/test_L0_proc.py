@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the L0 processing."""
+import glob
+import os
+
+import pandas as pd
+import pytest
+import dask.dataframe as dd
+import pyarrow.parquet as pq
+
+from disdrodb.data_encodings import get_L0_dtype_standards
+from disdrodb.io import _natural_sort_key
+from disdrodb.io import read_L0_data
+from disdrodb.L0_proc import _write_to_parquet
+from disdrodb.L0_proc import cast_column_dtypes
+from disdrodb.L0_proc import get_L0_parquet_writer_kwargs
+from disdrodb.L0_proc import write_df_to_parquet
+from disdrodb.standards import get_L0_parquet_encoding_dict
+from disdrodb.tests.conftest import create_L0_dataframe
+
+
+def test_get_L0_dtype_standards_downcast():
+    dtype_dict = get_L0_dtype_standards("OTT_Parsivel")
+    assert dtype_dict["weather_code_synop_4680"] == "uint8"
+    assert get_L0_dtype_standards("OTT_Parsivel", downcast=False)["weather_code_synop_4680"] == "uint32"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cast_column_dtypes_downcast(lazy):
+    df = pd.DataFrame({"weather_code_synop_4680": ["1", "30"], "sensor_status": ["0", "1"]})
+    if lazy:
+        df = dd.from_pandas(df, npartitions=2)
+    df = cast_column_dtypes(df, "OTT_Parsivel")
+    assert df["weather_code_synop_4680"].dtype == "uint8"
+    if lazy:
+        df = df.compute()
+        assert df["weather_code_synop_4680"].dtype == "uint8"
+    assert df["weather_code_synop_4680"].tolist() == [1, 30]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cast_column_dtypes_downcast_out_of_range(lazy):
+    df = pd.DataFrame({"weather_code_synop_4680": ["1", "300"]})
+    if lazy:
+        df = cast_column_dtypes(dd.from_pandas(df, npartitions=1), "OTT_Parsivel")
+        with pytest.raises(ValueError, match="weather_code_synop_4680 has values outside the uint8 range"):
+            df.compute()
+    else:
+        with pytest.raises(ValueError, match="weather_code_synop_4680 has values outside the uint8 range"):
+            cast_column_dtypes(df, "OTT_Parsivel")
+
+
+def test_write_df_to_parquet_lazy_downcast(tmp_path):
+    df = pd.DataFrame(
+        {
+            "time": pd.date_range("2020-01-01", periods=4, freq="30s"),
+            "weather_code_synop_4680": ["1", "30", "61", "0"],
+        }
+    )
+    df = cast_column_dtypes(dd.from_pandas(df, npartitions=2), "OTT_Parsivel")
+    fpath = str(tmp_path / "L0.parquet")
+    write_df_to_parquet(df, fpath, sensor_name="OTT_Parsivel")
+    assert pd.read_parquet(fpath)["weather_code_synop_4680"].dtype == "uint8"
+
+
+def test_get_L0_parquet_writer_kwargs():
+    encoding_dict = get_L0_parquet_encoding_dict("OTT_Parsivel")
+    writer_kwargs = get_L0_parquet_writer_kwargs(encoding_dict, columns=["time", "raw_drop_number", "sensor_status"])
+    assert writer_kwargs["compression"] == {"time": "zstd", "raw_drop_number": "zstd", "sensor_status": "zstd"}
+    assert writer_kwargs["compression_level"]["raw_drop_number"] == 6
+    assert writer_kwargs["compression_level"]["sensor_status"] == 3
+    assert sorted(writer_kwargs["use_dictionary"]) == ["sensor_status"]
+
+
+def test_write_df_to_parquet_encodings(tmp_path, df_L0):
+    df, _ = df_L0
+    fpath = str(tmp_path / "L0.parquet")
+    write_df_to_parquet(cast_column_dtypes(df, "OTT_Parsivel"), fpath, sensor_name="OTT_Parsivel")
+    metadata = pq.ParquetFile(fpath).metadata
+    columns = {metadata.schema.column(i).name: metadata.row_group(0).column(i) for i in range(metadata.num_columns)}
+    assert columns["raw_drop_number"].compression == "ZSTD"
+    assert "DELTA_BINARY_PACKED" in columns["time"].encodings
+    assert "RLE_DICTIONARY" in columns["sensor_status"].encodings
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_write_df_to_parquet_time_sorted_row_groups(tmp_path, lazy):
+    df, _ = create_L0_dataframe(n_timesteps=300)
+    df = cast_column_dtypes(df, "OTT_Parsivel")
+    if lazy:
+        # Partitions are ordered in time, rows within each partition are not
+        list_df = [df.iloc[i : i + 100].sample(frac=1, random_state=0) for i in range(0, 300, 100)]
+        df = dd.concat([dd.from_pandas(df_i, npartitions=1, sort=False) for df_i in list_df])
+    else:
+        df = df.sample(frac=1, random_state=0)
+    fpath = str(tmp_path / "L0.parquet")
+    encoding_dict = get_L0_parquet_encoding_dict("OTT_Parsivel")
+    encoding_dict["row_group_size"] = 50
+    _write_to_parquet(df, fpath, encoding_dict=encoding_dict)
+    # The row groups are time sorted and have time statistics
+    fpaths = sorted(glob.glob(fpath + "/*.parquet"), key=_natural_sort_key) if lazy else [fpath]
+    list_stats = []
+    for fpath_i in fpaths:
+        metadata = pq.ParquetFile(fpath_i).metadata
+        time_index = metadata.schema.names.index("time")
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(time_index).statistics
+            list_stats.append((statistics.min, statistics.max))
+    assert len(list_stats) >= 6
+    assert all(stats[0] <= stats[1] for stats in list_stats)
+    assert all(list_stats[i][1] < list_stats[i + 1][0] for i in range(len(list_stats) - 1))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_read_L0_data_filters(tmp_path, df_L0, lazy):
+    df, _ = df_L0
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L0"))
+    fpath = os.path.join(processed_dir, "L0", "TEST_s1.parquet")
+    write_df_to_parquet(cast_column_dtypes(df, "OTT_Parsivel"), fpath, sensor_name="OTT_Parsivel")
+    start_time = pd.Timestamp("2020-01-01 01:00:00")
+    end_time = pd.Timestamp("2020-01-01 01:10:00")
+    df_read = read_L0_data(
+        processed_dir,
+        "1",
+        columns=["time", "rainfall_rate_32bit"],
+        filters=[("time", ">=", start_time), ("time", "<", end_time)],
+        lazy=lazy,
+    )
+    if lazy:
+        df_read = df_read.compute()
+    assert list(df_read.columns) == ["time", "rainfall_rate_32bit"]
+    assert len(df_read) == 20
+    assert df_read["time"].min() == start_time
+    assert df_read["time"].max() < end_time
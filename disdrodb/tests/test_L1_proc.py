@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the L1 processing."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+import dask.array as da
+import dask.dataframe as dd
+
+from disdrodb.io import read_L0_data
+from disdrodb.io import read_L1_data
+from disdrodb.io import read_L1_time_index
+from disdrodb.L0_proc import write_df_to_parquet
+from disdrodb.L1_proc import aggregate_L1_dataset
+from disdrodb.L1_proc import convert_L0_raw_fields_arr_flags
+from disdrodb.L1_proc import create_L1_dataset_from_L0
+from disdrodb.L1_proc import decode_L0_raw_field
+from disdrodb.L1_proc import decode_raw_drop_number_sparse
+from disdrodb.L1_proc import encode_raw_drop_number_sparse
+from disdrodb.L1_proc import filter_raw_drop_number
+from disdrodb.L1_proc import get_drop_average_velocity
+from disdrodb.L1_proc import get_drop_concentration
+from disdrodb.L1_proc import get_fall_velocity
+from disdrodb.L1_proc import get_L1_aggregation_method
+from disdrodb.L1_proc import get_L1_chunks
+from disdrodb.L1_proc import get_optimal_chunks
+from disdrodb.L1_proc import get_spectrum_filter_mask
+from disdrodb.L1_proc import mask_L1_qc
+from disdrodb.L1_proc import process_raw_to_L1
+from disdrodb.L1_proc import set_L1_dataset_dtypes
+from disdrodb.L1_proc import write_L1_aggregated
+from disdrodb.L1_proc import write_L1_from_L0_batches
+from disdrodb.L1_proc import write_L1_to_netcdf
+from disdrodb.L1_proc import write_L1_to_netcdf_by_period
+from disdrodb.L1_proc import write_L1_to_zarr
+from disdrodb.standards import get_diameter_bin_center
+from disdrodb.standards import get_diameter_bin_lower
+from disdrodb.standards import get_diameter_bin_width
+from disdrodb.standards import get_effective_sampling_area
+from disdrodb.standards import get_velocity_bin_center
+from disdrodb.standards import get_velocity_bin_lower
+from disdrodb.tests.conftest import create_L0_dataframe
+from disdrodb.tests.conftest import requires_zarr
+
+
+def _write_L0(df, processed_dir, npartitions):
+    os.makedirs(os.path.join(processed_dir, "L0"))
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    fpath = os.path.join(processed_dir, "L0", "TEST_s1.parquet")
+    write_df_to_parquet(dd.from_pandas(df, npartitions=npartitions), fpath, sensor_name="OTT_Parsivel")
+
+
+def test_write_L1_from_L0_batches_equals_in_memory(tmp_path, attrs):
+    df, _ = create_L0_dataframe(n_timesteps=400)
+    # Gaps at the batch boundaries (every 100 rows)
+    df["time"] = df["time"] + (np.arange(len(df)) // 100).astype("m8[m]") * 5
+    processed_dir = str(tmp_path / "TEST")
+    ds_memory = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    _write_L0(df, processed_dir, npartitions=4)
+    fpath = write_L1_from_L0_batches(
+        processed_dir, "1", attrs, os.path.join(processed_dir, "L1", "TEST_s1.nc"), batch_size=100
+    )
+    ds = xr.open_dataset(fpath)
+    is_gap = (ds["qc_flag"].values & 16) > 0
+    assert np.array_equal(np.where(is_gap)[0], [100, 200, 300])
+    assert np.array_equal(ds["qc_flag"].values, ds_memory["qc_flag"].values)
+    ds.close()
+
+
+def test_write_L1_from_L0_batches_uses_record_array_lengths(tmp_path, attrs):
+    df, spectrum = create_L0_dataframe(n_timesteps=400)
+    # The first batch has mostly truncated spectra
+    df.loc[:79, "raw_drop_number"] = df.loc[:79, "raw_drop_number"].str[:-8]
+    processed_dir = str(tmp_path / "TEST")
+    _write_L0(df, processed_dir, npartitions=4)
+    fpath = write_L1_from_L0_batches(
+        processed_dir, "1", attrs, os.path.join(processed_dir, "L1", "TEST_s1.nc"), batch_size=100
+    )
+    ds = xr.open_dataset(fpath)
+    assert ds.sizes["time"] == 320
+    assert np.array_equal(ds["raw_drop_number"].values, spectrum[80:])
+    ds.close()
+
+
+def test_sparse_raw_drop_number_round_trip(tmp_path, attrs):
+    df, spectrum = create_L0_dataframe(n_timesteps=300)
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3), attrs, lazy=True)
+    ds_gathered = encode_raw_drop_number_sparse(ds)
+    assert ds_gathered["raw_drop_number_index"].dtype == np.uint16
+    assert np.array_equal(ds_gathered["raw_drop_number_nnz"].values, (spectrum > 0).sum(axis=(1, 2)))
+    assert np.array_equal(decode_raw_drop_number_sparse(ds_gathered)["raw_drop_number"].values, spectrum)
+    # Round trip through a netCDF
+    fpath = str(tmp_path / "sparse.nc")
+    write_L1_to_netcdf(ds, fpath, "OTT_Parsivel", sparse=True)
+    ds_read = decode_raw_drop_number_sparse(xr.open_dataset(fpath))
+    assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+    ds_read.close()
+
+
+def test_get_L1_aggregation_method():
+    assert get_L1_aggregation_method("raw_drop_number", "uint16") == "sum"
+    assert get_L1_aggregation_method("qc_flag", "uint16") == "or"
+    assert get_L1_aggregation_method("rainfall_accumulated_32bit", "float32") == "last"
+    assert get_L1_aggregation_method("weather_code_synop_4680", "float32") == "mode"
+    assert get_L1_aggregation_method("reflectivity_32bit", "float32") == "log_mean"
+    assert get_L1_aggregation_method("sensor_status", "uint8") == "max"
+    assert get_L1_aggregation_method("rainfall_rate_32bit", "float32") == "mean"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_aggregate_L1_dataset(attrs, lazy):
+    df, spectrum = create_L0_dataframe(n_timesteps=40)
+    df["reflectivity_32bit"] = np.tile(np.array([10, 30], dtype="float32"), 20)
+    df["weather_code_synop_4680"] = np.array([61] * 15 + [71] * 5 + [np.nan] * 20, dtype="float32")
+    df["rainfall_accumulated_32bit"] = np.arange(40, dtype="float32")
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3) if lazy else df, attrs, lazy=lazy)
+    ds_agg = aggregate_L1_dataset(ds, "OTT_Parsivel", freq="10min").compute()
+    assert ds_agg.sizes["time"] == 2
+    assert np.array_equal(ds_agg["raw_drop_number"].values, spectrum.reshape(2, 20, 32, 32).sum(axis=1))
+    assert np.array_equal(ds_agg["sample_interval"].values, [600, 600])
+    # The reflectivity is averaged in linear units
+    expected_reflectivity = 10 * np.log10((10 ** 1 + 10 ** 3) / 2)
+    np.testing.assert_allclose(ds_agg["reflectivity_32bit"].values, expected_reflectivity, rtol=1e-6)
+    # The weather code is the most frequent one (NaN if not available)
+    np.testing.assert_array_equal(ds_agg["weather_code_synop_4680"].values, [61, np.nan])
+    # The accumulated counter is the last value
+    assert np.array_equal(ds_agg["rainfall_accumulated_32bit"].values, [19, 39])
+
+
+def test_write_L1_aggregated(tmp_path, attrs):
+    df, _ = create_L0_dataframe(n_timesteps=240)
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3), attrs, lazy=True)
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    fpaths = write_L1_aggregated(ds, processed_dir, "1", "OTT_Parsivel", freqs=["1h", "10min"])
+    assert [os.path.basename(fpath) for fpath in fpaths] == ["TEST_s1_10min.nc", "TEST_s1_60min.nc"]
+    for fpath, freq in zip(fpaths, ["10min", "1h"]):
+        ds_expected = aggregate_L1_dataset(ds, "OTT_Parsivel", freq=freq).compute()
+        with xr.open_dataset(fpath) as ds_agg:
+            assert np.array_equal(ds_agg["raw_drop_number"].values, ds_expected["raw_drop_number"].values)
+            assert "actual_range" in ds_agg["rainfall_rate_32bit"].attrs
+        assert os.path.exists(fpath + ".time_index.json")
+
+
+def _log_block_computation(x, log_fpath):
+    with open(log_fpath, "a") as f:
+        f.write("computed\n")
+    return x
+
+
+def test_write_L1_to_netcdf_by_period_computes_upstream_once(tmp_path, attrs):
+    df, spectrum = create_L0_dataframe(n_timesteps=160, freq="12h")
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False).chunk({"time": 40})
+    # Log each computation of the upstream raw_drop_number blocks
+    log_fpath = str(tmp_path / "log.txt")
+    ds["raw_drop_number"] = ds["raw_drop_number"].copy(
+        data=ds["raw_drop_number"].data.map_blocks(_log_block_computation, log_fpath, meta=np.empty((0, 0, 0), "uint16"))
+    )
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    fpaths = write_L1_to_netcdf_by_period(
+        ds, processed_dir, "1", "OTT_Parsivel", period="monthly", parallel=True, n_workers=2
+    )
+    assert len(fpaths) == 3
+    with open(log_fpath) as f:
+        assert len(f.readlines()) == 4
+    ds_read = read_L1_data(processed_dir, "1")
+    assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+    ds_read.close()
+
+
+@requires_zarr
+def test_write_L1_to_zarr_append(tmp_path, attrs):
+    df, spectrum = create_L0_dataframe(n_timesteps=300)
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3), attrs, lazy=True)
+    fpath = str(tmp_path / "TEST_s1.zarr")
+    write_L1_to_zarr(ds.isel(time=slice(0, 170)), fpath, "OTT_Parsivel")
+    write_L1_to_zarr(ds.isel(time=slice(170, None)), fpath, "OTT_Parsivel", append=True)
+    ds_read = xr.open_zarr(fpath, consolidated=True)
+    assert np.array_equal(ds_read["time"].values, ds["time"].values)
+    assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+    assert ds_read["raw_drop_number"].dtype == np.uint16
+    np.testing.assert_allclose(
+        ds_read["rainfall_rate_32bit"].attrs["actual_range"],
+        [df["rainfall_rate_32bit"].min(), df["rainfall_rate_32bit"].max()],
+        rtol=1e-6,
+    )
+    assert read_L1_time_index(fpath)["n_timesteps"] == 300
+
+
+def test_decode_L0_raw_field():
+    series = pd.Series(["1,2,3,", " 4, 5,6,", "7,8,9,"])
+    arr = decode_L0_raw_field(series, n_bins=3, delimiter=",", dtype="uint16")
+    assert arr.dtype == np.uint16
+    assert np.array_equal(arr, np.arange(1, 10).reshape(3, 3))
+    assert decode_L0_raw_field(series.iloc[:0], n_bins=3, delimiter=",", dtype="float32").shape == (0, 3)
+
+
+def test_decode_L0_raw_field_invalid():
+    with pytest.raises(ValueError, match="Unexpected number of values"):
+        decode_L0_raw_field(pd.Series(["1,2,3,", "4,5,"]), n_bins=3, delimiter=",", dtype="uint16")
+    with pytest.raises(ValueError, match="Impossible to parse"):
+        decode_L0_raw_field(pd.Series(["1,2,a,"]), n_bins=3, delimiter=",", dtype="uint16")
+
+
+def test_create_L1_dataset_from_L0_lazy_known_chunks(attrs, df_L0):
+    df, spectrum = df_L0
+    ddf = dd.from_pandas(df, npartitions=4)
+    lengths = tuple(ddf.map_partitions(len).compute())
+    ds = create_L1_dataset_from_L0(ddf, attrs, lazy=True)
+    assert ds["raw_drop_number"].chunks == (lengths, (32,), (32,))
+    assert ds["raw_drop_concentration"].chunks == (lengths, (32,))
+    assert ds["rainfall_rate_32bit"].chunks == (lengths,)
+    ds_eager = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    xr.testing.assert_identical(ds.compute(), ds_eager)
+    assert np.array_equal(ds["raw_drop_number"].values, spectrum)
+
+
+def test_get_optimal_chunks():
+    # The chunk spans all the bins and extends along time
+    assert get_optimal_chunks((10_000, 32, 32), "uint16", 2**20) == [512, 32, 32]
+    assert get_optimal_chunks((10_000,), "float32", 2**20) == [262144]
+    # The bins are split only if a single timestep exceeds the target
+    assert get_optimal_chunks((10, 32, 32), "uint16", 1024) == [1, 16, 32]
+
+
+@pytest.mark.parametrize("access_pattern", ["timeseries", "snapshot"])
+def test_get_L1_chunks(attrs, df_L0, access_pattern):
+    df, _ = df_L0
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    dtype_dict = {"raw_drop_number": "uint16", "rainfall_rate_32bit": "float32"}
+    chunks_dict = get_L1_chunks(ds, dtype_dict, target_chunk_bytes=2**20, access_pattern=access_pattern)
+    assert chunks_dict["raw_drop_number"] == [512, 32, 32]
+    if access_pattern == "timeseries":
+        assert chunks_dict["rainfall_rate_32bit"] == [262144]
+    else:
+        assert chunks_dict["rainfall_rate_32bit"] == [512]
+    with pytest.raises(ValueError):
+        get_L1_chunks(ds, dtype_dict, target_chunk_bytes=2**20, access_pattern="invalid")
+
+
+def test_write_L1_to_netcdf_chunks(tmp_path, attrs, df_L0):
+    df, spectrum = df_L0
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3), attrs, lazy=True)
+    fpath = str(tmp_path / "TEST_s1.nc")
+    write_L1_to_netcdf(ds, fpath, "OTT_Parsivel", access_pattern="snapshot", target_chunk_bytes=32 * 2**10)
+    with xr.open_dataset(fpath) as ds_read:
+        assert ds_read["raw_drop_number"].encoding["chunksizes"] == (16, 32, 32)
+        assert ds_read["rainfall_rate_32bit"].encoding["chunksizes"] == (16,)
+        assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+
+
+@requires_zarr
+def test_write_L1_to_zarr_chunks(tmp_path, attrs, df_L0):
+    df, spectrum = df_L0
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=3), attrs, lazy=True)
+    fpath = str(tmp_path / "TEST_s1.zarr")
+    write_L1_to_zarr(ds, fpath, "OTT_Parsivel", access_pattern="timeseries", target_chunk_bytes=32 * 2**10)
+    ds_read = xr.open_zarr(fpath, consolidated=True)
+    assert ds_read["raw_drop_number"].encoding["chunks"] == (16, 32, 32)
+    assert ds_read["rainfall_rate_32bit"].encoding["chunks"] == (8192,)
+    assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+
+
+def _sanitize_raw_time(df, lazy=False):
+    df["time"] = dd.to_datetime(df["time"]) if lazy else pd.to_datetime(df["time"])
+    return df
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_process_raw_to_L1(tmp_path, attrs, lazy):
+    df, spectrum = create_L0_dataframe(n_timesteps=200)
+    df = df.drop(columns="weather_code_metar_4678")
+    raw_dir = str(tmp_path / "raw")
+    os.makedirs(raw_dir)
+    for i in range(2):
+        df.iloc[i * 100 : (i + 1) * 100].to_csv(os.path.join(raw_dir, f"{i}.txt"), sep=";", header=False, index=False)
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L0"))
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    ds = process_raw_to_L1(
+        raw_dir,
+        processed_dir,
+        "1",
+        attrs,
+        glob_pattern="*.txt",
+        column_names=list(df.columns),
+        reader_kwargs={"delimiter": ";", "header": None},
+        df_sanitizer_fun=_sanitize_raw_time,
+        write_L0=True,
+        lazy=lazy,
+    )
+    assert np.array_equal(ds["raw_drop_number"].values, spectrum)
+    # The L1 product equals the L1 created from the L0 Apache Parquet side output
+    ds_expected = create_L1_dataset_from_L0(read_L0_data(processed_dir, "1", lazy=False), attrs, lazy=False)
+    with xr.open_dataset(os.path.join(processed_dir, "L1", "TEST_s1.nc")) as ds_read:
+        for var in ["raw_drop_number", "rainfall_rate_32bit", "sensor_status", "qc_flag"]:
+            assert np.array_equal(ds_read[var].values, ds_expected[var].values)
+        assert np.array_equal(ds_read["time"].values, ds_expected["time"].values)
+
+
+def test_get_drop_concentration():
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 5, size=(4, 32, 32))
+    sample_interval = np.array([30, 30, 60, 60])
+    velocity = np.asarray(get_velocity_bin_center("OTT_Parsivel"))
+    diameter_width = np.asarray(get_diameter_bin_width("OTT_Parsivel"))
+    sampling_area = np.asarray(get_effective_sampling_area("OTT_Parsivel"))
+    expected = np.zeros((4, 32))
+    for t in range(4):
+        for i in range(32):
+            expected[t, i] = np.sum(arr[t, i, :] / velocity) / (sampling_area[i] * diameter_width[i] * sample_interval[t])
+    np.testing.assert_allclose(get_drop_concentration(arr, "OTT_Parsivel", sample_interval), expected)
+    # The dask inputs are kept lazy
+    result = get_drop_concentration(da.from_array(arr, chunks=2), "OTT_Parsivel", da.from_array(sample_interval, chunks=2))
+    assert isinstance(result, da.Array)
+    np.testing.assert_allclose(result.compute(), expected)
+
+
+def test_get_drop_average_velocity():
+    arr = np.zeros((1, 32, 32))
+    arr[0, 0, [2, 4]] = [1, 3]
+    velocity = np.asarray(get_velocity_bin_center("OTT_Parsivel"))
+    result = get_drop_average_velocity(arr, "OTT_Parsivel")
+    assert result.shape == (1, 32)
+    np.testing.assert_allclose(result[0, 0], (velocity[2] + 3 * velocity[4]) / 4)
+    assert np.all(result[0, 1:] == 0)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_create_L1_dataset_from_L0_without_raw_drop_concentration(attrs, df_L0, lazy):
+    df, spectrum = df_L0
+    df = df.drop(columns=["raw_drop_concentration", "raw_drop_average_velocity"])
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2) if lazy else df, attrs, lazy=lazy)
+    expected = get_drop_concentration(spectrum, "OTT_Parsivel", df["sample_interval"].values)
+    np.testing.assert_allclose(ds["raw_drop_concentration"].values, expected, rtol=1e-6)
+    expected = get_drop_average_velocity(spectrum, "OTT_Parsivel")
+    np.testing.assert_allclose(ds["raw_drop_average_velocity"].values, expected, rtol=1e-6)
+
+
+def test_create_L1_dataset_from_L0_compact_dtypes(attrs, df_L0):
+    df, _ = df_L0
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    assert ds["raw_drop_number"].dtype == np.uint16
+    assert ds["raw_drop_concentration"].dtype == np.float32
+    assert ds["raw_drop_average_velocity"].dtype == np.float32
+    assert ds["rainfall_rate_32bit"].dtype == np.float32
+    assert ds["sensor_status"].dtype == np.uint8
+    # Floating variables are cast to float32
+    ds["rainfall_rate_32bit"] = ds["rainfall_rate_32bit"].astype("float64")
+    assert set_L1_dataset_dtypes(ds, "OTT_Parsivel")["rainfall_rate_32bit"].dtype == np.float32
+
+
+def test_write_L1_to_netcdf_compact_encodings(tmp_path, attrs, df_L0):
+    df, spectrum = df_L0
+    rng = np.random.default_rng(0)
+    velocity = np.round(rng.uniform(0, 20, size=(len(df), 32)), 3)
+    df["raw_drop_average_velocity"] = [",".join(f"{v:06.3f}" for v in row) + "," for row in velocity]
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    fpath = str(tmp_path / "TEST_s1.nc")
+    write_L1_to_netcdf(ds, fpath, "OTT_Parsivel")
+    with xr.open_dataset(fpath, mask_and_scale=False) as ds_raw:
+        assert ds_raw["raw_drop_number"].dtype == np.uint16
+        assert "_FillValue" not in ds_raw["raw_drop_number"].attrs
+        assert ds_raw["raw_drop_average_velocity"].dtype == np.int16
+    with xr.open_dataset(fpath) as ds_read:
+        assert ds_read["raw_drop_number"].dtype == np.uint16
+        assert np.array_equal(ds_read["raw_drop_number"].values, spectrum)
+        # The 3-decimal velocities are stored without loss
+        np.testing.assert_allclose(ds_read["raw_drop_average_velocity"].values, velocity, atol=1e-4)
+
+
+def test_convert_L0_raw_fields_arr_flags():
+    arr = np.array([1.5, -9.999, 3], dtype="float32")
+    result = convert_L0_raw_fields_arr_flags(arr, [-9.999])
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, [1.5, np.nan, 3])
+    # Integer arrays with flags become floating arrays
+    result = convert_L0_raw_fields_arr_flags(np.array([1, 99, 3], dtype="uint8"), [99])
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, [1, np.nan, 3])
+    result = convert_L0_raw_fields_arr_flags(da.from_array(np.array([1, 99, 3], dtype="uint32")), [99])
+    assert isinstance(result, da.Array)
+    assert result.dtype == np.float64
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_create_L1_dataset_from_L0_nan_flags(attrs, df_L0, lazy):
+    df, _ = df_L0
+    df["reflectivity_32bit"] = np.tile(np.array([-9.999, 20.5], dtype="float32"), len(df) // 2)
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2) if lazy else df, attrs, lazy=lazy)
+    assert isinstance(ds["raw_drop_concentration"].data, da.Array) == lazy
+    assert ds["raw_drop_concentration"].isnull().all()
+    np.testing.assert_array_equal(ds["reflectivity_32bit"].values[:2], [np.nan, 20.5])
+
+
+@requires_zarr
+def test_write_L1_to_zarr_nan_flags(tmp_path, attrs, df_L0):
+    df, _ = df_L0
+    df["reflectivity_32bit"] = np.tile(np.array([-9.999, 20.5], dtype="float32"), len(df) // 2)
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2), attrs, lazy=True)
+    fpath = str(tmp_path / "TEST_s1.zarr")
+    write_L1_to_zarr(ds, fpath, "OTT_Parsivel")
+    ds_read = xr.open_zarr(fpath, consolidated=True)
+    assert ds_read["raw_drop_concentration"].isnull().all()
+    np.testing.assert_array_equal(ds_read["reflectivity_32bit"].values[:2], [np.nan, 20.5])
+
+
+def _create_L0_dataframe_with_qc_issues():
+    df, _ = create_L0_dataframe(n_timesteps=10)
+    df["error_code"] = np.zeros(10, dtype="uint8")
+    df.loc[1, "sensor_status"] = 1
+    df.loc[2, "error_code"] = 2
+    df.loc[3, "rainfall_rate_32bit"] = 10000
+    df.loc[4, "raw_drop_number"] = ",".join(["000"] * 1024) + ","
+    df.loc[4, "rainfall_rate_32bit"] = 1
+    # The timestep 7 follows a gap
+    df = df.drop(index=6).reset_index(drop=True)
+    return df
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_get_L1_qc_flag(attrs, lazy):
+    df = _create_L0_dataframe_with_qc_issues()
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2) if lazy else df, attrs, lazy=lazy)
+    assert ds["qc_flag"].dtype == np.uint16
+    assert isinstance(ds["qc_flag"].data, da.Array) == lazy
+    np.testing.assert_array_equal(ds["qc_flag"].values, [0, 1, 2, 4, 8, 0, 16, 0, 0])
+
+
+def test_mask_L1_qc(attrs):
+    df = _create_L0_dataframe_with_qc_issues()
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2), attrs, lazy=True)
+    ds_masked = mask_L1_qc(ds, flags=["status_error", "time_gap"])
+    assert isinstance(ds_masked["rainfall_rate_32bit"].data, da.Array)
+    is_masked = ds_masked["rainfall_rate_32bit"].isnull().values
+    np.testing.assert_array_equal(np.where(is_masked)[0], [1, 6])
+    assert ds_masked["raw_drop_number"].isnull().any(dim=["diameter_bin_center", "velocity_bin_center"]).values[6]
+    # The input Dataset is not modified
+    assert not ds["rainfall_rate_32bit"].isnull().any()
+    # Drop all the flagged timesteps
+    ds_dropped = mask_L1_qc(ds, drop=True)
+    assert ds_dropped.sizes["time"] == 4
+    with pytest.raises(ValueError):
+        mask_L1_qc(ds, flags="invalid")
+
+
+def test_get_spectrum_filter_mask():
+    mask = get_spectrum_filter_mask("OTT_Parsivel")
+    assert mask.shape == (32, 32)
+    assert mask.dtype == bool
+    assert not mask.flags.writeable
+    assert get_spectrum_filter_mask("OTT_Parsivel", altitude=0.0) is mask
+    # Large drops are removed
+    diameter_lower = np.asarray(get_diameter_bin_lower("OTT_Parsivel"))
+    assert not mask[diameter_lower >= 7.5].any()
+    # Drops falling faster than the fall velocity + 4 m/s are removed
+    velocity_lower = np.asarray(get_velocity_bin_lower("OTT_Parsivel"))
+    fall_velocity = get_fall_velocity(np.asarray(get_diameter_bin_center("OTT_Parsivel")))
+    assert not (mask & (velocity_lower[None, :] > fall_velocity[:, None] + 4)).any()
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_filter_raw_drop_number(attrs, df_L0, lazy):
+    df, spectrum = df_L0
+    ds = create_L1_dataset_from_L0(dd.from_pandas(df, npartitions=2) if lazy else df, attrs, lazy=lazy)
+    ds_filtered = filter_raw_drop_number(ds)
+    assert isinstance(ds_filtered["raw_drop_number"].data, da.Array) == lazy
+    assert ds_filtered["raw_drop_number"].dtype == np.uint16
+    mask = get_spectrum_filter_mask("OTT_Parsivel", altitude=attrs["altitude"])
+    assert np.array_equal(ds_filtered["raw_drop_number"].values, spectrum * mask)
+    assert ds_filtered["raw_drop_number"].attrs["spectrum_filter"] == "non-physical drops removed"
+    # The input Dataset is not modified
+    assert np.array_equal(ds["raw_drop_number"].values, spectrum)
+    assert "spectrum_filter" not in ds["raw_drop_number"].attrs
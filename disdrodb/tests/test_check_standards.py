@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the standards checks."""
+import numpy as np
+import pandas as pd
+import pytest
+import dask.dataframe as dd
+
+from disdrodb.check_standards import check_array_lengths_consistency
+from disdrodb.check_standards import check_L0_standards
+from disdrodb.check_standards import check_L1_standards
+from disdrodb.check_standards import count_L0_format_violations
+from disdrodb.check_standards import get_parquet_columns_statistics
+from disdrodb.L0_proc import cast_column_dtypes
+from disdrodb.L0_proc import write_df_to_parquet
+from disdrodb.L1_proc import create_L1_dataset_from_L0
+from disdrodb.L1_proc import write_L1_to_netcdf
+from disdrodb.tests.conftest import create_L0_dataframe
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_check_array_lengths_consistency(lazy):
+    df, _ = create_L0_dataframe(n_timesteps=20)
+    df.loc[[3, 7], "raw_drop_number"] = df.loc[[3, 7], "raw_drop_number"].str[:-8]
+    df.loc[11, "raw_drop_concentration"] = df.loc[11, "raw_drop_concentration"] + "0.000,"
+    df_input = dd.from_pandas(df, npartitions=3) if lazy else df
+    df_checked = check_array_lengths_consistency(df_input, sensor_name="OTT_Parsivel", lazy=lazy)
+    if lazy:
+        df_checked = df_checked.compute()
+    expected_index = np.setdiff1d(np.arange(20), [3, 7, 11])
+    assert np.array_equal(df_checked.index.values, expected_index)
+
+
+def test_check_array_lengths_consistency_expected_lengths():
+    df, _ = create_L0_dataframe(n_timesteps=10)
+    df.loc[:6, "raw_drop_number"] = df.loc[:6, "raw_drop_number"].str[:-8]
+    # The most frequent length is unexpected, unless specified
+    assert len(check_array_lengths_consistency(df, sensor_name="OTT_Parsivel", lazy=False)) == 7
+    df_checked = check_array_lengths_consistency(
+        df, sensor_name="OTT_Parsivel", lazy=False, dict_n_values={"raw_drop_number": 1025}
+    )
+    assert np.array_equal(df_checked.index.values, [7, 8, 9])
+
+
+def test_check_L1_standards(tmp_path, attrs, df_L0):
+    df, _ = df_L0
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    assert check_L1_standards(ds, verbose=False) == []
+    fpath = str(tmp_path / "TEST_s1.nc")
+    write_L1_to_netcdf(ds, fpath, "OTT_Parsivel")
+    assert check_L1_standards(fpath, verbose=False) == []
+    # Missing global attributes
+    ds.attrs = {}
+    errors = check_L1_standards(ds, sensor_name="OTT_Parsivel", verbose=False)
+    expected_errors = [
+        f"The global attribute '{attr}' is missing." for attr in ["sensor_name", "station_id", "campaign_name"]
+    ]
+    assert errors == expected_errors
+
+
+def test_check_L1_standards_actual_range(tmp_path, attrs, df_L0):
+    df, _ = df_L0
+    df.loc[5, "rainfall_rate_32bit"] = 20000
+    fpath = str(tmp_path / "TEST_s1.nc")
+    write_L1_to_netcdf(create_L1_dataset_from_L0(df, attrs, lazy=False), fpath, "OTT_Parsivel")
+    errors = check_L1_standards(fpath, verbose=False)
+    assert len(errors) == 1
+    assert errors[0].startswith("'rainfall_rate_32bit' has values in")
+    with pytest.raises(ValueError):
+        check_L1_standards(fpath, raise_errors=True, verbose=False)
+
+
+def _write_L0_parquet(df, fpath, npartitions=None):
+    df = cast_column_dtypes(df, "OTT_Parsivel")
+    if npartitions is not None:
+        df = dd.from_pandas(df, npartitions=npartitions)
+    write_df_to_parquet(df, fpath, sensor_name="OTT_Parsivel")
+
+
+@pytest.mark.parametrize("npartitions", [None, 3])
+def test_get_parquet_columns_statistics(tmp_path, df_L0, npartitions):
+    df, _ = df_L0
+    df["rainfall_rate_32bit"] = np.arange(len(df), dtype="float32")
+    df.loc[5, "rainfall_rate_32bit"] = np.nan
+    fpath = str(tmp_path / "L0.parquet")
+    _write_L0_parquet(df, fpath, npartitions=npartitions)
+    dict_stats = get_parquet_columns_statistics(fpath)
+    assert dict_stats["rainfall_rate_32bit"] == {"min": 0, "max": len(df) - 1, "null_count": 1}
+    assert dict_stats["time"]["min"] == df["time"].min()
+    assert dict_stats["time"]["max"] == df["time"].max()
+
+
+def test_check_L0_standards(tmp_path, df_L0):
+    df, _ = df_L0
+    df["error_code"] = np.zeros(len(df), dtype="uint8")
+    fpath = str(tmp_path / "L0.parquet")
+    _write_L0_parquet(df, fpath)
+    check_L0_standards(fpath, "OTT_Parsivel", raise_errors=True, verbose=False)
+    # Values outside the data range (checked with the statistics)
+    df.loc[3, "rainfall_rate_32bit"] = 10000
+    fpath = str(tmp_path / "L0_out_of_range.parquet")
+    _write_L0_parquet(df, fpath)
+    with pytest.raises(ValueError, match="rainfall_rate_32bit"):
+        check_L0_standards(fpath, "OTT_Parsivel", raise_errors=True, verbose=False)
+    # Values different from the options (checked by reading the column)
+    df.loc[3, "rainfall_rate_32bit"] = 1
+    df.loc[3, "error_code"] = 3
+    fpath = str(tmp_path / "L0_options.parquet")
+    _write_L0_parquet(df, fpath)
+    with pytest.raises(ValueError, match="error_code"):
+        check_L0_standards(fpath, "OTT_Parsivel", raise_errors=True, verbose=False)
+
+
+def test_count_L0_format_violations():
+    df = pd.DataFrame(
+        {
+            "rainfall_rate_32bit": ["0000.123", "0001.5", "abcd.efg", None, "-001.000"],
+            "sensor_status": ["0", "5", "1", "2", "10"],
+            "time": pd.date_range("2020-01-01", periods=5, freq="30s"),
+        }
+    )
+    df_counts = count_L0_format_violations(df, sensor_name="OTT_Parsivel")
+    assert list(df_counts.index) == ["rainfall_rate_32bit", "sensor_status"]
+    # - Null values are not violations
+    # - The data range is checked only on the values with a valid format
+    assert df_counts.loc["rainfall_rate_32bit"].tolist() == [4, 2, 1]
+    assert df_counts.loc["sensor_status"].tolist() == [5, 1, 1]
+    # Numeric (already cast) columns are checked only against the data range
+    df_counts = count_L0_format_violations(pd.DataFrame({"sensor_status": [0, 5, 1]}), sensor_name="OTT_Parsivel")
+    assert df_counts.loc["sensor_status"].tolist() == [3, 0, 1]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the L1 products reading."""
+import os
+
+import numpy as np
+import pytest
+
+from disdrodb.io import open_L1_time_range
+from disdrodb.io import read_L1_network
+from disdrodb.io import read_L1_time_index
+from disdrodb.io import write_L1_time_index
+from disdrodb.L1_proc import QC_FLAG_MASKS
+from disdrodb.L1_proc import create_L1_dataset_from_L0
+from disdrodb.L1_proc import write_L1_to_netcdf
+from disdrodb.tests.conftest import create_L0_dataframe
+
+
+def _write_L1_station(processed_dir, station_id, attrs, df, sparse=False):
+    attrs = {**attrs, "station_id": station_id}
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    fpath = os.path.join(processed_dir, "L1", f"TEST_s{station_id}.nc")
+    write_L1_to_netcdf(ds, fpath, attrs["sensor_name"], sparse=sparse)
+
+
+def test_read_L1_network(tmp_path, attrs):
+    df, spectrum = create_L0_dataframe(n_timesteps=150)
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    _write_L1_station(processed_dir, "1", attrs, df.iloc[:100])
+    _write_L1_station(processed_dir, "2", {**attrs, "latitude": 47}, df.iloc[50:], sparse=True)
+    ds = read_L1_network(processed_dir, station_ids=["1", "2"])
+    assert ds.sizes["station"] == 2
+    assert ds.sizes["time"] == 150
+    assert ds["raw_drop_number"].dims[:2] == ("station", "time")
+    np.testing.assert_array_equal(ds["latitude"].values, [46.5, 47])
+    # Integer variables keep their dtype and are padded with a fill value
+    assert ds["raw_drop_number"].dtype == np.uint16
+    assert ds["sensor_status"].dtype == np.uint8
+    assert np.array_equal(ds["raw_drop_number"].isel(station=0, time=slice(0, 100)).values, spectrum[:100])
+    assert np.array_equal(ds["raw_drop_number"].isel(station=1, time=slice(50, None)).values, spectrum[50:])
+    fill_value = ds["sensor_status"].encoding["_FillValue"]
+    assert np.all(ds["sensor_status"].isel(station=0, time=slice(100, None)).values == fill_value)
+    assert ds["rainfall_rate_32bit"].isel(station=1, time=slice(0, 50)).isnull().all()
+    # The missing timesteps are flagged
+    is_missing = (ds["qc_flag"] & QC_FLAG_MASKS["missing"]) != 0
+    assert np.array_equal(is_missing.isel(station=0).values, np.arange(150) >= 100)
+    assert np.array_equal(is_missing.isel(station=1).values, np.arange(150) < 50)
+    # Time subsetting
+    ds = read_L1_network(processed_dir, station_ids=["1", "2"], start_time="2020-01-01 00:40:00")
+    assert ds.sizes["time"] == 70
+
+
+def test_read_L1_network_different_sensors(tmp_path, attrs):
+    df, _ = create_L0_dataframe(n_timesteps=10)
+    processed_dir = str(tmp_path / "TEST")
+    os.makedirs(os.path.join(processed_dir, "L1"))
+    _write_L1_station(processed_dir, "1", attrs, df)
+    _write_L1_station(processed_dir, "2", {**attrs, "sensor_name": "OTT_Parsivel2"}, df)
+    with pytest.raises(ValueError, match="different sensors"):
+        read_L1_network(processed_dir, station_ids=["1", "2"])
+
+
+def _write_L1_chunked(tmp_path, attrs, n_timesteps=300):
+    df, spectrum = create_L0_dataframe(n_timesteps=n_timesteps)
+    ds = create_L1_dataset_from_L0(df, attrs, lazy=False)
+    fpath = str(tmp_path / "TEST_s1.nc")
+    # Chunks of 16 timesteps for raw_drop_number
+    write_L1_to_netcdf(ds, fpath, "OTT_Parsivel", access_pattern="snapshot", target_chunk_bytes=32 * 2**10)
+    return fpath, ds
+
+
+def test_write_L1_time_index(tmp_path, attrs):
+    fpath, ds = _write_L1_chunked(tmp_path, attrs)
+    index = read_L1_time_index(fpath)
+    assert index["time_chunk"] == 16
+    assert index["n_timesteps"] == 300
+    assert np.array_equal(index["i0"], np.arange(0, 300, 16))
+    assert np.array_equal(index["start_time"], ds["time"].values[index["i0"]])
+    assert np.array_equal(index["end_time"], ds["time"].values[index["i1"] - 1])
+    # A missing sidecar is rebuilt from the full product on append
+    os.remove(fpath + ".time_index.json")
+    write_L1_time_index(fpath, time=ds["time"].values[-10:], append=True)
+    index_rebuilt = read_L1_time_index(fpath)
+    assert index_rebuilt["n_timesteps"] == 300
+    assert np.array_equal(index_rebuilt["start_time"], index["start_time"])
+
+
+@pytest.mark.parametrize("with_index", [True, False])
+def test_open_L1_time_range(tmp_path, attrs, with_index):
+    fpath, ds = _write_L1_chunked(tmp_path, attrs)
+    if not with_index:
+        os.remove(fpath + ".time_index.json")
+    start_time, end_time = ds["time"].values[[37, 121]]
+    ds_subset = open_L1_time_range(fpath, start_time=start_time, end_time=end_time)
+    assert np.array_equal(ds_subset["time"].values, ds["time"].values[37:122])
+    assert np.array_equal(ds_subset["raw_drop_number"].values, ds["raw_drop_number"].values[37:122])
+    ds_subset.close()
+    assert open_L1_time_range(fpath, start_time="2021-01-01") is None
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the lazy import of the heavy dependencies."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from disdrodb.utils.lazy_import import lazy_import
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ["xarray", "dask.array", "dask.dataframe", "zarr", "pandas"]
+
+
+def _get_imported_heavy_modules(code):
+    """Run code in a new interpreter and return the heavy modules it imported."""
+    code += f"\nimport sys\nprint('HEAVY_MODULES:' + ','.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    list_paths = [REPO_DIR, os.environ.get("PYTHONPATH", "")]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in list_paths if p != "")}
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=REPO_DIR, check=True
+    )
+    line = out.stdout.strip().splitlines()[-1]
+    return [m for m in line[len("HEAVY_MODULES:") :].split(",") if m != ""]
+
+
+def test_lazy_import():
+    module = lazy_import("json")
+    assert "not loaded" in repr(module)
+    assert module.loads("[1]") == [1]
+    assert "not loaded" not in repr(module)
+
+
+def test_import_disdrodb_modules_does_not_import_heavy_modules():
+    code = "import disdrodb.L0_proc, disdrodb.L1_proc, disdrodb.io, disdrodb.check_standards"
+    assert _get_imported_heavy_modules(code) == []
+
+
+@pytest.mark.parametrize("reader", ["EPFL/parser_EPFL_2009.py", "DELFT/parser_RASPBERRY.py"])
+def test_reader_help_does_not_import_heavy_modules(reader):
+    code = f"""
+import runpy, sys
+sys.argv = ["{reader}", "--help"]
+try:
+    runpy.run_path("disdrodb/readers/{reader}", run_name="__main__")
+except SystemExit:
+    pass
+"""
+    assert _get_imported_heavy_modules(code) == []
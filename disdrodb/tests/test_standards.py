@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the sensor standards."""
+import numpy as np
+import pytest
+
+from disdrodb.data_encodings import get_L0_dtype_standards
+from disdrodb.standards import get_data_format_dict
+from disdrodb.standards import get_diameter_bin_center
+from disdrodb.standards import get_L0_dtype
+from disdrodb.standards import get_L1_netcdf_encoding_dict
+from disdrodb.standards import get_sensor_spec
+from disdrodb.standards import read_config_yml
+
+
+def test_get_sensor_spec_is_cached():
+    spec = get_sensor_spec("OTT_Parsivel")
+    assert get_sensor_spec("OTT_Parsivel") is spec
+    assert get_data_format_dict("OTT_Parsivel") is spec.data_format
+    with pytest.raises(AttributeError):
+        spec.sensor_name = "OTT_Parsivel2"
+    with pytest.raises(ValueError):
+        get_sensor_spec("invalid_sensor")
+
+
+def test_sensor_spec_read_only():
+    with pytest.raises(TypeError):
+        get_L0_dtype("OTT_Parsivel")["sensor_status"] = "int64"
+    with pytest.raises(TypeError):
+        get_L0_dtype_standards("OTT_Parsivel")["sensor_status"] = "int64"
+    with pytest.raises(TypeError):
+        get_data_format_dict("OTT_Parsivel")["rainfall_rate_32bit"]["nan_flags"] = 0
+    assert isinstance(get_data_format_dict("OTT_Parsivel")["rainfall_rate_32bit"]["data_range"], tuple)
+    with pytest.raises(ValueError):
+        get_diameter_bin_center("OTT_Parsivel")[0] = 0
+    assert get_diameter_bin_center("OTT_Parsivel").dtype == np.float64
+
+
+def test_read_config_yml_returns_a_copy():
+    encoding_dict = get_L1_netcdf_encoding_dict("OTT_Parsivel")
+    encoding_dict["raw_drop_number"]["dtype"] = "float64"
+    assert read_config_yml("OTT_Parsivel", "L1_netcdf_encodings.yml")["raw_drop_number"]["dtype"] == "uint16"
+    with pytest.raises(ValueError):
+        read_config_yml("OTT_Parsivel", "invalid.yml")
@@ -13,7 +13,7 @@ def get_parser_cmd(
     processed_dir,
     l0_processing=True,
     l1_processing=True,
-    # write_zarr=False,
+    write_zarr=False,
     write_netcdf=True,
     force=False,
     verbose=False,
@@ -34,9 +34,9 @@ def get_parser_cmd(
             "--l1_processing=",
             str(l1_processing),
             " ",
-            # "--write_zarr=",
-            # str(write_zarr),
-            # " ",
+            "--write_zarr=",
+            str(write_zarr),
+            " ",
             "--write_netcdf=",
             str(write_netcdf),
             " ",
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup-time regression benchmark of the disdrodb readers CLI.
+
+For each reader, it measures the time of 'python <reader> --help' and checks
+that the heavy dependencies (xarray, dask, zarr) are not imported at startup.
+The script exits with an error if a reader is slower than MAX_STARTUP_TIME
+or imports a heavy dependency.
+
+Usage: python scripts/benchmark_startup.py [n_repeats]
+"""
+import os
+import sys
+import glob
+import time
+import subprocess
+
+#### Benchmark settings
+MAX_STARTUP_TIME = 1.0  # [s]
+HEAVY_MODULES = ["xarray", "dask.array", "dask.dataframe", "zarr", "pandas"]
+# The netCDF-based readers need xarray to parse the raw data.
+# The GCPEX reader has no command line interface yet (its click options are commented out).
+EXCLUDED_READERS = ["parser_ARM.py", "parser_DIVEN.py", "parser_GCPEX.py"]
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+readers_dir = os.path.join(repo_dir, "disdrodb", "readers")
+
+# The readers are run with the repository on the PYTHONPATH
+list_paths = [repo_dir, os.environ.get("PYTHONPATH", "")]
+subprocess_env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in list_paths if p != "")}
+
+# Code run in a subprocess to list the modules imported by 'reader --help'
+IMPORTED_MODULES_CODE = """
+import sys, runpy
+sys.argv = [sys.argv[1], "--help"]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+print("HEAVY_MODULES:" + ",".join(m for m in {modules} if m in sys.modules))
+"""
+
+
+def time_help(reader_fpath, n_repeats=3):
+    """Return the best wall time of 'python <reader> --help' over n_repeats.
+
+    Raise a RuntimeError with the reader stderr if 'reader --help' fails.
+    """
+    list_times = []
+    for _ in range(n_repeats):
+        t_i = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, reader_fpath, "--help"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=subprocess_env,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip())
+        list_times.append(time.perf_counter() - t_i)
+    return min(list_times)
+
+
+def get_imported_heavy_modules(reader_fpath):
+    code = IMPORTED_MODULES_CODE.format(modules=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code, reader_fpath],
+        capture_output=True,
+        text=True,
+        env=subprocess_env,
+    )
+    lines = [line for line in out.stdout.splitlines() if line.startswith("HEAVY_MODULES:")]
+    modules = lines[-1][len("HEAVY_MODULES:"):] if len(lines) > 0 else ""
+    return [m for m in modules.split(",") if m != ""]
+
+
+if __name__ == "__main__":
+    n_repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    reader_fpaths = sorted(glob.glob(os.path.join(readers_dir, "*", "parser_*.py")))
+    reader_fpaths = [fpath for fpath in reader_fpaths if os.path.basename(fpath) not in EXCLUDED_READERS]
+    list_failures = []
+    n_measured = 0
+    for reader_fpath in reader_fpaths:
+        reader_name = os.path.relpath(reader_fpath, readers_dir)
+        try:
+            startup_time = time_help(reader_fpath, n_repeats=n_repeats)
+        except RuntimeError as e:
+            print(f"FAIL {reader_name:45} 'reader --help' failed:\n{e}")
+            list_failures.append(reader_name)
+            continue
+        n_measured += 1
+        heavy_modules = get_imported_heavy_modules(reader_fpath)
+        status = "OK"
+        if startup_time > MAX_STARTUP_TIME or len(heavy_modules) > 0:
+            status = "FAIL"
+            list_failures.append(reader_name)
+        print(f"{status:4} {reader_name:45} {startup_time:6.3f} s  heavy imports: {heavy_modules}")
+    if n_measured == 0:
+        print("No reader startup time could be measured.")
+        sys.exit(1)
+    if len(list_failures) > 0:
+        print(f"Startup regression for {list_failures}")
+        sys.exit(1)
+    print(f"All readers start in less than {MAX_STARTUP_TIME} s.")